@@ -18,12 +18,9 @@ class PatientAppService:
     
     def get_patient_by_username(self, username:str) -> Optional[Patient]:
         """ get patient user by username stored in User model """
-        #1. get userid using username
-        user_id = self.user_service.get_user_by_username(username=username).id
-        #2. search for user_id in patient model
+        # user and patient are matched in one query
         try:
-            patient = self.patient_service.get_patient_by_user_id(user_id)
-            return patient
+            return self.patient_service.get_patient_by_username(username)
         except Patient.DoesNotExist:
             return None
         
@@ -35,9 +32,7 @@ class PatientAppService:
     
     def get_patient_username(self, patient_id: uuid.UUID) -> str:
         """get patient username using patient_id"""
-        user_id = self.patient_service.get_patient_by_id(patient_id).user_id
-        username = self.user_service.get_user_by_id(user_id).username
-        return username
+        return self.patient_service.get_patient_username(patient_id)
     
     def list_patients(self) -> QuerySet[Patient]:
         """ list all patients """
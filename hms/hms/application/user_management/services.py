@@ -1,13 +1,28 @@
 import uuid
-from typing import List, Optional
+from contextlib import nullcontext
+from itertools import islice
+from typing import Iterable, List, Optional
 
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.db.models.query import QuerySet
 from django.urls import reverse
+from django.utils import timezone
 
 from lib.django import custom_models
-from lib.django.custom_exceptions import OTPExpireException
+from lib.django.custom_authentication import set_user_claims
+from lib.django.custom_exceptions import ConcurrentUpdateException, OTPExpireException
+from lib.django.custom_hashing import PasswordHashingPool, get_hashing_executor
+from lib.django.custom_reset_tokens import reset_token_generator
+from lib.django.custom_revocation import revoke_token
+from lib.django.custom_token_family import get_token_family_store
 from hms.domain.user_management.models import User, UserOTP
 from hms.domain.user_management.services import UserService
 
@@ -100,6 +115,35 @@ class UserAppService:
         except User.DoesNotExist:
             return None
 
+    def list_users_by(self, role: Optional[custom_models.RoleType] = None, is_active: Optional[bool] = None) -> QuerySet[User]:
+        """
+        `User` queryset narrowed with the list helpers above
+
+        Args:
+            role: keep only users of this role
+            is_active: keep only active (True) or inactive (False) users
+
+        Returns:
+            QuerySet[User]: users ordered by date joined
+        """
+        queryset = self.list_users()
+        if is_active is not None:
+            queryset &= self.list_active_users() if is_active else self.list_inactive_users()
+        role_lists = {
+            custom_models.RoleType.PATIENT: self.list_patients,
+            custom_models.RoleType.DOCTOR: self.list_doctors,
+            custom_models.RoleType.STAFF: self.list_staffs,
+        }
+        if role in role_lists:
+            queryset &= role_lists[role]()
+        elif role:
+            queryset = queryset.filter(role=role)
+        return queryset
+
+    def search_users(self, queryset: QuerySet[User], terms: List[str]) -> QuerySet[User]:
+        """rank `User` queryset against search terms on username and email"""
+        return self.user_service.search_users(queryset, terms)
+
     def get_user_by_id(self, id: uuid.UUID) -> Optional[QuerySet[User]]:
         """
         get `User` object by id
@@ -145,12 +189,78 @@ class UserAppService:
         except User.DoesNotExist:
             return None
 
-    def create_user(self, user_obj: dict) -> User:
+    def get_current_active_user_by_id(self, id: uuid.UUID) -> Optional[User]:
+        """`get_active_user_by_id` read from the primary past the caches, for minting tokens"""
+        try:
+            return self.user_service.get_user_from_primary(id=id, is_active=True)
+        except User.DoesNotExist:
+            return None
+
+    async def aget_user_by_id(self, id: uuid.UUID) -> Optional[User]:
+        """async counterpart of `get_user_by_id`"""
+        try:
+            return await self.user_service.aget_user_by_id(id=id)
+        except User.DoesNotExist:
+            return None
+
+    async def aget_active_user_by_id(self, id: uuid.UUID) -> Optional[User]:
+        """async counterpart of `get_active_user_by_id`"""
+        try:
+            return await self.user_service.aget_active_user_by_id(id)
+        except User.DoesNotExist:
+            return None
+
+    async def aget_user_by_email(self, email: str) -> Optional[User]:
+        """async counterpart of `get_user_by_email`"""
+        try:
+            return await self.user_service.aget_user_by_email(email)
+        except User.DoesNotExist:
+            return None
+
+    def build_user(self, user_obj: dict) -> User:
+        """
+        build unsaved user with permissions based on role
+
+        Args:
+            user_obj: dict with username, email and role keys
+
+        Returns:
+            User: unsaved user object without password
+        """
+        base_params = {
+            "username": user_obj.get("username"),
+            "email": user_obj.get("email"),
+        }
+        role = user_obj.get("role")
+        if role == custom_models.RoleType.PATIENT or role == custom_models.RoleType.DOCTOR:
+            return self.user_service.create_user(
+                base_params=base_params, role=role
+            )
+        elif role == custom_models.RoleType.STAFF:
+            return self.user_service.create_user(
+                base_params=base_params,
+                role=custom_models.RoleType.STAFF,
+                base_permissions={"is_staff": True},
+            )
+        elif role == custom_models.RoleType.SUPERUSER:
+            return self.user_service.create_user(
+                base_params=base_params,
+                role=custom_models.RoleType.SUPERUSER,
+                base_permissions={"is_staff": True},
+                is_superuser={"is_superuser": True}
+            )
+        return self.user_service.create_user(
+            base_params=base_params,
+            role=custom_models.RoleType.PATIENT,
+        )
+
+    def create_user(self, user_obj: dict, password_hash: Optional[str] = None) -> User:
         """
         create user based on role
 
         Args:
             user_obj: dict with user model attributes as keys
+            password_hash: password already hashed, `user_obj` password is hashed here otherwise
 
         Returns:
             User: created user object
@@ -159,67 +269,204 @@ class UserAppService:
             # base_params = BaseUserParams(username=user_obj.username, email=user_obj.email)
             # user = self.user_service.create_user(base_params, custom_models.RoleType.PATIENT)
             # user.set_password(user_obj.password)
-            base_params = {
-                "username": user_obj.get("username"),
-                "email": user_obj.get("email"),
-            }
-            role = user_obj.get("role")
-            if role == custom_models.RoleType.PATIENT or role == custom_models.RoleType.DOCTOR:
-                user = self.user_service.create_user(
-                    base_params=base_params, role=role
-                )
-            elif role == custom_models.RoleType.STAFF:
-                user = self.user_service.create_user(
-                    base_params=base_params,
-                    role=custom_models.RoleType.STAFF,
-                    base_permissions={"is_staff": True},
-                )
-            elif role == custom_models.RoleType.SUPERUSER:
-                user = self.user_service.create_user(
-                    base_params=base_params,
-                    role=custom_models.RoleType.SUPERUSER,
-                    base_permissions={"is_staff": True},
-                    is_superuser={"is_superuser": True}
-                )
+            user = self.build_user(user_obj)
+            if password_hash:
+                user.password = password_hash
             else:
-                user = self.user_service.create_user(
-                    base_params=base_params,
-                    role=custom_models.RoleType.PATIENT,
-                )
-            user.set_password(user_obj.get("password"))
+                user.set_password(user_obj.get("password"))
             user.save()
             return user
         except Exception as e:
             raise Exception(f"At create_user: {e}. user_obj dict must contain username, email, password and role key values.")
 
+    def import_users(self, rows: Iterable[dict], batch_size: int = 500, workers: Optional[int] = None) -> dict:
+        """
+        create users from a stream of rows, batch by batch
+
+        Rows are validated like `create_user` input, uniqueness is checked with
+        one query per batch, passwords are hashed and each batch is inserted
+        with `bulk_create`. Invalid rows are reported and skipped, they never
+        abort the batch.
+
+        Args:
+            rows: dicts with username, email, password and role keys, `None` for unreadable rows
+            batch_size: rows validated and inserted together
+            workers: password hashing processes started for this import, only
+                outside web workers. `None` hashes on the process wide `HashingExecutor`
+
+        Returns:
+            dict: count of created and failed rows, errors keyed by 1-based row number
+        """
+        report = {"created": 0, "failed": 0, "errors": []}
+        # identities claimed by earlier rows of this import
+        claimed = {"email": set(), "username": set()}
+        rows = enumerate(rows, start=1)
+        hashing = nullcontext(get_hashing_executor()) if workers is None else PasswordHashingPool(workers)
+        with hashing as hashing_pool:
+            while batch := list(islice(rows, batch_size)):
+                self._import_batch(batch, claimed, hashing_pool, report)
+        report["errors"].sort(key=lambda error: error["row"])
+        report["failed"] = len(report["errors"])
+        return report
+
+    def _import_batch(self, batch, claimed, hashing_pool, report) -> None:
+        valid = []
+        for row_number, row in batch:
+            user, errors = self._validate_import_row(row)
+            if errors:
+                report["errors"].append({"row": row_number, "errors": errors})
+            else:
+                valid.append((row_number, user, row["password"]))
+
+        taken = self.user_service.get_taken_identities(
+            emails=[user.email for _, user, _ in valid],
+            usernames=[user.username for _, user, _ in valid],
+        )
+        for email, username in taken:
+            claimed["email"].add(email)
+            claimed["username"].add(username)
+
+        unique = []
+        for row_number, user, password in valid:
+            errors = {
+                field: f"user with this {field} already exists."
+                for field in ("email", "username")
+                if getattr(user, field) in claimed[field]
+            }
+            if errors:
+                report["errors"].append({"row": row_number, "errors": errors})
+                continue
+            claimed["email"].add(user.email)
+            claimed["username"].add(user.username)
+            unique.append((row_number, user, password))
+
+        passwords = hashing_pool.hash_many([password for _, _, password in unique])
+        for (_, user, _), password in zip(unique, passwords):
+            user.password = password
+        report["created"] += self._insert_batch(unique, report)
+
+    def _insert_batch(self, unique, report) -> int:
+        try:
+            with transaction.atomic():
+                return len(self.user_service.bulk_create_users([user for _, user, _ in unique]))
+        except IntegrityError:
+            pass
+        # a concurrent writer took some identity, fall back to row by row
+        created = 0
+        for row_number, user, _ in unique:
+            try:
+                with transaction.atomic():
+                    self.user_service.bulk_create_users([user])
+                created += 1
+            except IntegrityError as e:
+                report["errors"].append({"row": row_number, "errors": {"row": str(e)}})
+        return created
+
+    def _validate_import_row(self, row) -> tuple:
+        """unsaved user for a valid row, field errors otherwise"""
+        if not isinstance(row, dict):
+            return None, {"row": "Row is not a valid object."}
+        errors = {}
+        for field in ("username", "email", "password"):
+            if not row.get(field):
+                errors[field] = "This field is required."
+        role = row.get("role") or custom_models.RoleType.PATIENT
+        if role not in custom_models.RoleType.values:
+            errors["role"] = f'"{role}" is not a valid choice.'
+        if errors:
+            return None, errors
+        try:
+            user = self.build_user({**row, "role": role})
+        except TypeError as e:
+            return None, {"row": str(e)}
+        for field in ("username", "email"):
+            try:
+                user._meta.get_field(field).clean(getattr(user, field), user)
+            except ValidationError as error:
+                errors[field] = " ".join(error.messages)
+        try:
+            password_validation.validate_password(row["password"], user)
+        except ValidationError as error:
+            errors["password"] = " ".join(error.messages)
+        return (None, errors) if errors else (user, None)
+
+
+    def get_bulk_queryset(self, id_list: Optional[List[uuid.UUID]] = None, filters: Optional[dict] = None) -> QuerySet[User]:
+        """
+        `User` queryset for bulk actions, selected by ids and/or filters
+
+        Args:
+            id_list: ids of the users to select
+            filters: `role` and/or `is_active` values the users must have
 
-    def update_user(self, user_obj: User) -> QuerySet[User]:
+        Returns:
+            QuerySet[User]: selected users, none if neither ids nor filters are given
+        """
+        if not id_list and not filters:
+            return self.user_service.get_all_users().none()
+        queryset = self.user_service.get_user_by_id_list(id_list) if id_list else self.user_service.get_all_users()
+        return queryset.filter(**(filters or {}))
+
+    def deactivate_user(self, user_obj: User) -> User:
+        """deactivate a user, only `is_active` is written whatever the state of `user_obj`"""
+        return self.user_service.deactivate_user(user_obj)
+
+    def bulk_deactivate_users(self, id_list: Optional[List[uuid.UUID]] = None, filters: Optional[dict] = None) -> int:
+        """deactivate selected active users in one statement, returns the affected count"""
+        queryset = self.get_bulk_queryset(id_list, filters).filter(is_active=True)
+        return self.user_service.bulk_update_users(queryset, is_active=False)
+
+    def bulk_reactivate_users(self, id_list: Optional[List[uuid.UUID]] = None, filters: Optional[dict] = None) -> int:
+        """reactivate selected inactive users in one statement, returns the affected count"""
+        queryset = self.get_bulk_queryset(id_list, filters).filter(is_active=False)
+        return self.user_service.bulk_update_users(queryset, is_active=True)
+
+    def bulk_change_role(self, role: custom_models.RoleType, id_list: Optional[List[uuid.UUID]] = None, filters: Optional[dict] = None) -> int:
+        """give selected users `role` and its permissions in one statement, returns the affected count"""
+        queryset = self.get_bulk_queryset(id_list, filters).exclude(role=role)
+        return self.user_service.bulk_update_users(
+            queryset, role=role, **self.user_service.get_role_permissions(role)
+        )
+
+    def update_user(self, user_obj: User, changes: dict, version: Optional[int] = None) -> User:
         """
-        update user based on role
+        update user based on role, only the columns that change are written
 
         Args:
-            user_obj: instance of user form
+            user_obj: `User` object as read from the database
+            changes: new username, email and/or role
+            version: version of the user the changes were made against, without one the
+                changes are made against the current row
 
         Returns:
             User: updated user instance
 
+        Raises:
+            ConcurrentUpdateException: the user was updated by someone else in the meantime
         """
         try:
-            user_id = user_obj.id
-            base_params = {"username": user_obj.username, "email": user_obj.email}
-            role = user_obj.role if user_obj.role else custom_models.RoleType.PATIENT
-            base_permissions = {"is_staff": True} if role == custom_models.RoleType.STAFF or role == custom_models.RoleType.SUPERUSER else None
-            is_superuser = {"is_superuser": True} if role == custom_models.RoleType.SUPERUSER else None
-            return self.user_service.update_user(
-                    user_id=user_id,
-                    base_params=base_params,
-                    role=role,
-                    base_permissions=base_permissions,
-                    is_superuser=is_superuser
-                )  
+            if version is None:
+                # no check asked for, `user_obj` may come from the cache and be stale
+                user_obj = self.user_service.get_user_from_primary(id=user_obj.id)
+                version = user_obj.version
+            role = changes.get("role") or user_obj.role or custom_models.RoleType.PATIENT
+            target = {
+                "username": changes.get("username") or user_obj.username,
+                "email": changes.get("email") or user_obj.email,
+                "role": role,
+                **self.user_service.get_role_permissions(role),
+            }
+            fields = {
+                field: value for field, value in target.items() if getattr(user_obj, field) != value
+            }
+            if not fields:
+                return user_obj
+            return self.user_service.update_user_fields(user_obj, version, fields)
+        except ConcurrentUpdateException:
+            raise
         except Exception as e:
-            raise Exception(f"At update_user: {e}. user_obj is an instance of User object with updated values.")
-    
+            raise Exception(f"At update_user: {e}. user_obj is an instance of User object, changes are the updated values.")
+
     def get_user_token(self, user:User) -> dict:
         """
         generate access and refresh token for the user 
@@ -232,7 +479,9 @@ class UserAppService:
         """
         try:
             token = RefreshToken.for_user(user)
-            token["email"] = user.email
+            # claims let requests authenticate without loading the user row
+            set_user_claims(token, user)
+            get_token_family_store().start_family(token)
             data = {
                 "id": user.id,
                 "username": user.username,
@@ -247,12 +496,8 @@ class UserAppService:
     
     def forgot_password(self, user:User) -> dict:
         try:
-            #get otp -> delete if exists
-            otp_obj = self.user_service.get_otp_by_user_id(user_id=user.id)
-            if otp_obj:
-                otp_obj.delete()
+            # replaces a pending otp of the user
             otp = self.user_service.create_otp(user=user)
-            otp.save()
             response_data = {
                 'id': user.id,
                 'username': user.username,
@@ -265,34 +510,156 @@ class UserAppService:
             raise Exception(f"At forgot_password: {e}")
     
     def verify_otp(self, otp:int, user_id:uuid.UUID) -> UserOTP:
+        """matching otp of the user, used up by the check, `None` when it doesn't match"""
         try:
             otp_obj = self.user_service.get_otp_by_user_id(user_id=user_id)
-            if otp_obj.otp == otp:
-                #check for otp expiration
-                if not otp_obj.is_otp_expired():
-                    return otp_obj
+            # expired otps are gone from the store
+            if otp_obj is None:
                 raise OTPExpireException("Your OTP has expired")
+            if otp_obj.otp == otp and self.user_service.consume_otp_token(user_id, otp_obj.otp_token):
+                return otp_obj
         except OTPExpireException:
-            otp_obj.delete
-            raise OTPExpireException
+            raise
         except Exception as e:
             raise Exception(f"At verify_otp: {e}")
+
+    def make_reset_token(self, user: User) -> str:
+        """signed token allowing `user` to reset the password once, see `ResetTokenGenerator`"""
+        return reset_token_generator.make_token(user)
+
+    def check_reset_token(self, reset_token, user_id: uuid.UUID) -> bool:
+        """check a token of `make_reset_token` against the current password of the user"""
+        # the token is used up by the password change, only the primary knows it happened
+        user = self.user_service.get_user_from_primary(id=user_id, is_active=True)
+        return bool(reset_token) and reset_token_generator.check_token(user, reset_token)
     
     def set_new_password(self, user_id: uuid.UUID, new_password:str) -> bool:
+        """store the new password of the user and end every session opened with the old one"""
         try:
-            user = self.user_service.get_user_by_id(id=user_id)
-            user.set_password(new_password)
-            user.save()
+            self.save_password_hash(user_id, make_password(new_password))
+            self.user_service.end_sessions([user_id])
             return True
         except Exception as e:
             raise Exception(f"At set_new_password: {e}")
+
+    def save_password_hash(self, user_id: uuid.UUID, password_hash: str) -> bool:
+        """store an already hashed password for the user"""
+        user = self.user_service.get_user_by_id(id=user_id)
+        user.password = password_hash
+        # the user may come from the cache, don't write back its other columns
+        user.save(update_fields=["password", "modified_at"])
+        return True
         
-    def reset_password(self, otp_token, user_id:uuid.UUID, new_password) -> bool:
+    def reset_password(self, reset_token, user_id:uuid.UUID, new_password) -> bool:
         try:
-            otp_obj = self.user_service.get_otp_by_user_id(user_id=user_id)
-            if otp_obj.otp_token == otp_token:
-                otp_obj.delete()
+            if self.check_reset_token(reset_token, user_id):
                 return self.set_new_password(user_id=user_id, new_password=new_password)
             return False
         except Exception as e:
-            raise Exception(f"At reset_password: {e}")
\ No newline at end of file
+            raise Exception(f"At reset_password: {e}")
+
+    def authenticate_user(self, email: str, password: str) -> Optional[User]:
+        """
+        active user with `email` and `password`, `None` when the password is wrong
+
+        The user is looked up once by its unique email, unlike `authenticate()`
+        after an existence check, and read from the primary past the caches.
+        Passwords stored with outdated hasher parameters are rehashed.
+
+        Raises:
+            User.DoesNotExist: no user has this email
+        """
+        user = self.user_service.get_user_from_primary(email=email)
+        is_correct, must_update = verify_password(password, user.password)
+        if not is_correct or not user.is_active:
+            return None
+        if must_update:
+            self.save_password_hash(user.id, make_password(password))
+        return user
+
+    def login(self, email: str, password: str) -> Optional[dict]:
+        """
+        tokens of the user with `email` and `password`, `None` when the password is wrong
+
+        Raises:
+            User.DoesNotExist: no user has this email
+        """
+        user = self.authenticate_user(email, password)
+        return self.complete_login(user) if user else None
+
+    def complete_login(self, user: User) -> dict:
+        """mint the tokens of an authenticated user and record the login"""
+        response_data = self.get_user_token(user)
+        if jwt_settings.UPDATE_LAST_LOGIN:
+            self.record_last_login(user.id)
+        return response_data
+
+    def logout(self, token) -> None:
+        """
+        revoke the access token of the request, it is refused until it expires,
+        and the refresh tokens of its login
+        """
+        revoke_token(token)
+        get_token_family_store().end_family(token)
+
+    def record_last_login(self, user_id: uuid.UUID) -> None:
+        """store the login time off the token path, batched when write-behind is on"""
+        last_login = timezone.now()
+        if settings.LAST_LOGIN_FLUSH_INTERVAL > 0:
+            self.user_service.get_last_login_buffer().add(user_id, last_login)
+            return
+        transaction.on_commit(lambda: self.user_service.set_last_login(user_id, last_login))
+
+    async def aauthenticate_user(self, email: str, password: str) -> Optional[User]:
+        """
+        async counterpart of `authenticate_user`, the password is checked on the hashing pool
+
+        Raises:
+            User.DoesNotExist: no user has this email
+            HashingPoolFull: too many password checks are in progress
+        """
+        executor = get_hashing_executor()
+        user = await self.user_service.aget_user_from_primary(email=email)
+        is_correct, must_update = await executor.averify_password(password, user.password)
+        if not is_correct or not user.is_active:
+            return None
+        if must_update:
+            # stored with outdated hasher parameters
+            password_hash = await executor.amake_password(password)
+            await self.asave_password_hash(user.id, password_hash)
+        return user
+
+    async def alogin(self, email: str, password: str) -> Optional[dict]:
+        """async counterpart of `login`"""
+        user = await self.aauthenticate_user(email, password)
+        return await sync_to_async(self.complete_login)(user) if user else None
+
+    async def acreate_user(self, user_obj: dict) -> User:
+        """`create_user` with the password hashed on the hashing pool"""
+        password_hash = await get_hashing_executor().amake_password(user_obj.get("password"))
+        return await sync_to_async(self.create_user)(user_obj, password_hash)
+
+    async def aset_new_password(self, user_id: uuid.UUID, new_password: str) -> bool:
+        """`set_new_password` with the password hashed on the hashing pool"""
+        password_hash = await get_hashing_executor().amake_password(new_password)
+        await self.asave_password_hash(user_id, password_hash)
+        await sync_to_async(self.user_service.end_sessions)([user_id])
+        return True
+
+    async def asave_password_hash(self, user_id: uuid.UUID, password_hash: str) -> bool:
+        """async counterpart of `save_password_hash`"""
+        user = await self.user_service.aget_user_by_id(id=user_id)
+        user.password = password_hash
+        await user.asave(update_fields=["password", "modified_at"])
+        return True
+
+    async def acheck_reset_token(self, reset_token, user_id: uuid.UUID) -> bool:
+        """async counterpart of `check_reset_token`"""
+        user = await self.user_service.aget_user_from_primary(id=user_id, is_active=True)
+        return bool(reset_token) and reset_token_generator.check_token(user, reset_token)
+
+    async def areset_password(self, reset_token, user_id: uuid.UUID, new_password) -> bool:
+        """`reset_password` with the password hashed on the hashing pool"""
+        if await self.acheck_reset_token(reset_token, user_id):
+            return await self.aset_new_password(user_id, new_password)
+        return False
@@ -30,7 +30,7 @@ class BasePatientParams:
     address: str
 
 
-class Patient(models.Model):
+class Patient(custom_models.DatedModel):
     """Represents a Patient's Information"""
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
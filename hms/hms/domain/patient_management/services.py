@@ -1,9 +1,18 @@
 import uuid
 
+from django.db.models import OuterRef, Subquery
 from django.db.models.manager import BaseManager
 from django.db.models.query import QuerySet
 
 from .models import PatientID, Patient, PatientFactory
+from hms.domain.user_management.models import User
+from lib.django.custom_identity_map import (
+    get_identity_map,
+    load_entity,
+    record_joined_queries,
+    remember_entity,
+)
+from lib.django.custom_routers import get_replica_manager
 
 class PatientService:
     """encapsulates domain specific operations for Patient"""
@@ -20,6 +29,10 @@ class PatientService:
         # services for repo action used consistently is created separately
         return Patient.objects
 
+    @staticmethod
+    def get_replica_patient_repo() -> BaseManager[Patient]:
+        """returns `Patient` objects read from a replica when there is one"""
+        return get_replica_manager(Patient.objects)
 
     def get_patient_by_id(self, id: PatientID) -> QuerySet[Patient]:
         """
@@ -29,7 +42,7 @@ class PatientService:
         Returns:
             QuerySet[Patient]: `Patient` object
         """
-        return self.get_patient_repo().get(id=id)
+        return load_entity(Patient, lambda: self.get_replica_patient_repo().get(id=id), pk=id)
     
     def get_patient_by_user_id(self, id: uuid.UUID) -> QuerySet[Patient]:
         """
@@ -39,11 +52,47 @@ class PatientService:
         Returns:
             QuerySet[Patient]: `Patient` object
         """
-        return self.get_patient_repo().get(user_id=id)
+        return load_entity(Patient, lambda: self.get_replica_patient_repo().get(user_id=id), user_id=id)
+
+    def get_patient_by_username(self, username: str) -> Patient:
+        """
+        returns `Patient` object of the user with `username`, in one query
+        Args:
+            username: username of the `User` object
+        Returns:
+            Patient: `Patient` object
+        """
+        identity_map = get_identity_map()
+        user = identity_map.get(User, "username", username) if identity_map else None
+        if user is not None:
+            return self.get_patient_by_user_id(user.id)
+        user_id = User.objects.filter(username=username).values("id")[:1]
+        patient = remember_entity(self.get_replica_patient_repo().get(user_id=Subquery(user_id)), "user_id")
+        record_joined_queries()
+        return patient
+
+    def get_patient_username(self, id: PatientID) -> str:
+        """
+        returns username of the `User` behind the `Patient` with `id`, in one query
+        Args:
+            id (PatientID): id of the `Patient` object
+        Returns:
+            str: username
+        """
+        username = User.objects.filter(id=OuterRef("user_id")).values("username")[:1]
+        username = (
+            self.get_replica_patient_repo()
+            .filter(id=id)
+            .annotate(username=Subquery(username))
+            .values_list("username", flat=True)
+            .get()
+        )
+        record_joined_queries()
+        return username
 
     def get_patient_list(self) -> QuerySet[Patient]:
-        """returns `Patient` list """
-        return self.get_patient_repo().all()
+        """returns `Patient` list ordered by name, `id` breaks ties for keyset pagination"""
+        return self.get_replica_patient_repo().order_by("patient_name", "id")
     
     def create_patient_info(self, user_id:uuid.UUID, patient:dict) -> Patient:
         """creates patient information for given user id"""
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class UserManagementConfig(AppConfig):
+    name = "hms.domain.user_management"
+    label = "user_management"
+
+    def ready(self):
+        from . import signals  # noqa: F401
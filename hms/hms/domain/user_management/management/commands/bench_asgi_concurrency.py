@@ -0,0 +1,92 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import User
+from lib.django.custom_models import RoleType
+
+
+class Command(BaseCommand):
+    help = "Compare the user endpoints served by sync WSGI threads and async ASGI views under concurrent load"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+        parser.add_argument("--endpoint", choices=["list", "retrieve"], nargs="+", default=["list", "retrieve"])
+
+    def handle(self, *args, **options):
+        user = User(
+            username=f"bench-{uuid.uuid4().hex[:8]}",
+            email=f"bench-{uuid.uuid4().hex[:8]}@bench.local",
+            role=RoleType.STAFF,
+            is_staff=True,
+        )
+        user.set_password(uuid.uuid4().hex)
+        user.save()
+        headers = {"Authorization": f"{settings.SIMPLE_JWT['AUTH_HEADER_TYPES'][0]} {UserAppService().get_user_token(user)['access token']}"}
+        try:
+            self.stdout.write(f"{'endpoint':>9} {'server':>6} {'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+            for endpoint in options["endpoint"]:
+                name, kwargs = ("user-list", {}) if endpoint == "list" else ("user-detail", {"pk": user.id})
+                for concurrency in options["concurrency"]:
+                    wsgi = self.run_wsgi(reverse(name, kwargs=kwargs), headers, options["requests"], concurrency)
+                    asgi = async_to_sync(self.run_asgi)(
+                        reverse(name, kwargs=kwargs, urlconf=settings.ASGI_URLCONF), headers, options["requests"], concurrency
+                    )
+                    for server, (rate, latencies) in (("wsgi", wsgi), ("asgi", asgi)):
+                        latencies.sort()
+                        self.stdout.write(
+                            f"{endpoint:>9} {server:>6} {concurrency:>8} {rate:>8.1f} "
+                            f"{latencies[len(latencies) // 2] * 1000:>8.1f} {latencies[int(len(latencies) * 0.99)] * 1000:>8.1f}"
+                        )
+        finally:
+            user.delete()
+
+    @staticmethod
+    def check_response(response):
+        if response.status_code != 200:
+            raise RuntimeError(f"request failed: {response.status_code} {response.content[:200]}")
+
+    def run_wsgi(self, url, headers, requests, concurrency):
+        """`concurrency` threads sharing the requests, like a threaded WSGI server"""
+        client = Client()
+        latencies = []
+
+        def get(_):
+            started = time.perf_counter()
+            self.check_response(client.get(url, headers=headers))
+            latencies.append(time.perf_counter() - started)
+
+        def close(_):
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(get, range(requests)))
+            list(executor.map(close, range(concurrency)))
+        return requests / (time.perf_counter() - started), latencies
+
+    async def run_asgi(self, url, headers, requests, concurrency):
+        """`concurrency` requests in flight on one event loop, like a single ASGI worker"""
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def get():
+            async with semaphore:
+                started = time.perf_counter()
+                self.check_response(await client.get(url, headers=headers))
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(get() for _ in range(requests)))
+        return requests / (time.perf_counter() - started), latencies
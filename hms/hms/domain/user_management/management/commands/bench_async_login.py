@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.urls import reverse
+
+from hms.domain.user_management.models import User
+from lib.django.custom_hashing import configure_hashing_executor
+from lib.django.custom_models import RoleType
+
+
+class Command(BaseCommand):
+    help = "Load test the async login view through the ASGI handler with growing hashing pools"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=64)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--workers", type=int, nargs="+",
+            help="hashing pool sizes to compare, powers of two up to the number of cores by default",
+        )
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        workers = options["workers"] or [2 ** power for power in range(cores.bit_length()) if 2 ** power <= cores]
+        password = uuid.uuid4().hex
+        user = User(username=f"bench-{uuid.uuid4().hex[:8]}", email=f"bench-{uuid.uuid4().hex[:8]}@bench.local", role=RoleType.PATIENT)
+        user.set_password(password)
+        user.save()
+        try:
+            self.stdout.write(f"{'workers':>8} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'503s':>6}")
+            for size in workers:
+                # the queue holds every request so the pool, not backpressure, is measured
+                configure_hashing_executor(workers=size, max_queue=options["requests"])
+                rate, latencies, rejected = async_to_sync(self.run_logins)(
+                    user.email, password, options["requests"], options["concurrency"]
+                )
+                latencies.sort()
+                self.stdout.write(
+                    f"{size:>8} {rate:>10.1f} {latencies[len(latencies) // 2] * 1000:>8.0f} "
+                    f"{latencies[int(len(latencies) * 0.99)] * 1000:>8.0f} {rejected:>6}"
+                )
+        finally:
+            user.delete()
+            configure_hashing_executor(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
+
+    async def run_logins(self, email, password, requests, concurrency):
+        client = AsyncClient()
+        url = reverse("auth-login", urlconf=settings.ASGI_URLCONF)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        rejected = 0
+
+        async def login():
+            nonlocal rejected
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, {"email": email, "password": password}, content_type="application/json")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code == 503:
+                    rejected += 1
+                elif response.status_code != 200 or "data" not in response.json():
+                    raise RuntimeError(f"login failed: {response.status_code} {response.content[:200]}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(requests)))
+        return requests / (time.perf_counter() - started), latencies, rejected
@@ -0,0 +1,87 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer
+
+from hms.domain.user_management.models import User
+from hms.interfaces.user_management.serializers import UserListValuesSerializer
+from lib.django.custom_compression import get_codecs
+from lib.django.custom_models import RoleType
+from lib.django.custom_renderers import EnvelopeJSONRenderer
+from lib.django.custom_response import CustomResponse
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 9, 11], "zstd": [1, 3, 9, 19]}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure bytes saved against CPU spent by each installed codec and level on API payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="users in the list payload")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            # benchmark users are inserted in a transaction that is always rolled back
+            with transaction.atomic():
+                payloads = self.get_payloads(options["rows"])
+                raise Rollback
+        except Rollback:
+            pass
+        codecs = get_codecs()
+        self.stdout.write(f"codecs: {', '.join(codecs)}")
+        self.stdout.write(
+            f"{'payload':>8} {'codec':>5} {'level':>5} {'bytes':>10} {'saved':>10} {'ratio':>6} {'cpu ms':>8} {'MB/s':>8}"
+        )
+        for payload_name, payload in payloads.items():
+            self.stdout.write(f"{payload_name:>8} {'-':>5} {'-':>5} {len(payload):>10,}")
+            for codec in codecs.values():
+                for level in LEVELS[codec.name]:
+                    compressed, cpu = self.best_of(lambda: codec.compress(payload, level), options["repeat"])
+                    self.stdout.write(
+                        f"{payload_name:>8} {codec.name:>5} {level:>5} {len(compressed):>10,} "
+                        f"{len(payload) - len(compressed):>10,} {len(payload) / len(compressed):>6.1f} "
+                        f"{cpu * 1000:>8.2f} {len(payload) / cpu / 1e6:>8.1f}"
+                    )
+
+    def get_payloads(self, rows) -> dict:
+        User.objects.bulk_create(
+            [
+                User(
+                    id=uuid.uuid4(),
+                    username=f"bench-{index}-{uuid.uuid4().hex[:8]}",
+                    email=f"bench-{index}-{uuid.uuid4().hex[:8]}@bench.local",
+                    password="!",
+                    role=RoleType.PATIENT,
+                )
+                for index in range(rows)
+            ],
+            batch_size=5000,
+        )
+        queryset = User.objects.filter(username__startswith="bench-").order_by("date_joined", "id")
+        values_serializer = UserListValuesSerializer()
+        users = values_serializer.to_representation(values_serializer.get_queryset(queryset))
+        renderer = EnvelopeJSONRenderer()
+        return {
+            "list": renderer.render(CustomResponse(message="list data", data=users).success_message().data),
+            "export": b"".join(renderer.dumps(user) + b"\n" for user in users),
+            "schema": OpenApiJsonRenderer().render(SchemaGenerator().get_schema(request=None, public=True)),
+        }
+
+    @staticmethod
+    def best_of(func, repeat) -> tuple:
+        """result of `func` and its lowest CPU time"""
+        timings = []
+        for _ in range(repeat):
+            started = time.process_time()
+            result = func()
+            timings.append(time.process_time() - started)
+        return result, max(min(timings), 1e-6)
@@ -0,0 +1,79 @@
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rest_framework.renderers import JSONRenderer
+
+from hms.domain.user_management.models import User
+from hms.interfaces.user_management.serializers import UserListValuesSerializer
+from lib.django.custom_models import RoleType
+from lib.django.custom_renderers import EnvelopeJSONRenderer
+from lib.django.custom_response import CustomResponse
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of DRF's JSONRenderer against EnvelopeJSONRenderer on user list envelopes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>8} {'JSONRenderer rows/s':>20} {'envelope rows/s':>16} {'speedup':>8}")
+        for rows in options["rows"]:
+            try:
+                # benchmark users are inserted in a transaction that is always rolled back
+                with transaction.atomic():
+                    self.create_users(rows)
+                    self.report(rows, options["repeat"])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def create_users(self, rows):
+        User.objects.bulk_create(
+            [
+                User(
+                    id=uuid.uuid4(),
+                    username=f"bench-{index}-{uuid.uuid4().hex[:8]}",
+                    email=f"bench-{index}-{uuid.uuid4().hex[:8]}@bench.local",
+                    password="!",
+                    role=RoleType.PATIENT,
+                )
+                for index in range(rows)
+            ],
+            batch_size=5000,
+        )
+
+    def report(self, rows, repeat):
+        queryset = User.objects.filter(username__startswith="bench-").order_by("date_joined", "id")
+        values_serializer = UserListValuesSerializer()
+        data = CustomResponse(
+            message="list data",
+            data=values_serializer.to_representation(values_serializer.get_queryset(queryset)),
+        ).success_message().data
+        drf_renderer, envelope_renderer = JSONRenderer(), EnvelopeJSONRenderer()
+
+        if json.loads(drf_renderer.render(data)) != json.loads(envelope_renderer.render(data)):
+            raise AssertionError("envelope renderer output differs from JSONRenderer")
+        drf_rate = rows / self.best_of(lambda: drf_renderer.render(data), repeat)
+        envelope_rate = rows / self.best_of(lambda: envelope_renderer.render(data), repeat)
+        self.stdout.write(
+            f"{rows:>8} {drf_rate:>20,.0f} {envelope_rate:>16,.0f} {envelope_rate / drf_rate:>7.1f}x"
+        )
+
+    @staticmethod
+    def best_of(func, repeat) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hms.domain.user_management.models import User
+from hms.interfaces.user_management.serializers import UserListViewSerializer, UserListValuesSerializer
+from lib.django.custom_models import RoleType
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of UserListViewSerializer against the values_list() fast path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>8} {'serializer rows/s':>18} {'values rows/s':>14} {'speedup':>8}")
+        for rows in options["rows"]:
+            try:
+                # benchmark users are inserted in a transaction that is always rolled back
+                with transaction.atomic():
+                    self.create_users(rows)
+                    self.report(rows, options["repeat"])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def create_users(self, rows):
+        User.objects.bulk_create(
+            [
+                User(
+                    id=uuid.uuid4(),
+                    username=f"bench-{index}-{uuid.uuid4().hex[:8]}",
+                    email=f"bench-{index}-{uuid.uuid4().hex[:8]}@bench.local",
+                    password="!",
+                    role=RoleType.PATIENT,
+                )
+                for index in range(rows)
+            ],
+            batch_size=5000,
+        )
+
+    def report(self, rows, repeat):
+        queryset = User.objects.filter(username__startswith="bench-").order_by("date_joined", "id")
+        values_serializer = UserListValuesSerializer()
+
+        def model_path():
+            return UserListViewSerializer(list(queryset), many=True).data
+
+        def values_path():
+            return values_serializer.to_representation(values_serializer.get_queryset(queryset))
+
+        if model_path() != values_path():
+            raise AssertionError("fast path output differs from UserListViewSerializer")
+        model_rate = rows / self.best_of(model_path, repeat)
+        values_rate = rows / self.best_of(values_path, repeat)
+        self.stdout.write(
+            f"{rows:>8} {model_rate:>18,.0f} {values_rate:>14,.0f} {values_rate / model_rate:>7.1f}x"
+        )
+
+    @staticmethod
+    def best_of(func, repeat) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hms.domain.user_management.services import UserService
+
+
+class Command(BaseCommand):
+    help = "Build the user search index, saved users keep it up to date afterwards"
+
+    def handle(self, *args, **options):
+        user_service = UserService()
+        backend = user_service.get_search_backend()
+        started = time.perf_counter()
+        # indexes are created on the database of the queryset, never a replica
+        stats = backend.build(user_service.get_user_repo().all())
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{type(backend).__name__} built in {elapsed:.2f}s: {stats}"
+            )
+        )
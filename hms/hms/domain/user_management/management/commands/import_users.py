@@ -0,0 +1,44 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hms.application.user_management.services import UserAppService
+from lib.django.utils import iter_csv_rows, iter_ndjson_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk create users from a CSV or NDJSON file of username, email, password and role"
+
+    readers = {"csv": iter_csv_rows, "ndjson": iter_ndjson_rows}
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--input", choices=list(self.readers), help="defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=None, help="password hashing processes, defaults to the cpu count")
+
+    def handle(self, *args, **options):
+        input_format = options["input"] or options["path"].rsplit(".", 1)[-1].lower()
+        if input_format not in self.readers:
+            raise CommandError("Pass --input csv or --input ndjson")
+
+        started = time.perf_counter()
+        with open(options["path"], "rb") as source:
+            report = UserAppService().import_users(
+                self.readers[input_format](source),
+                batch_size=options["batch_size"],
+                # a command owns its process, hashing can fan out to a process pool
+                workers=options["workers"] or os.cpu_count() or 1,
+            )
+        elapsed = time.perf_counter() - started
+
+        for error in report["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        rows = report["created"] + report["failed"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['created']} created, {report['failed']} failed "
+                f"in {elapsed:.2f}s ({rows / elapsed if elapsed else rows:,.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hms.domain.user_management.services import UserService
+
+
+class Command(BaseCommand):
+    help = "Delete expired UserOTP rows in chunks, once or every --every seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="rows deleted per statement")
+        parser.add_argument("--pause", type=float, default=0.05, help="seconds between chunks")
+        parser.add_argument("--every", type=float, default=0, help="keep running, purging every given seconds")
+
+    def handle(self, *args, **options):
+        user_service = UserService()
+        while True:
+            started = time.perf_counter()
+            deleted = user_service.purge_expired_otps(options["chunk_size"], options["pause"])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"purged {deleted} expired OTPs in {elapsed:.2f}s ({deleted / elapsed if elapsed else 0:.0f} rows/s)"
+                )
+            )
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
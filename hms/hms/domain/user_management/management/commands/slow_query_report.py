@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from lib.django.custom_slow_queries import get_fingerprint, normalize_sql, read_slow_queries
+
+SORT_KEYS = {
+    "total": lambda shape: shape["total"],
+    "max": lambda shape: shape["durations"][-1],
+    "count": lambda shape: len(shape["durations"]),
+    "p95": lambda shape: percentile(shape["durations"], 0.95),
+}
+
+
+def percentile(durations, rank) -> float:
+    """nearest rank percentile of sorted `durations`"""
+    return durations[min(len(durations) - 1, int(rank * len(durations)))]
+
+
+class Command(BaseCommand):
+    help = "Summarize the slow query log by normalized query shape, worst shapes first"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="*", help="slow query logs, SLOW_QUERY_LOG_FILE by default")
+        parser.add_argument("--top", type=int, default=10)
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total")
+        parser.add_argument("--view", help="only queries run by this URL name")
+
+    def handle(self, *args, **options):
+        paths = options["files"] or [settings.SLOW_QUERY_LOG_FILE]
+        try:
+            shapes = self.group(read_slow_queries(paths), options["view"])
+        except OSError as exc:
+            raise CommandError(exc)
+        if not shapes:
+            self.stdout.write("no slow queries")
+            return
+        worst = sorted(shapes.values(), key=SORT_KEYS[options["sort"]], reverse=True)[: options["top"]]
+        self.stdout.write(f"{sum(len(shape['durations']) for shape in shapes.values())} slow queries, {len(shapes)} shapes")
+        for shape in worst:
+            durations = shape["durations"]
+            self.stdout.write("")
+            self.stdout.write(
+                f"{shape['fingerprint']}  count {len(durations)}  total {shape['total']:.1f} ms  "
+                f"p50 {percentile(durations, 0.5):.1f} ms  p95 {percentile(durations, 0.95):.1f} ms  "
+                f"max {durations[-1]:.1f} ms"
+            )
+            self.stdout.write(f"  views:   {self.most_common(shape['views'])}")
+            self.stdout.write(f"  callers: {self.most_common(shape['callers'])}")
+            self.stdout.write(f"  {shape['shape']}")
+            for line in shape["plan"] or ():
+                self.stdout.write(f"    {line}")
+
+    @staticmethod
+    def group(records, view=None) -> dict:
+        """durations, views, callers and the latest plan of the records by query shape"""
+        shapes = {}
+        for record in records:
+            if view and record.get("view") != view:
+                continue
+            shape = normalize_sql(record["sql"])
+            fingerprint = get_fingerprint(shape)
+            group = shapes.get(fingerprint)
+            if group is None:
+                group = shapes[fingerprint] = {
+                    "fingerprint": fingerprint, "shape": shape, "durations": [], "total": 0.0,
+                    "views": Counter(), "callers": Counter(), "plan": None,
+                }
+            duration = float(record.get("duration_ms", 0))
+            group["durations"].append(duration)
+            group["total"] += duration
+            group["views"][record.get("view") or "-"] += 1
+            group["callers"][record.get("caller") or "-"] += 1
+            if record.get("plan"):
+                group["plan"] = record["plan"]
+        for group in shapes.values():
+            group["durations"].sort()
+        return shapes
+
+    @staticmethod
+    def most_common(counter, limit=3) -> str:
+        return ", ".join(f"{name} ({count})" for name, count in counter.most_common(limit))
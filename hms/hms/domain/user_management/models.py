@@ -8,12 +8,15 @@ import os
 
 # from django.contrib import admin
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.db import models
+from django.db import models, router
 from django.conf import settings
+from django.utils import timezone
 from django.utils.timezone import get_default_timezone
 from django.urls import reverse_lazy
 
 from lib.django import custom_models
+from lib.django.custom_authentication import TokenInvalidation
+from lib.django.custom_exceptions import ConcurrentUpdateException
 from lib.django.utils import generate_otp
 
 
@@ -83,7 +86,7 @@ class UserManagerAutoID(UserManager):
         return super().create_superuser(username, email, password, **extra_fields)
 
 
-class User(AbstractUser):
+class User(AbstractUser, custom_models.DatedModel):
     """Represents a User"""
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -93,6 +96,8 @@ class User(AbstractUser):
         max_length=10,
         default=custom_models.RoleType.PATIENT,
     )
+    # bumped by every update, compared on write to detect concurrent edits
+    version = models.PositiveIntegerField(default=1)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -100,13 +105,58 @@ class User(AbstractUser):
     objects = UserManagerAutoID()
 
     def update_entity(self, base_params:BaseUserParams, role:custom_models.RoleType, base_permissions:BaseUserPermissions, is_superuser:SuperUserPermission):
+        claims = (self.role, self.is_staff, self.is_active, self.is_superuser)
         self.username = base_params.username if base_params.username else self.username
         self.email = base_params.email if base_params.email else self.email
         self.role = role if role else self.role
         self.is_staff = base_permissions.is_staff
         self.is_active = base_permissions.is_active
         self.is_superuser = is_superuser
+        self.version += 1
         self.save()
+        # tokens carry role and permissions as claims, stale ones must be refused
+        if claims != (self.role, self.is_staff, self.is_active, self.is_superuser):
+            TokenInvalidation.invalidate(self.id)
+        return self
+
+    def update_fields(self, version:int, **fields):
+        """
+        write only `fields` in one UPDATE, provided the row is still at `version`
+
+        Raises:
+            ConcurrentUpdateException: the row was updated after `version` was read
+        """
+        # UPDATE statements skip auto_now, modified_at is set along with the fields
+        fields["modified_at"] = timezone.now()
+        updated = User.objects.filter(id=self.id, version=version).update(
+            version=models.F("version") + 1, **fields
+        )
+        if not updated:
+            raise ConcurrentUpdateException(f"User {self} was modified by someone else, reload it and retry")
+        claims = (self.role, self.is_staff, self.is_active, self.is_superuser)
+        for field, value in fields.items():
+            setattr(self, field, value)
+        self.version = version + 1
+        if claims != (self.role, self.is_staff, self.is_active, self.is_superuser):
+            TokenInvalidation.invalidate(self.id)
+        return self
+
+    def deactivate(self):
+        """
+        set `is_active` off with one UPDATE of the row
+
+        Only `is_active` is written: this instance may come from the user cache
+        and a full `save()` would put its stale columns back over newer changes.
+        """
+        now = timezone.now()
+        User.objects.filter(id=self.id).update(
+            is_active=False, modified_at=now, version=models.F("version") + 1
+        )
+        self.is_active = False
+        self.modified_at = now
+        # the new version is only known to the primary
+        self.refresh_from_db(using=router.db_for_write(User), fields=["version"])
+        TokenInvalidation.invalidate(self.id)
         return self
     
     def __str__(self):
@@ -123,7 +173,7 @@ class UserOTP(models.Model):
     """Represents otp for user"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     otp = models.IntegerField(null=True, blank=True)
-    otp_expiration = models.DateTimeField(null=True, blank=True)
+    otp_expiration = models.DateTimeField(null=True, blank=True, db_index=True)
     user = models.OneToOneField(null=True, to=User, on_delete=models.CASCADE)
     otp_token = models.CharField(max_length=40, null=True)
     
@@ -132,6 +182,23 @@ class UserOTP(models.Model):
         return self.otp_expiration < datetime.datetime.now(tz=tz)
 
 
+class RevokedToken(models.Model):
+    """token revoked before its expiry, e.g. on logout, kept until it expires"""
+    jti = models.CharField(max_length=64, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class RefreshTokenFamily(models.Model):
+    """refresh tokens rotated from one login, only the newest may be used"""
+    id = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE)
+    current_jti = models.CharField(max_length=64)
+    generation = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+
 class UserFactory:
     """Factory class to create User"""
 
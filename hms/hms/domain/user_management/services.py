@@ -1,8 +1,13 @@
 import uuid
+from functools import cache
 from typing import List
 
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, DateTimeField, F, Q, Value, When
 from django.db.models.manager import BaseManager
 from django.db.models.query import QuerySet
+from django.utils import timezone
 
 from .models import (
     UserID,
@@ -14,7 +19,18 @@ from .models import (
     UserOTP,
     UserOTPFactory
 )
+from lib.django.custom_authentication import TokenInvalidation
+from lib.django.custom_entity_cache import EntityCache
+from lib.django.custom_identity_map import aload_entity, forget_entities, load_entity
 from lib.django.custom_models import RoleType
+from lib.django.custom_otp_store import BaseOTPStore, load_otp_store
+from lib.django.custom_purge import purge_in_chunks
+from lib.django.custom_routers import get_replica_manager
+from lib.django.custom_search import BaseSearchBackend, load_search_backend
+from lib.django.custom_token_family import TokenFamilyStore, get_token_family_store
+from lib.django.custom_write_behind import WriteBehindBuffer
+
+USER_SEARCH_FIELDS = ("username", "email")
 
 
 class UserService:
@@ -31,6 +47,16 @@ class UserService:
         # expose whole repository as a service
         # services for repo action used consistently is created separately
         return User.objects
+
+    @staticmethod
+    def get_replica_user_repo() -> BaseManager[User]:
+        """returns `User` objects read from a replica when there is one, for reads that may lag"""
+        return get_replica_manager(User.objects)
+
+    @staticmethod
+    def get_primary_user_repo() -> BaseManager[User]:
+        """returns `User` objects read from the primary database, replicas may lag behind it"""
+        return User.objects.db_manager(DEFAULT_DB_ALIAS)
     
     @staticmethod
     def get_otp_factory() -> UserOTPFactory:
@@ -42,6 +68,71 @@ class UserService:
         """returns `UserOTP` objects to abstract queryset extractions"""
         return UserOTP.objects
 
+    @staticmethod
+    @cache
+    def get_otp_store() -> BaseOTPStore:
+        """returns the store of pending `UserOTP`s, one per process"""
+        return load_otp_store(settings.OTP_STORE, UserOTP)
+
+    @staticmethod
+    @cache
+    def get_search_backend() -> BaseSearchBackend:
+        """returns the search backend indexing `User` username and email, one per process"""
+        return load_search_backend(settings.USER_SEARCH_BACKEND, USER_SEARCH_FIELDS)
+
+    @staticmethod
+    @cache
+    def get_entity_cache() -> EntityCache:
+        """returns the read-through `User` cache, one per process"""
+        return EntityCache(
+            User,
+            max_size=settings.USER_CACHE_MAX_SIZE,
+            local_timeout=settings.USER_CACHE_LOCAL_TIMEOUT,
+            shared_alias=settings.USER_CACHE_SHARED,
+            shared_timeout=settings.USER_CACHE_SHARED_TIMEOUT,
+        )
+
+    @staticmethod
+    @cache
+    def get_last_login_buffer() -> WriteBehindBuffer:
+        """returns the buffer of pending `last_login` writes, one per process"""
+        return WriteBehindBuffer(
+            UserService().set_last_logins,
+            interval=settings.LAST_LOGIN_FLUSH_INTERVAL,
+            max_size=settings.LAST_LOGIN_BUFFER_SIZE,
+            name="last-login",
+        )
+
+    @staticmethod
+    def get_token_family_store() -> TokenFamilyStore:
+        """returns the store of refresh token families, one per process"""
+        return get_token_family_store()
+
+    def end_sessions(self, user_ids) -> int:
+        """refuse the refresh tokens of every login of the users, returns the revoked family count"""
+        return self.get_token_family_store().revoke_users(user_ids)
+
+    def invalidate_cached_users(self, ids) -> None:
+        """drop written users from the cache, again once the transaction commits"""
+        entity_cache = self.get_entity_cache()
+        ids = list(ids)
+        entity_cache.invalidate_many(ids)
+        # a concurrent read may refill the old row until the write is committed
+        transaction.on_commit(lambda: entity_cache.invalidate_many(ids))
+
+    def search_users(self, queryset: QuerySet[User], terms: List[str]) -> QuerySet[User]:
+        """
+        narrow `queryset` to users matching every search term, best match first
+
+        Args:
+            queryset: `User` queryset to search in
+            terms: search terms matched against username and email
+
+        Returns:
+            QuerySet[User]: ranked `User` queryset
+        """
+        return self.get_search_backend().search(queryset, terms)
+
     def get_user_by_id(self, id: UserID) -> User:
         """
         returns `User` object for given `id`
@@ -50,7 +141,33 @@ class UserService:
         Returns:
             QuerySet[User]: `User` object
         """
-        return self.get_user_repo().get(id=id)
+        return load_entity(
+            User,
+            lambda: self.get_entity_cache().get(id, lambda: self.get_primary_user_repo().get(id=id)),
+            pk=id,
+        )
+
+    def get_user_from_primary(self, **lookup) -> User:
+        """
+        returns the current `User` row matching `lookup`, read from the primary
+        database past the caches and the replicas
+
+        Credential checks use it: the in-process cache tier of another worker
+        can't be invalidated and may still hold an old password or `is_active`.
+        """
+        return self.get_primary_user_repo().get(**lookup)
+
+    async def aget_user_from_primary(self, **lookup) -> User:
+        """`get_user_from_primary` for async callers"""
+        return await self.get_primary_user_repo().aget(**lookup)
+
+    async def aget_user_by_id(self, id: UserID) -> User:
+        """`get_user_by_id` for async callers, the row is read with `aget`"""
+        return await aload_entity(
+            User,
+            lambda: self.get_entity_cache().aget(id, lambda: self.get_primary_user_repo().aget(id=id)),
+            pk=id,
+        )
 
     def get_all_users(self) -> QuerySet[User]:
         """
@@ -59,7 +176,7 @@ class UserService:
         Returns:
             QuerySet[User]: The `User` list in the database
         """
-        return self.get_user_repo().all()
+        return self.get_replica_user_repo().all()
 
     def get_user_by_email(self, email: str) -> QuerySet[User]:
         """
@@ -71,7 +188,23 @@ class UserService:
         Returns:
             QuerySet[User]: The `User` object in the database
         """
-        return self.get_user_repo().get(email=email)
+        return load_entity(
+            User,
+            lambda: self.get_entity_cache().get_by(
+                "email", email, lambda: self.get_primary_user_repo().get(email=email)
+            ),
+            email=email,
+        )
+
+    async def aget_user_by_email(self, email: str) -> User:
+        """`get_user_by_email` for async callers"""
+        return await aload_entity(
+            User,
+            lambda: self.get_entity_cache().aget_by(
+                "email", email, lambda: self.get_primary_user_repo().aget(email=email)
+            ),
+            email=email,
+        )
 
     def get_user_by_username(self, username: str) -> QuerySet[User]:
         """
@@ -83,7 +216,7 @@ class UserService:
         Returns:
             QuerySet[User]: The `User` object in the database
         """
-        return self.get_user_repo().get(username=username)
+        return load_entity(User, lambda: self.get_replica_user_repo().get(username=username), username=username)
 
     def get_user_by_id_list(self, id_list: List[uuid.UUID]) -> QuerySet[User]:
         """
@@ -95,7 +228,32 @@ class UserService:
         Returns:
             QuerySet[User]: The `User` object in the database
         """
-        return self.get_user_repo().filter(id__in=id_list)
+        return self.get_replica_user_repo().filter(id__in=id_list)
+
+    def get_taken_identities(self, emails: List[str], usernames: List[str]) -> QuerySet:
+        """
+        get `(email, username)` pairs of users holding any of the given values, in one query
+
+        Args:
+            emails: emails to look for
+            usernames: usernames to look for
+
+        Returns:
+            QuerySet: `(email, username)` tuples of the matching users
+        """
+        return (
+            self.get_user_repo()
+            .filter(Q(email__in=emails) | Q(username__in=usernames))
+            .values_list("email", "username")
+        )
+
+    def bulk_create_users(self, users: List[User]) -> List[User]:
+        """insert `User` objects in one statement, save signals are skipped so the search index is updated here"""
+        created = self.get_user_repo().bulk_create(users)
+        search_backend = self.get_search_backend()
+        for user in created:
+            search_backend.update(user)
+        return created
 
     def get_active_user_by_id(self, id: uuid.UUID) -> User:
         """
@@ -105,7 +263,21 @@ class UserService:
         Returns:
             User: `User` object
         """
-        return self.get_user_repo().get(id=id, is_active=True)
+        user = load_entity(
+            User,
+            lambda: self.get_entity_cache().get(id, lambda: self.get_primary_user_repo().get(id=id)),
+            pk=id,
+        )
+        if not user.is_active:
+            raise User.DoesNotExist("User matching query does not exist.")
+        return user
+
+    async def aget_active_user_by_id(self, id: uuid.UUID) -> User:
+        """`get_active_user_by_id` for async callers"""
+        user = await self.aget_user_by_id(id)
+        if not user.is_active:
+            raise User.DoesNotExist("User matching query does not exist.")
+        return user
 
     def create_user(
         self,
@@ -150,19 +322,147 @@ class UserService:
             )
         )
 
+    def update_user_fields(self, user: User, version: int, fields: dict) -> User:
+        """
+        write changed `fields` of `user` with a single conditional UPDATE
+
+        Args:
+            user: `User` object the changes are applied to
+            version: version of `user` the changes were made against
+            fields: column values that differ from `user`
+
+        Returns:
+            User: `user` with the changes and its new version
+        """
+        user.update_fields(version, **fields)
+        self.invalidate_cached_users([user.id])
+        if fields.keys() & set(USER_SEARCH_FIELDS):
+            # no save signal is sent for UPDATE statements
+            self.get_search_backend().update(user)
+        return user
+
+    def deactivate_user(self, user: User) -> User:
+        """
+        deactivate `user` with a single UPDATE of `is_active`
+
+        Args:
+            user: `User` object to deactivate, possibly stale
+
+        Returns:
+            User: `user`, inactive at its new version
+        """
+        user.deactivate()
+        # no save signal is sent for UPDATE statements
+        forget_entities(User, [user.id])
+        self.invalidate_cached_users([user.id])
+        self.end_sessions([user.id])
+        return user
+
+    @staticmethod
+    def get_role_permissions(role: RoleType) -> dict:
+        """`is_staff` and `is_superuser` values that go with `role`"""
+        return {
+            "is_staff": role in (RoleType.STAFF, RoleType.SUPERUSER),
+            "is_superuser": role == RoleType.SUPERUSER,
+        }
+
+    def bulk_update_users(self, queryset: QuerySet[User], **fields) -> int:
+        """
+        set `fields` on every user of `queryset` with a single UPDATE
+
+        The matching rows are locked and their ids kept in the same transaction,
+        so tokens carrying the old claims of exactly those users are invalidated.
+        Users set inactive are logged out of every session.
+
+        Args:
+            queryset: `User` queryset selecting the users to update
+            fields: column values to set
+
+        Returns:
+            int: number of updated users
+        """
+        with transaction.atomic():
+            user_ids = list(queryset.select_for_update().values_list("id", flat=True))
+            if not user_ids:
+                return 0
+            updated = self.get_user_repo().filter(id__in=user_ids).update(
+                modified_at=timezone.now(), **fields
+            )
+        forget_entities(User, user_ids)
+        self.invalidate_cached_users(user_ids)
+        TokenInvalidation.invalidate_many(user_ids)
+        if fields.get("is_active") is False:
+            self.end_sessions(user_ids)
+        return updated
+
+    def set_last_login(self, user_id: uuid.UUID, last_login) -> int:
+        """
+        store the last login of a user with a single UPDATE, without loading the row
+
+        `modified_at` is left alone, a login doesn't change the user for clients.
+        """
+        return self.set_last_logins({user_id: last_login})
+
+    def set_last_logins(self, last_logins: dict) -> int:
+        """
+        store the last login of many users with a single UPDATE
+
+        A row keeps its `last_login` when it is already newer, so concurrent
+        writers can't move it back.
+
+        Args:
+            last_logins: login time by user id
+        """
+        user_ids = list(last_logins)
+        updated = self.get_user_repo().filter(id__in=user_ids).update(
+            last_login=Case(
+                *(
+                    When(Q(id=user_id) & (Q(last_login__isnull=True) | Q(last_login__lt=last_login)), then=Value(last_login))
+                    for user_id, last_login in last_logins.items()
+                ),
+                default=F("last_login"),
+                output_field=DateTimeField(),
+            )
+        )
+        forget_entities(User, user_ids)
+        self.invalidate_cached_users(user_ids)
+        return updated
+
     def create_otp(self, user:User) -> UserOTP:
-        """create `UserOTP` object"""
+        """create `UserOTP` object and issue it, replacing the pending one of the user"""
         try:
-            return self.get_otp_factory().build_entity_with_id(user=user)
+            otp = self.get_otp_factory().build_entity_with_id(user=user)
+            self.get_otp_store().issue(otp)
+            return otp
         except Exception as e:
             raise Exception(f"{e} at create_otp")
     
     def get_otp_by_user_id(self, user_id:uuid.UUID) -> UserOTP:
-        """get `UserOtp` object using user_id"""
+        """get unexpired `UserOtp` object using user_id"""
         try:
-            return self.get_otp_repo().get(user__id=user_id)
-        except UserOTP.DoesNotExist:
-            return None
+            return self.get_otp_store().get(user_id)
         except Exception as e:
             raise Exception(f"{e} at get_otp_by_user_id")
+
+    def purge_expired_otps(self, chunk_size: int = 1000, pause: float = 0.0) -> int:
+        """
+        delete expired `UserOTP` rows in chunks of `chunk_size`
+
+        Args:
+            chunk_size: rows deleted per statement
+            pause: seconds to wait between chunks
+
+        Returns:
+            int: number of deleted rows
+        """
+        return purge_in_chunks(
+            self.get_otp_repo().filter(otp_expiration__lte=timezone.now()), chunk_size, pause
+        )
+
+    def consume_otp_token(self, user_id: uuid.UUID, otp_token: str) -> bool:
+        """remove the `UserOTP` of the user if `otp_token` is its reset token"""
+        try:
+            return self.get_otp_store().consume(user_id, otp_token)
+        except Exception as e:
+            raise Exception(f"{e} at consume_otp_token")
         
\ No newline at end of file
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .services import UserService
+
+
+@receiver(post_save, sender=User, dispatch_uid="user_search_index_update")
+def update_search_index(sender, instance, **kwargs):
+    """keep the user search index in step with saved users"""
+    UserService.get_search_backend().update(instance)
+
+
+@receiver(post_save, sender=User, dispatch_uid="user_cache_invalidate")
+@receiver(post_delete, sender=User, dispatch_uid="user_cache_invalidate_deleted")
+def invalidate_user_cache(sender, instance, **kwargs):
+    """covers `update_entity` and `set_password`, which end in `save()`"""
+    UserService().invalidate_cached_users([instance.pk])
+
+
+@receiver(post_delete, sender=User, dispatch_uid="user_search_index_remove")
+def remove_from_search_index(sender, instance, **kwargs):
+    UserService.get_search_backend().remove(instance.pk)
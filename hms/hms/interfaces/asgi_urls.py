@@ -0,0 +1,30 @@
+"""
+URL configuration for requests served through `hms/asgi.py`
+
+The user and auth endpoints resolve to their async views first, every other
+URL falls through to `hms.interfaces.urls`. User ids are matched as UUIDs so
+the `users/` actions (import, export, bulk) keep their sync views.
+"""
+
+from django.conf import settings
+from django.urls import path
+
+from .auth import async_views as auth_views
+from .user_management import async_views as user_views
+from .urls import urlpatterns as sync_urlpatterns
+
+API_SWAGGER_URL = settings.API_SWAGGER_URL
+
+urlpatterns = [
+    path(f"{API_SWAGGER_URL}auth/login/", auth_views.login, name="auth-login"),
+    path(f"{API_SWAGGER_URL}auth/register/", auth_views.register, name="auth-register"),
+    path(f"{API_SWAGGER_URL}auth/logout/", auth_views.logout, name="auth-logout"),
+    path(f"{API_SWAGGER_URL}auth/forgot_password/", auth_views.forgot_password, name="pwd-forgot-password"),
+    path(f"{API_SWAGGER_URL}auth/<str:pk>/verify_otp/", auth_views.verify_otp, name="pwd-verify-otp"),
+    path(f"{API_SWAGGER_URL}auth/<str:pk>/reset_password/", auth_views.reset_password, name="pwd-reset-password"),
+    path(f"{API_SWAGGER_URL}auth/change_password/", auth_views.change_password, name="pwd-change-change-password"),
+    path(f"{API_SWAGGER_URL}users/", user_views.users, name="user-list"),
+    path(f"{API_SWAGGER_URL}users/<uuid:pk>/", user_views.user, name="user-detail"),
+]
+
+urlpatterns += sync_urlpatterns
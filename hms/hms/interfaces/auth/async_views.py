@@ -0,0 +1,181 @@
+"""
+async `AuthenticateUserView`, `PasswordHandlerView` and change password views, served under `asgi.py`
+
+Password hashing runs on the bounded `HashingExecutor`, the event loop only
+awaits it, so one worker keeps serving requests while hashes are computed on
+every core. When the hashing queue is full the request is refused with 503
+and `Retry-After` instead of waiting. Payloads, responses and error semantics
+match the DRF views in `views.py`.
+"""
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import alogout
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+
+from .serializers import AuthSerializer, NewPasswordSerializer, OTPSerializer, PasswordForgetSerializer
+from ..user_management.serializers import UserCreateViewSerializer
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import User
+from lib.django.custom_asgi import async_api_view, render
+from lib.django.custom_exceptions import OTPExpireException
+from lib.django.custom_hashing import HashingPoolFull
+from lib.django.custom_permissions import IsNotAuthenticated
+from lib.django.custom_response import CustomResponse
+
+user_app_service = UserAppService()
+
+
+@async_api_view("POST")
+async def login(request):
+    try:
+        if request.user.is_authenticated:
+            return render(
+                CustomResponse(
+                    message="User already logged in, log out first!",
+                    status=status.HTTP_400_BAD_REQUEST,
+                ).error_message()
+            )
+        serializer = AuthSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            response_data = await user_app_service.alogin(
+                serializer.validated_data["email"], serializer.validated_data["password"]
+            )
+            if response_data:
+                return render(CustomResponse(message="Logged In", data=response_data).success_message())
+            return render(CustomResponse("Invalid email or password!").success_message())
+        return render(CustomResponse(message="validation error", data=serializer.errors).error_message())
+    except User.DoesNotExist:
+        return render(
+            CustomResponse(
+                message="validation error",
+                data={api_settings.NON_FIELD_ERRORS_KEY: [AuthSerializer.missing_user_message]},
+            ).error_message()
+        )
+    except HashingPoolFull:
+        raise
+    except Exception as e:
+        return render(CustomResponse(message=e, status=status.HTTP_404_NOT_FOUND).error_message())
+
+
+@async_api_view("POST")
+async def register(request):
+    try:
+        serializer = UserCreateViewSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            user = await user_app_service.acreate_user(serializer.validated_data)
+            response_data = await sync_to_async(user_app_service.get_user_token)(user)
+            return render(
+                CustomResponse(
+                    message="User Created", data=response_data, status=status.HTTP_201_CREATED
+                ).success_message()
+            )
+        return render(CustomResponse(message="validation error", data=serializer.errors).error_message())
+    except HashingPoolFull:
+        raise
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+@async_api_view("GET")
+async def logout(request):
+    try:
+        if request.user.is_authenticated:
+            if request.auth is not None:
+                await sync_to_async(user_app_service.logout)(request.auth)
+            await alogout(request)
+            return render(CustomResponse(message="User Logged Out").success_message())
+        return render(
+            CustomResponse(message="No user logged in!", status=status.HTTP_400_BAD_REQUEST).error_message()
+        )
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+@async_api_view("POST", permission_classes=[IsNotAuthenticated])
+async def forgot_password(request):
+    try:
+        serializer = PasswordForgetSerializer(data=request.data)
+        if await sync_to_async(serializer.is_valid)():
+            user = await user_app_service.aget_user_by_email(serializer.data.get("email"))
+            if user:
+                response_data = await sync_to_async(user_app_service.forgot_password)(user=user)
+                return render(CustomResponse(data=response_data).success_message())
+            return render(CustomResponse(message="Otp will be sent if the user exists!").success_message())
+        return render(CustomResponse(data=serializer.errors).error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+@async_api_view("POST", permission_classes=[IsNotAuthenticated])
+async def verify_otp(request, pk):
+    try:
+        user = await user_app_service.aget_active_user_by_id(id=pk)
+        if user:
+            serializer = OTPSerializer(data=request.data)
+            if await sync_to_async(serializer.is_valid)():
+                otp = await sync_to_async(user_app_service.verify_otp)(serializer.data["otp"], user.id)
+                if otp:
+                    reset_token = user_app_service.make_reset_token(user)
+                    response_data = {
+                        "reset": f"{reverse('pwd-reset-password', kwargs={'pk': user.id})}?token={reset_token}"
+                    }
+                    return render(CustomResponse(data=response_data).success_message())
+                return render(CustomResponse(message="OTP doesn't match").error_message())
+            return render(CustomResponse(data=serializer.errors).error_message())
+        return render(CustomResponse(message="No User Found!").error_message())
+    except OTPExpireException:
+        return render(CustomResponse(message="Your OTP has expired!").error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+@async_api_view("POST", permission_classes=[IsNotAuthenticated])
+async def reset_password(request, pk):
+    try:
+        user = await user_app_service.aget_active_user_by_id(id=pk)
+        if user:
+            serializer = NewPasswordSerializer(data={"new_password": request.data.get("new_password")})
+            if not await sync_to_async(serializer.is_valid)():
+                return render(CustomResponse(data={"new_password": serializer.errors}).error_message())
+            if await user_app_service.areset_password(
+                request.GET.get("token"), user.id, serializer.validated_data["new_password"]
+            ):
+                return render(CustomResponse("New password successfully set!").success_message())
+            return render(CustomResponse(data={"otp_token": ["Incorrect Token"]}).error_message())
+        return render(CustomResponse(message="No User Found!").error_message())
+    except HashingPoolFull:
+        raise
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+@async_api_view("POST", permission_classes=[IsAuthenticated])
+async def change_password(request):
+    try:
+        user = await user_app_service.aget_active_user_by_id(id=request.user.id)
+        old_password = request.data.get("old_password")
+        if (
+            user
+            and old_password
+            and await user_app_service.aauthenticate_user(user.email, old_password)
+        ):
+            serializer = NewPasswordSerializer(data=request.data)
+            if await sync_to_async(serializer.is_valid)():
+                await user_app_service.aset_new_password(
+                    user.id, serializer.validated_data["new_password"]
+                )
+                return render(CustomResponse("New Password successfully set!").success_message())
+            return render(CustomResponse(data=serializer.errors).error_message())
+        return render(
+            CustomResponse(
+                message="No User Found! Please provide correct old_password."
+            ).error_message()
+        )
+    except HashingPoolFull:
+        raise
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
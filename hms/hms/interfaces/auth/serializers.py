@@ -2,25 +2,28 @@ from django.contrib.auth import password_validation
 from django.core.exceptions import ValidationError
 
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 from hms.application.user_management.services import UserAppService
 from hms.domain.user_management.models import UserOTP
+from lib.django.custom_authentication import set_user_claims
+from lib.django.custom_token_family import get_token_family_store
 
 
 class AuthSerializer(serializers.Serializer):
-    """serializer to verify login instance"""
+    """
+    serializer to verify login instance
 
-    user_app_service = UserAppService()
+    The user is looked up by `UserAppService.login`, views answer a missing one
+    with `missing_user_message` as a non field error.
+    """
+
+    missing_user_message = "User Doesn't Exist"
     email = serializers.CharField(max_length=150, required=True)
     password = serializers.CharField(max_length=150, required=True)
 
-    def validate(self, attr):
-        """Check if user with the email exists"""
-        email = attr.get("email")
-        if not bool(self.user_app_service.get_user_by_email(email=email)):
-            raise serializers.ValidationError("User Doesn't Exist")
-        return super().validate(attr)
-
 
 class PasswordForgetSerializer(serializers.Serializer):
     """serializer to verify email for password forget"""
@@ -58,7 +61,7 @@ class NewPasswordSerializer(serializers.Serializer):
 
 
 class TokenSerializer(serializers.Serializer):
-    """check otp token"""
+    """check the signed reset token handed out by otp verification"""
 
     user_id = serializers.UUIDField(required=True)
     otp_token = serializers.CharField(required=True)
@@ -76,3 +79,36 @@ class TokenSerializer(serializers.Serializer):
         ):
             raise serializers.ValidationError({"otp_token": "Incorrect Token"})
         return super().validate(attr)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    refresh tokens and re-stamp the user claims from the database
+
+    Rotated refresh tokens are tracked per login, see `TokenFamilyStore`.
+    """
+
+    user_app_service = UserAppService()
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = self.user_app_service.get_current_active_user_by_id(
+            refresh.payload.get(api_settings.USER_ID_CLAIM)
+        )
+        if not user:
+            raise AuthenticationFailed(
+                self.error_messages["no_active_account"], "no_active_account"
+            )
+        # claims may have been invalidated since the refresh token was minted
+        set_user_claims(refresh, user)
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            rotated = self.token_class(attrs["refresh"])
+            set_user_claims(rotated, user)
+            rotated.set_jti()
+            rotated.set_exp()
+            rotated.set_iat()
+            # refuses a refresh token that was rotated already, and its whole family
+            get_token_family_store().rotate(refresh, rotated)
+            data["refresh"] = str(rotated)
+        return data
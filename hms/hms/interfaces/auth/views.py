@@ -5,10 +5,10 @@ from django.urls import reverse
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 
 
 from .serializers import (
@@ -17,9 +17,11 @@ from .serializers import (
     OTPSerializer,
     TokenSerializer,
     NewPasswordSerializer,
+    ClaimsTokenRefreshSerializer,
 )
 from ..user_management.serializers import UserCreateViewSerializer
 from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import User
 from lib.django.custom_response import CustomResponse
 from lib.django.custom_permissions import IsNotAuthenticated
 from lib.django.custom_exceptions import OTPExpireException
@@ -51,11 +53,11 @@ class AuthenticateUserView(viewsets.ViewSet):
                 ).error_message()
             serializer = serializer(data=request.data)
             if serializer.is_valid():
-                email = serializer.data.get("email", None)
-                password = serializer.data.get("password", None)
-                user = authenticate(email=email, password=password)
-                if user:
-                    response_data = self.user_app_service.get_user_token(user)
+                response_data = self.user_app_service.login(
+                    serializer.validated_data["email"],
+                    serializer.validated_data["password"],
+                )
+                if response_data:
                     return CustomResponse(
                         message="Logged In", data=response_data
                     ).success_message()
@@ -63,6 +65,11 @@ class AuthenticateUserView(viewsets.ViewSet):
             return CustomResponse(
                 message="validation error", data=serializer.errors
             ).error_message()
+        except User.DoesNotExist:
+            return CustomResponse(
+                message="validation error",
+                data={api_settings.NON_FIELD_ERRORS_KEY: [serializer.missing_user_message]},
+            ).error_message()
         except Exception as e:
             return CustomResponse(
                 message=e, status=status.HTTP_404_NOT_FOUND
@@ -91,6 +98,8 @@ class AuthenticateUserView(viewsets.ViewSet):
     def logout(self, request, *args, **kwargs):
         try:
             if request.user.is_authenticated:
+                if request.auth is not None:
+                    self.user_app_service.logout(request.auth)
                 auth_logout(request)
                 return CustomResponse(message="User Logged Out").success_message()
             return CustomResponse(
@@ -157,7 +166,7 @@ class PasswordHandlerView(viewsets.ViewSet):
                     )
                     if otp:
                         response_data = {
-                            "reset": f"{reverse('pwd-reset-password', kwargs={'pk':user.id})}?token={otp.otp_token}"
+                            "reset": f"{reverse('pwd-reset-password', kwargs={'pk':user.id})}?token={self.user_app_service.make_reset_token(user)}"
                         }
                         return CustomResponse(data=response_data).success_message()
                     return CustomResponse(message="OTP doesn't match").error_message()
@@ -241,7 +250,7 @@ class ChangePasswordView(viewsets.ViewSet):
 
 
 class CustomTokenRefreshView(TokenRefreshView):
-    serializer_class = TokenRefreshSerializer
+    serializer_class = ClaimsTokenRefreshSerializer
 
     def post(self, request, *args, **kwargs):
         try:
@@ -0,0 +1,25 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_view, extend_schema
+
+from .serializers import PatientListViewSerializer, PatientExportSerializer
+
+patient_view_schema = extend_schema_view(
+    list=extend_schema(
+        summary='retrieve-patient-list',
+        description='This endpoint retrieves all patients - patient users are not allowed',
+        tags=["patient"]
+    ),
+    retrieve=extend_schema(
+        summary='retrieve-patient-by-id',
+        description='This endpoint retrieves a single patient information based on id',
+        responses=PatientListViewSerializer,
+        tags=["patient"]
+    ),
+    export=extend_schema(
+        summary='export-patients',
+        description='This endpoint streams every patient matching search as NDJSON (default) or CSV, chosen with `output`',
+        parameters=[PatientExportSerializer],
+        responses={(200, "application/x-ndjson"): OpenApiTypes.STR, (200, "text/csv"): OpenApiTypes.STR},
+        tags=["patient"]
+    ),
+)
@@ -0,0 +1,7 @@
+from lib.django.custom_pagination import KeysetPagination
+
+
+class PatientKeysetPagination(KeysetPagination):
+    """keyset pagination over patients in alphabetical order"""
+
+    ordering = ("patient_name", "id")
@@ -0,0 +1,30 @@
+from rest_framework import serializers
+
+from hms.domain.patient_management.models import Patient
+from lib.django.custom_serializers import ValuesSerializer
+
+
+class PatientListViewSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Patient
+        fields = [
+            "id",
+            "user_id",
+            "patient_name",
+            "dob",
+            "gender",
+            "contact_no",
+            "address",
+        ]
+
+
+class PatientListValuesSerializer(ValuesSerializer):
+    """`PatientListViewSerializer` output read straight from `values_list()` rows"""
+
+    serializer_class = PatientListViewSerializer
+
+
+class PatientExportSerializer(serializers.Serializer):
+    """query parameters of the patient export"""
+
+    output = serializers.ChoiceField(choices=["ndjson", "csv"], default="ndjson")
@@ -0,0 +1,7 @@
+from rest_framework import routers
+from .views import PatientViewSet
+
+router = routers.DefaultRouter()
+router.register(r'patients', viewset=PatientViewSet, basename="patient")
+
+urlpatterns = router.urls
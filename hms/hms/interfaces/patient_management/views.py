@@ -0,0 +1,107 @@
+from rest_framework import viewsets, status, filters
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+
+from hms.application.patient_management.services import PatientAppService
+from hms.domain.patient_management.models import Patient
+from hms.interfaces.patient_management.serializers import (
+    PatientListViewSerializer,
+    PatientListValuesSerializer,
+    PatientExportSerializer,
+)
+from lib.django.custom_conditional import (
+    get_instance_validators,
+    get_not_modified_response,
+    get_queryset_validators,
+    set_validator_headers,
+)
+from lib.django.custom_export import QuerysetExport
+from lib.django.custom_response import CustomResponse
+from lib.django.custom_permissions import PatientNotAllowed
+from .open_api import patient_view_schema
+from .pagination import PatientKeysetPagination
+
+
+@patient_view_schema
+class PatientViewSet(viewsets.GenericViewSet):
+    """viewset to list and retrieve patient information"""
+
+    patient_app_service = PatientAppService()
+    permission_classes = [IsAuthenticated, PatientNotAllowed]
+    serializer_class = PatientListViewSerializer
+    filter_backends = [filters.SearchFilter]
+    search_fields = ["patient_name"]
+    queryset = patient_app_service.list_patients()
+    # read path of list and retrieve, same output as PatientListViewSerializer
+    values_serializer = PatientListValuesSerializer()
+
+    def get_paginator(self, request):
+        """keyset pagination when a cursor is sent, page numbers otherwise"""
+        if PatientKeysetPagination.is_requested(request):
+            return PatientKeysetPagination()
+        return self.pagination_class()
+
+    def list(self, request, *args, **kwargs):
+        """list of patients, paginated response list and filtered response"""
+        queryset = self.filter_queryset(self.queryset)
+        etag, last_modified = get_queryset_validators(request, queryset)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified:
+            return not_modified
+
+        paginator = self.get_paginator(request)
+        paginated_rows = paginator.paginate_queryset(
+            self.values_serializer.get_queryset(queryset), request
+        )
+        try:
+            data = self.values_serializer.to_representation(paginated_rows)
+            if isinstance(paginator, PatientKeysetPagination):
+                data = paginator.get_paginated_data(data)
+            response = CustomResponse(
+                message="list data", data=data
+            ).success_message()
+            return set_validator_headers(response, etag, last_modified)
+        except Exception as e:
+            return CustomResponse(
+                message=e, status=status.HTTP_404_NOT_FOUND
+            ).error_message()
+
+    def retrieve(self, request, pk):
+        """retrieve patient information for the given patient id"""
+        try:
+            instance = self.patient_app_service.get_patient_by_id(pk)
+            etag, last_modified = get_instance_validators(instance)
+            not_modified = get_not_modified_response(request, etag, last_modified)
+            if not_modified:
+                return not_modified
+            response = CustomResponse(
+                message="patient object",
+                data=self.values_serializer.to_representation_one(instance),
+            ).success_message()
+            return set_validator_headers(response, etag, last_modified)
+        except Patient.DoesNotExist:
+            return CustomResponse(
+                message="No Patient Found!", status=status.HTTP_404_NOT_FOUND
+            ).error_message()
+        except Exception as e:
+            return CustomResponse(
+                message=e, status=status.HTTP_404_NOT_FOUND
+            ).error_message()
+
+    @action(methods=["get"], detail=False, url_path="export", url_name="export")
+    def export(self, request, *args, **kwargs):
+        """stream every patient matching `search` as NDJSON or CSV (`?output=`)"""
+        try:
+            params = PatientExportSerializer(data=request.query_params)
+            if not params.is_valid():
+                return CustomResponse(
+                    message="validation error", data=params.errors
+                ).error_message()
+            return QuerysetExport(
+                self.filter_queryset(self.patient_app_service.list_patients()),
+                self.values_serializer,
+                output=params.validated_data["output"],
+                name="patients",
+            ).get_response(request)
+        except Exception as e:
+            return CustomResponse(message=e).error_message()
@@ -21,8 +21,11 @@ from django.urls import path, include
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
+from lib.django.custom_metrics import metrics_view
+
 from .auth.urls import urlpatterns as auth_urls
 from .user_management.urls import urlpatterns as user_urls
+from .patient_management.urls import urlpatterns as patient_urls
 
 API_SWAGGER_URL = settings.API_SWAGGER_URL 
 # print([include(auth_urls)])
@@ -39,6 +42,8 @@ urlpatterns = [
 
 urlpatterns += [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path(API_SWAGGER_URL, include(auth_urls)),
     path(API_SWAGGER_URL, include(user_urls)),
+    path(API_SWAGGER_URL, include(patient_urls)),
 ]
@@ -0,0 +1,175 @@
+"""
+async list, create, retrieve, update and delete of users, served under `asgi.py`
+
+Reads go through the async ORM (`aget`, `acount`, async iteration) and the
+async paths of the identity map and user cache, so the event loop is never
+blocked on them. Serializer validation and writes, which DRF and the model
+only offer synchronously, run in `sync_to_async`. Payloads, responses,
+permissions and error semantics match `UserViewSet` in `views.py`.
+"""
+from asgiref.sync import sync_to_async
+
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+
+from hms.application.user_management.services import UserAppService
+from hms.interfaces.user_management.serializers import UserCreateViewSerializer, UserListValuesSerializer
+from lib.django.custom_asgi import async_api_view, check_permissions, render
+from lib.django.custom_conditional import (
+    aget_queryset_validators,
+    get_instance_validators,
+    get_not_modified_response,
+    set_validator_headers,
+)
+from lib.django.custom_exceptions import ConcurrentUpdateException
+from lib.django.custom_models import RoleType
+from lib.django.custom_pagination import AsyncPageNumberPagination
+from lib.django.custom_permissions import PatientNotAllowed, DoctorNotAllowed, OwnDataAccess
+from lib.django.custom_response import CustomResponse
+from .filters import UserSearchFilter
+from .pagination import UserKeysetPagination
+
+user_app_service = UserAppService()
+values_serializer = UserListValuesSerializer()
+
+
+def get_permission_classes(request) -> list:
+    """per method permissions of a user, as `UserViewSet.get_permissions`"""
+    user = request.user
+    if request.method == "GET":
+        if user.is_authenticated and user.role == RoleType.PATIENT:
+            return [OwnDataAccess]
+    elif request.method == "DELETE":
+        if user.is_authenticated and not user.is_staff:
+            return [OwnDataAccess]
+    elif user.is_authenticated and not user.is_staff:
+        return [PatientNotAllowed, DoctorNotAllowed]
+    return []
+
+
+@async_api_view("GET", "POST", permission_classes=[IsAuthenticated, PatientNotAllowed, DoctorNotAllowed])
+async def users(request):
+    if request.method == "POST":
+        return await create(request)
+    return await list_users(request)
+
+
+@async_api_view("GET", "PUT", "PATCH", "DELETE", permission_classes=[IsAuthenticated])
+async def user(request, pk):
+    # the URL converter parses the id, permissions compare it as a string
+    pk = str(pk)
+    refused = check_permissions(request, get_permission_classes(request), pk=pk)
+    if refused:
+        return refused
+    if request.method == "GET":
+        return await retrieve(request, pk)
+    if request.method == "DELETE":
+        return await destroy(request, pk)
+    return await update(request, pk, partial=request.method == "PATCH")
+
+
+async def list_users(request):
+    """list of users in the dataset, paginated response list and filtered response"""
+    # the in-process search index is built from the ORM on its first search
+    queryset = await sync_to_async(UserSearchFilter().filter_queryset)(
+        request=request, queryset=user_app_service.list_users(), view=None
+    )
+
+    # polled lists are answered from one aggregate query while unchanged
+    etag, last_modified = await aget_queryset_validators(request, queryset)
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+
+    rows_queryset = values_serializer.get_queryset(queryset)
+    if UserKeysetPagination.is_requested(request):
+        paginator = UserKeysetPagination()
+        paginated_rows = await sync_to_async(paginator.paginate_queryset)(rows_queryset, request)
+    else:
+        paginator = AsyncPageNumberPagination()
+        paginated_rows = await paginator.apaginate_queryset(rows_queryset, request)
+        if paginated_rows is None:
+            paginated_rows = [row async for row in rows_queryset]
+
+    try:
+        data = values_serializer.to_representation(paginated_rows)
+        if isinstance(paginator, UserKeysetPagination):
+            data = paginator.get_paginated_data(data)
+        response = render(CustomResponse(message="list data", data=data).success_message())
+        return set_validator_headers(response, etag, last_modified)
+    except Exception as e:
+        return render(CustomResponse(message=e, status=status.HTTP_404_NOT_FOUND).error_message())
+
+
+async def retrieve(request, pk):
+    """retrieve user information for the given user_id"""
+    try:
+        instance = await user_app_service.aget_active_user_by_id(pk)
+        if instance:
+            etag, last_modified = get_instance_validators(instance)
+            not_modified = get_not_modified_response(request, etag, last_modified)
+            if not_modified:
+                return not_modified
+            response = render(
+                CustomResponse(
+                    message="user object",
+                    data=values_serializer.to_representation_one(instance),
+                ).success_message()
+            )
+            return set_validator_headers(response, etag, last_modified)
+        return render(CustomResponse(message="No User Found!").error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e, status=status.HTTP_404_NOT_FOUND).error_message())
+
+
+async def create(request):
+    """create user if information is valid"""
+    try:
+        serializer_obj = UserCreateViewSerializer(data=request.data)
+        if await sync_to_async(serializer_obj.is_valid)():
+            await sync_to_async(serializer_obj.save)()
+            return render(
+                CustomResponse(
+                    message="User Created",
+                    data=await sync_to_async(lambda: serializer_obj.data)(),
+                    status=status.HTTP_201_CREATED,
+                ).success_message()
+            )
+        return render(CustomResponse(message="validation error", data=serializer_obj.errors).error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+async def update(request, pk, partial=False):
+    try:
+        instance = await user_app_service.aget_user_by_id(pk)
+        if instance:
+            serializer_obj = UserCreateViewSerializer(instance=instance, data=request.data, partial=partial)
+            if await sync_to_async(serializer_obj.is_valid)():
+                try:
+                    await sync_to_async(serializer_obj.save)()
+                except ConcurrentUpdateException as e:
+                    return render(CustomResponse(message=str(e), status=status.HTTP_409_CONFLICT).error_message())
+                return render(
+                    CustomResponse(
+                        message=f"User {instance} Updated!",
+                        data=await sync_to_async(lambda: serializer_obj.data)(),
+                        status=status.HTTP_200_OK,
+                    ).success_message()
+                )
+            return render(CustomResponse(message="validation error", data=serializer_obj.errors).error_message())
+        return render(CustomResponse(message="No User Found!").error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
+
+
+async def destroy(request, pk):
+    """delete user, sets is_active as False"""
+    try:
+        instance = await user_app_service.aget_active_user_by_id(pk)
+        if instance:
+            await sync_to_async(user_app_service.deactivate_user)(instance)
+            return render(CustomResponse(message=f"User {instance} deleted!").success_message())
+        return render(CustomResponse(message="No User Found!", status=status.HTTP_404_NOT_FOUND).error_message())
+    except Exception as e:
+        return render(CustomResponse(message=e).error_message())
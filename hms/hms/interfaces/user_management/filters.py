@@ -0,0 +1,15 @@
+from rest_framework import filters
+
+from hms.application.user_management.services import UserAppService
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """`?search=` filter backed by the indexed user search backend"""
+
+    user_app_service = UserAppService()
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return self.user_app_service.search_users(queryset, terms)
@@ -1,6 +1,13 @@
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_view, OpenApiParameter, extend_schema, OpenApiExample
 
-from .serializers import UserCreateViewSerializer, UserListViewSerializer
+from .serializers import (
+    UserCreateViewSerializer,
+    UserListViewSerializer,
+    BulkUserActionSerializer,
+    BulkRoleChangeSerializer,
+    UserExportSerializer,
+)
 from lib.django.custom_models import RoleType
 
 user_view_schema = extend_schema_view(
@@ -41,6 +48,10 @@ user_view_schema = extend_schema_view(
                                     "- `superuser`: Superuser"),
                                 "enum": [role.value for role in RoleType]
                             },
+                            "version": {
+                                "type": "integer",
+                                "description": "version the user was read at, a 409 is returned if it changed since",
+                            },
                         },
                     }
                 },
@@ -66,6 +77,10 @@ user_view_schema = extend_schema_view(
                                     "- `superuser`: Superuser"),
                                 "enum": [role.value for role in RoleType]
                             },
+                            "version": {
+                                "type": "integer",
+                                "description": "version the user was read at, a 409 is returned if it changed since",
+                            },
                         },
                     }
                 },
@@ -76,7 +91,52 @@ user_view_schema = extend_schema_view(
         summary="delete-user",
         description="This endpoint deletes the requested user",
         tags=["user"]
-    )
+    ),
+    import_users=extend_schema(
+        summary="import-users",
+        description=(
+            "This endpoint bulk creates users from CSV (`text/csv`) or NDJSON "
+            "(`application/x-ndjson`) rows with username, email, password and role, "
+            "sent as the body or uploaded as `file`. Invalid rows are reported per row"
+        ),
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            },
+            "text/csv": {"type": "string"},
+            "application/x-ndjson": {"type": "string"},
+        },
+        tags=["user"]
+    ),
+    export=extend_schema(
+        summary="export-users",
+        description=(
+            "This endpoint streams every user matching role, status and search as "
+            "NDJSON (default) or CSV, chosen with `output`"
+        ),
+        parameters=[UserExportSerializer],
+        responses={(200, "application/x-ndjson"): OpenApiTypes.STR, (200, "text/csv"): OpenApiTypes.STR},
+        tags=["user"]
+    ),
+    bulk_deactivate=extend_schema(
+        summary="bulk-deactivate-users",
+        description="This endpoint deactivates every user selected by ids and/or filter, returns the affected count",
+        request=BulkUserActionSerializer,
+        tags=["user"]
+    ),
+    bulk_reactivate=extend_schema(
+        summary="bulk-reactivate-users",
+        description="This endpoint reactivates every user selected by ids and/or filter, returns the affected count",
+        request=BulkUserActionSerializer,
+        tags=["user"]
+    ),
+    bulk_role=extend_schema(
+        summary="bulk-change-user-role",
+        description="This endpoint changes the role of every user selected by ids and/or filter, returns the affected count",
+        request=BulkRoleChangeSerializer,
+        tags=["user"]
+    ),
 )
 
 # parameters=[OpenApiParameter(
@@ -0,0 +1,7 @@
+from lib.django.custom_pagination import KeysetPagination
+
+
+class UserKeysetPagination(KeysetPagination):
+    """keyset pagination over users in joining order"""
+
+    ordering = ("date_joined", "id")
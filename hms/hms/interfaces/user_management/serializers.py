@@ -4,7 +4,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth import password_validation
 from django.core.exceptions import ValidationError
 
-from lib.django.custom_exceptions import SerializerException
+from lib.django.custom_exceptions import ConcurrentUpdateException, SerializerException
+from lib.django.custom_models import RoleType
+from lib.django.custom_serializers import ValuesSerializer
 from hms.application.user_management.services import UserAppService
 
 
@@ -20,6 +22,7 @@ class UserListViewSerializer(serializers.ModelSerializer):
             "is_staff",
             "is_active",
             "is_superuser",
+            "version",
         ]
 
 
@@ -28,10 +31,12 @@ class UserCreateViewSerializer(serializers.ModelSerializer):
     # abcd = serializers.SerializerMethodField()
 
     password = serializers.CharField(required=False, write_only=True)
+    # version the client read, updates made against an older one are refused
+    version = serializers.IntegerField(required=False, min_value=1)
 
     class Meta:
         model = get_user_model()
-        fields = ["username", "email", "password", "role"]
+        fields = ["username", "email", "password", "role", "version"]
 
     def validate_password(self, value):
         if self.instance:
@@ -67,10 +72,48 @@ class UserCreateViewSerializer(serializers.ModelSerializer):
             # instance.username = validated_data.get("username") if validated_data.get("username") else instance.username
             # instance.email = validated_data.get("email") if validated_data.get("email") else instance.email
             # instance.role = validated_data.get("role") if validated_data.get("role") else instance.role
-            instance.__dict__.update(**validated_data)
-            instance = self.user_app_service.update_user(instance)
-            return instance
+            # instance.__dict__.update(**validated_data) - replaced by a write of the changed columns only
+            version = validated_data.pop("version", None)
+            return self.user_app_service.update_user(instance, validated_data, version)
+        except ConcurrentUpdateException:
+            raise
         except Exception as e:
             raise SerializerException(
                 f"{e} at update() in UserCreateViewSerializer"
-            )
\ No newline at end of file
+            )
+
+class UserListValuesSerializer(ValuesSerializer):
+    """`UserListViewSerializer` output read straight from `values_list()` rows"""
+
+    serializer_class = UserListViewSerializer
+
+
+class BulkUserFilterSerializer(serializers.Serializer):
+    """filters selecting users for a bulk action"""
+
+    role = serializers.ChoiceField(choices=RoleType.choices, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+
+class BulkUserActionSerializer(serializers.Serializer):
+    """users selected by `ids`, `filter` or both"""
+
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False, max_length=10000)
+    filter = BulkUserFilterSerializer(required=False)
+
+    def validate(self, attr):
+        if not attr.get("ids") and not attr.get("filter"):
+            raise serializers.ValidationError("Provide ids or a non-empty filter")
+        return super().validate(attr)
+
+
+class BulkRoleChangeSerializer(BulkUserActionSerializer):
+    role = serializers.ChoiceField(choices=RoleType.choices)
+
+
+class UserExportSerializer(serializers.Serializer):
+    """query parameters of the user export"""
+
+    output = serializers.ChoiceField(choices=["ndjson", "csv"], default="ndjson")
+    role = serializers.ChoiceField(choices=RoleType.choices, required=False)
+    status = serializers.ChoiceField(choices=["active", "inactive"], required=False)
@@ -1,17 +1,32 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 
-# from rest_framework.decorators import action
 from hms.application.user_management.services import UserAppService
 from hms.interfaces.user_management.serializers import (
     UserListViewSerializer,
+    UserListValuesSerializer,
     UserCreateViewSerializer,
+    BulkUserActionSerializer,
+    BulkRoleChangeSerializer,
+    UserExportSerializer,
 )
+from lib.django.custom_conditional import (
+    get_instance_validators,
+    get_not_modified_response,
+    get_queryset_validators,
+    set_validator_headers,
+)
+from lib.django.custom_exceptions import ConcurrentUpdateException
+from lib.django.custom_export import QuerysetExport
 from lib.django.custom_response import CustomResponse
 from lib.django.custom_permissions import PatientNotAllowed, DoctorNotAllowed, OwnDataAccess
 from lib.django.custom_models import RoleType
+from lib.django.utils import iter_csv_rows, iter_ndjson_rows
 from hms import settings
+from .filters import UserSearchFilter
 from .open_api import user_view_schema
+from .pagination import UserKeysetPagination
 
 logger = settings.logger
 
@@ -20,13 +35,23 @@ class UserViewSet(viewsets.GenericViewSet):
     """viewset to list, create, update, delete and retrieve users"""
 
     user_app_service = UserAppService()
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [UserSearchFilter]
     search_fields = ["username", "email"]
     queryset = user_app_service.list_users()
+    # read path of list and retrieve, same output as UserListViewSerializer
+    values_serializer = UserListValuesSerializer()
 
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
-        if self.action == "list" or self.action == "create":
+        if self.action in (
+            "list",
+            "create",
+            "import_users",
+            "bulk_deactivate",
+            "bulk_reactivate",
+            "bulk_role",
+            "export",
+        ):
             self.permission_classes.extend([PatientNotAllowed, DoctorNotAllowed])
         elif self.action == "retrieve":
             if self.request.user.is_authenticated and self.request.user.role == RoleType.PATIENT:
@@ -49,26 +74,44 @@ class UserViewSet(viewsets.GenericViewSet):
             or self.action == "partial_update"
         ):
             return UserCreateViewSerializer
+        elif self.action == "bulk_deactivate" or self.action == "bulk_reactivate":
+            return BulkUserActionSerializer
+        elif self.action == "bulk_role":
+            return BulkRoleChangeSerializer
+
+    def get_paginator(self, request):
+        """keyset pagination when a cursor is sent, page numbers otherwise"""
+        if UserKeysetPagination.is_requested(request):
+            return UserKeysetPagination()
+        return self.pagination_class()
 
     def list(self, request, *args, **kwargs):
         """list of users in the dataset, paginated response list and filtered response"""
         # search = request.query_params('search')
-        filter_backends = [filters.SearchFilter]
-        search_fields = ["username", "email"]
-        for backend in filter_backends:
+        for backend in self.filter_backends:
             self.queryset = backend().filter_queryset(
                 request=request, queryset=self.queryset, view=self
             )
 
-        paginator = self.pagination_class()
-        paginated_queryset = paginator.paginate_queryset(self.queryset, request)
+        # polled lists are answered from one aggregate query while unchanged
+        etag, last_modified = get_queryset_validators(request, self.queryset)
+        not_modified = get_not_modified_response(request, etag, last_modified)
+        if not_modified:
+            return not_modified
+
+        paginator = self.get_paginator(request)
+        paginated_rows = paginator.paginate_queryset(
+            self.values_serializer.get_queryset(self.queryset), request
+        )
 
-        serializer = self.get_serializer_class()
         try:
-            serializer = serializer(paginated_queryset, many=True)
-            return CustomResponse(
-                message="list data", data=serializer.data
+            data = self.values_serializer.to_representation(paginated_rows)
+            if isinstance(paginator, UserKeysetPagination):
+                data = paginator.get_paginated_data(data)
+            response = CustomResponse(
+                message="list data", data=data
             ).success_message()
+            return set_validator_headers(response, etag, last_modified)
         except Exception as e:
             return CustomResponse(
                 message=e, status=status.HTTP_404_NOT_FOUND
@@ -76,14 +119,18 @@ class UserViewSet(viewsets.GenericViewSet):
 
     def retrieve(self, request, pk):
         """retrieve user information for the given user_id"""
-        serializer = self.get_serializer_class()
         try:
             instance = self.user_app_service.get_active_user_by_id(pk)
             if instance:
-                serializer = serializer(instance)
-                return CustomResponse(
-                    message="user object", data=serializer.data
+                etag, last_modified = get_instance_validators(instance)
+                not_modified = get_not_modified_response(request, etag, last_modified)
+                if not_modified:
+                    return not_modified
+                response = CustomResponse(
+                    message="user object",
+                    data=self.values_serializer.to_representation_one(instance),
                 ).success_message()
+                return set_validator_headers(response, etag, last_modified)
             return CustomResponse(message="No User Found!").error_message()
         except Exception as e:
             return CustomResponse(
@@ -118,7 +165,12 @@ class UserViewSet(viewsets.GenericViewSet):
                     instance=instance, data=request.data, partial=partial
                 )
                 if serializer_obj.is_valid():
-                    serializer_obj.save()
+                    try:
+                        serializer_obj.save()
+                    except ConcurrentUpdateException as e:
+                        return CustomResponse(
+                            message=str(e), status=status.HTTP_409_CONFLICT
+                        ).error_message()
                     return CustomResponse(
                         message=f"User {instance} Updated!",
                         data=serializer_obj.data,
@@ -143,8 +195,7 @@ class UserViewSet(viewsets.GenericViewSet):
         try:
             instance = self.user_app_service.get_active_user_by_id(pk)
             if instance:
-                instance.is_active = False
-                instance.save()
+                self.user_app_service.deactivate_user(instance)
                 return CustomResponse(
                     message=f"User {instance} deleted!"
                 ).success_message()
@@ -154,6 +205,113 @@ class UserViewSet(viewsets.GenericViewSet):
         except Exception as e:
             return CustomResponse(message=e).error_message()
 
+    @action(methods=["post"], detail=False, url_path="import", url_name="import")
+    def import_users(self, request, *args, **kwargs):
+        """
+        bulk create users from CSV or NDJSON
+
+        Send the rows as the request body with a `text/csv` or
+        `application/x-ndjson` content type, or upload them as `file`.
+        Each row holds username, email, password and role.
+        """
+        try:
+            rows = self.get_import_rows(request)
+            if rows is None:
+                return CustomResponse(
+                    message="validation error",
+                    data={"file": "Upload a .csv or .ndjson file or send the rows as the request body"},
+                ).error_message()
+            report = self.user_app_service.import_users(rows)
+            return CustomResponse(
+                message=f"{report['created']} Users Imported",
+                data=report,
+                status=status.HTTP_201_CREATED,
+            ).success_message()
+        except Exception as e:
+            return CustomResponse(message=e).error_message()
+
+    @staticmethod
+    def get_import_rows(request):
+        """row iterator over the request body or uploaded file, `None` if the format is unknown"""
+        readers = {"csv": iter_csv_rows, "ndjson": iter_ndjson_rows}
+        content_type = request.content_type.split(";")[0].strip()
+        if content_type == "text/csv":
+            return iter_csv_rows(request.stream or [])
+        if content_type == "application/x-ndjson":
+            return iter_ndjson_rows(request.stream or [])
+        upload = request.FILES.get("file")
+        if upload is None:
+            return None
+        input_format = request.query_params.get("input") or upload.name.rsplit(".", 1)[-1]
+        reader = readers.get(input_format.lower())
+        return reader(upload) if reader else None
+
+    @action(methods=["get"], detail=False, url_path="export", url_name="export")
+    def export(self, request, *args, **kwargs):
+        """
+        stream every matching user as NDJSON or CSV (`?output=`)
+
+        Takes `role`, `status` (active / inactive) and `search` like the list,
+        rows are streamed in chunks so the whole table is never held in memory.
+        """
+        try:
+            params = UserExportSerializer(data=request.query_params)
+            if not params.is_valid():
+                return CustomResponse(
+                    message="validation error", data=params.errors
+                ).error_message()
+            status_filter = params.validated_data.get("status")
+            queryset = self.user_app_service.list_users_by(
+                role=params.validated_data.get("role"),
+                is_active=None if status_filter is None else status_filter == "active",
+            )
+            for backend in self.filter_backends:
+                queryset = backend().filter_queryset(request=request, queryset=queryset, view=self)
+            return QuerysetExport(
+                queryset,
+                self.values_serializer,
+                output=params.validated_data["output"],
+                name="users",
+            ).get_response(request)
+        except Exception as e:
+            return CustomResponse(message=e).error_message()
+
+    @action(methods=["post"], detail=False, url_path="bulk-deactivate", url_name="bulk-deactivate")
+    def bulk_deactivate(self, request, *args, **kwargs):
+        """deactivate users selected by `ids` and/or `filter` in one statement"""
+        return self.run_bulk_action(request, self.user_app_service.bulk_deactivate_users)
+
+    @action(methods=["post"], detail=False, url_path="bulk-reactivate", url_name="bulk-reactivate")
+    def bulk_reactivate(self, request, *args, **kwargs):
+        """reactivate users selected by `ids` and/or `filter` in one statement"""
+        return self.run_bulk_action(request, self.user_app_service.bulk_reactivate_users)
+
+    @action(methods=["post"], detail=False, url_path="bulk-role", url_name="bulk-role")
+    def bulk_role(self, request, *args, **kwargs):
+        """give users selected by `ids` and/or `filter` a new `role` in one statement"""
+        return self.run_bulk_action(request, self.user_app_service.bulk_change_role)
+
+    def run_bulk_action(self, request, bulk_action):
+        serializer = self.get_serializer_class()
+        try:
+            serializer_obj = serializer(data=request.data)
+            if serializer_obj.is_valid():
+                params = dict(serializer_obj.validated_data)
+                affected = bulk_action(
+                    id_list=params.pop("ids", None),
+                    filters=params.pop("filter", None),
+                    **params,
+                )
+                return CustomResponse(
+                    message=f"{affected} Users Updated",
+                    data={"affected": affected},
+                ).success_message()
+            return CustomResponse(
+                message="validation error", data=serializer_obj.errors
+            ).error_message()
+        except Exception as e:
+            return CustomResponse(message=e).error_message()
+
     # @action(detail=False, methods=['post'])
     # def get_username(self, request):
     #     return Response({})
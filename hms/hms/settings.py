@@ -58,16 +58,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "lib.django.custom_metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "lib.django.custom_compression.CompressionMiddleware",
+    "lib.django.custom_asgi.ASGIUrlconfMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "lib.django.custom_routers.ReplicaStickinessMiddleware",
+    "lib.django.custom_identity_map.IdentityMapMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "hms.interfaces.urls"
+# requests served through asgi.py, async password endpoints in front of ROOT_URLCONF
+ASGI_URLCONF = "hms.interfaces.asgi_urls"
 
 TEMPLATES = [
     {
@@ -106,6 +113,77 @@ DATABASES = {
     }
 }
 
+# read replicas, copies of `default` with their own HOST (or NAME, for two
+# local SQLite files standing in for primary and replica)
+DB_REPLICA_HOSTS = [host for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host]
+DB_REPLICA_NAMES = [name for name in os.getenv("DB_REPLICA_NAMES", "").split(",") if name]
+REPLICA_DATABASES = []
+for index in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    alias = f"replica{index + 1}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": DB_REPLICA_HOSTS[index] if index < len(DB_REPLICA_HOSTS) else DATABASES["default"]["HOST"],
+        "NAME": DB_REPLICA_NAMES[index] if index < len(DB_REPLICA_NAMES) else DATABASES["default"]["NAME"],
+        # tests read the rows they wrote through the primary connection
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["lib.django.custom_routers.ReplicaRouter"]
+# seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# token invalidation is kept here, `check --deploy` requires a shared backend
+# (hms.E001), the local memory default only serves a single process
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+# read-through cache of user lookups, 0 disables it. The in-process tier
+# can't be invalidated by other processes, keep its timeout short; password,
+# reset token and refresh checks read the primary instead. Set
+# USER_CACHE_SHARED to an alias of CACHES to add a shared tier.
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 1024))
+USER_CACHE_LOCAL_TIMEOUT = int(os.getenv("USER_CACHE_LOCAL_TIMEOUT", 10))
+USER_CACHE_SHARED = os.getenv("USER_CACHE_SHARED", "")
+USER_CACHE_SHARED_TIMEOUT = int(os.getenv("USER_CACHE_SHARED_TIMEOUT", 300))
+
+
+# password hashing pool of the async auth views, 0 picks the number of cores.
+# Requests beyond workers + queue are refused with 503 until a slot frees up.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 0)) or None
+PASSWORD_HASHING_QUEUE = int(os.getenv("PASSWORD_HASHING_QUEUE", 0)) or None
+
+
+# access tokens revoked on logout, checked against an in-process Bloom filter
+# sized for TOKEN_REVOCATION_CAPACITY tokens. Revocations from other processes
+# are picked up within TOKEN_REVOCATION_SYNC_SECONDS.
+REVOKED_TOKEN_MODEL = "user_management.RevokedToken"
+TOKEN_REVOCATION_CAPACITY = int(os.getenv("TOKEN_REVOCATION_CAPACITY", 100_000))
+TOKEN_REVOCATION_ERROR_RATE = float(os.getenv("TOKEN_REVOCATION_ERROR_RATE", 0.001))
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", 1))
+
+
+# one row per login tracks its rotated refresh tokens, reusing an old one
+# revokes the login. Expired rows are swept every TOKEN_FAMILY_SWEEP_SECONDS.
+TOKEN_FAMILY_MODEL = "user_management.RefreshTokenFamily"
+TOKEN_FAMILY_SWEEP_SECONDS = int(os.getenv("TOKEN_FAMILY_SWEEP_SECONDS", 600))
+TOKEN_FAMILY_SWEEP_CHUNK_SIZE = int(os.getenv("TOKEN_FAMILY_SWEEP_CHUNK_SIZE", 1000))
+
+
+# last_login is written behind, in one UPDATE every LAST_LOGIN_FLUSH_INTERVAL
+# seconds or once LAST_LOGIN_BUFFER_SIZE users logged in, so it may lag by
+# that much. 0 writes it when the login request commits.
+LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", 5))
+LAST_LOGIN_BUFFER_SIZE = int(os.getenv("LAST_LOGIN_BUFFER_SIZE", 1000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -150,6 +228,14 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 OTP_EXPIRATION = int(os.getenv("OTP_EXPIRATION"))
+# seconds a signed reset token of a verified otp stays valid
+PASSWORD_RESET_TIMEOUT = OTP_EXPIRATION * 60
+# dotted path to a lib.django.custom_otp_store store: DatabaseOTPStore,
+# CacheOTPStore on the default cache, or MemoryOTPStore for a single process
+OTP_STORE = os.getenv("OTP_STORE", "lib.django.custom_otp_store.DatabaseOTPStore")
+
+# dotted path to a lib.django.custom_search backend, chosen by database vendor if empty
+USER_SEARCH_BACKEND = os.getenv("USER_SEARCH_BACKEND", "")
 
 
 REST_FRAMEWORK = {
@@ -157,11 +243,13 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": int(os.getenv("PAGE_SIZE")),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "lib.django.custom_authentication.ClaimsJWTAuthentication",
     ),
+    # envelope written straight to bytes, orjson when installed
+    # the browsable API only in development, clients always get JSON in production
     "DEFAULT_RENDERER_CLASSES": [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'lib.django.custom_renderers.EnvelopeJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ], # Response object
     "DEFAULT_PARSER_CLASSES": [
         'rest_framework.parsers.JSONParser',
@@ -182,11 +270,36 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("JWT",),
     "UPDATE_LAST_LOGIN": True,
     "USER_ID_FIELD": os.getenv("USER_ID_FIELD"),
-    "ROTATE_REFRESH_TOKENS": True
+    "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_USER_CLASS": "lib.django.custom_authentication.ClaimsUser",
 }
 
 API_SWAGGER_URL = os.getenv("API_SWAGGER_URL")
 
+# response compression, codings in order of preference. zstd and br are used
+# when the zstandard / brotli packages are installed, gzip always is.
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",")
+COMPRESSION_LEVELS = {"gzip": 6, "br": 4, "zstd": 3}
+# bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+# static payloads compressed once per process, by URL name
+COMPRESSION_CACHED_URL_NAMES = ["schema"]
+COMPRESSION_CACHE_SIZE = 32
+# responses carrying tokens or reset links are never compressed (BREACH)
+COMPRESSION_EXCLUDED_PATHS = [f"/{API_SWAGGER_URL}auth/", f"/{API_SWAGGER_URL}refresh/"]
+
+# bearer token Prometheus sends to scrape /metrics, /metrics is refused when empty
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# queries at least this slow are logged to SLOW_QUERY_LOG_FILE, 0 turns the log off
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+# share of the slow reads that are explained, within an EXPLAIN budget per process
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1))
+SLOW_QUERY_EXPLAINS_PER_MINUTE = int(os.getenv("SLOW_QUERY_EXPLAINS_PER_MINUTE", 30))
+# a slow query is attributed to the innermost frame of the first of these found on the stack
+SLOW_QUERY_CALLER_MODULES = ("hms.domain", "hms.application", "hms.interfaces")
+SLOW_QUERY_LOG_FILE = os.getenv("SLOW_QUERY_LOG_FILE", str(BASE_DIR / "slow_queries.jsonl"))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'HMS API',
     'DESCRIPTION': 'Hospital Management System',
@@ -212,7 +325,10 @@ LOGGING = {
             "()": "django.utils.log.ServerFormatter",
             "format": "[{server_time}] {message}",
             "style": "{",
-        }
+        },
+        "slow_queries": {
+            "()": "lib.django.custom_slow_queries.SlowQueryFormatter",
+        },
     },
     "handlers": {
         "console": {
@@ -230,6 +346,13 @@ LOGGING = {
             "filters": ["require_debug_false"],
             "class": "django.utils.log.AdminEmailHandler",
         },
+        "slow_queries": {
+            "level": "WARNING",
+            "class": "logging.FileHandler",
+            "filename": SLOW_QUERY_LOG_FILE,
+            "formatter": "slow_queries",
+            "delay": True,
+        },
     },
     "loggers": {
         "django": {
@@ -241,5 +364,10 @@ LOGGING = {
             "level": "INFO",
             "propagate": False,
         },
+        "hms.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
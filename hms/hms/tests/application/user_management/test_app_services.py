@@ -0,0 +1,79 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password
+
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import User
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+from lib.django.custom_token_family import get_token_family_store
+
+
+class TestImportUsers(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_patient1, = create_test_user(1, RoleType.PATIENT)
+        cls.user_app_service = UserAppService()
+
+    def row(self, index, **kwargs):
+        return {"username": f"import{index}", "email": f"import{index}@hospital.org", "password": "practice123", "role": RoleType.DOCTOR, **kwargs}
+
+    def test_creates_valid_rows_and_reports_invalid(self):
+        rows = [
+            self.row(1),
+            self.row(2, email="invalid"),
+            None,
+            self.row(3, email=self.test_patient1.email),
+            self.row(4, username="import1"),
+            self.row(5, role="janitor"),
+            self.row(6, role=RoleType.STAFF),
+        ]
+        report = self.user_app_service.import_users(rows, batch_size=3, workers=1)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3, 4, 5, 6])
+        self.assertIn("email", report["errors"][2]["errors"])
+        self.assertIn("username", report["errors"][3]["errors"])
+        staff = User.objects.get(username="import6")
+        self.assertTrue(staff.is_staff)
+        self.assertTrue(check_password("practice123", staff.password))
+
+    def test_hashes_across_process_pool(self):
+        report = self.user_app_service.import_users([self.row(index) for index in range(6)], workers=2)
+        self.assertEqual(report["created"], 6)
+        self.assertTrue(User.objects.get(username="import5").check_password("practice123"))
+
+    def test_hashes_on_shared_executor_without_workers(self):
+        with mock.patch("hms.application.user_management.services.PasswordHashingPool") as hashing_pool:
+            report = self.user_app_service.import_users([self.row(index) for index in range(3)])
+        hashing_pool.assert_not_called()
+        self.assertEqual(report["created"], 3)
+        self.assertTrue(User.objects.get(username="import2").check_password("practice123"))
+
+
+class TestEndSessions(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_patient1, cls.test_patient2 = create_test_user(2, RoleType.PATIENT)
+        cls.user_app_service = UserAppService()
+
+    def assert_login_ended(self, refresh_token):
+        refresh = RefreshToken(refresh_token)
+        with self.assertRaises(TokenError):
+            get_token_family_store().rotate(refresh, RefreshToken(refresh_token))
+
+    def test_deactivation_ends_sessions(self):
+        refresh_token = self.user_app_service.get_user_token(self.test_patient1)["refresh token"]
+        self.user_app_service.deactivate_user(self.test_patient1)
+        self.assert_login_ended(refresh_token)
+
+    def test_bulk_deactivation_ends_sessions(self):
+        refresh_tokens = [
+            self.user_app_service.get_user_token(user)["refresh token"] for user in (self.test_patient1, self.test_patient2)
+        ]
+        self.user_app_service.bulk_deactivate_users([self.test_patient1.id, self.test_patient2.id])
+        for refresh_token in refresh_tokens:
+            self.assert_login_ended(refresh_token)
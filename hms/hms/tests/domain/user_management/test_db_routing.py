@@ -0,0 +1,135 @@
+import os
+import tempfile
+import uuid
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from hms.domain.patient_management.services import PatientService
+from hms.domain.user_management.models import RefreshTokenFamily, RevokedToken, User, UserOTP
+from hms.domain.user_management.services import USER_SEARCH_FIELDS, UserService
+from lib.django.custom_models import RoleType
+from lib.django.custom_routers import ReplicaStickinessMiddleware, use_primary
+from lib.django.custom_search import InvertedIndexSearchBackend
+
+REPLICA = "replica_test"
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA], REPLICA_STICKY_SECONDS=5)
+class TestReplicaRouting(TransactionTestCase):
+    """a second SQLite database stands in for the replica, it holds rows the primary doesn't"""
+
+    @classmethod
+    def setUpClass(cls):
+        # added here, the test runner only sets up the aliases of settings.DATABASES
+        cls.databases = {"default", REPLICA}
+        handle, cls.replica_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        connections.settings[REPLICA] = {
+            **connections.settings["default"],
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": cls.replica_path,
+            "OPTIONS": {},
+        }
+        call_command("migrate", database=REPLICA, run_syncdb=True, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        os.unlink(cls.replica_path)
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.user = User.objects.create(username="primary", email="primary@hospital.org", role=RoleType.PATIENT)
+        # replicated, then changed on the primary only: the replica lags behind
+        User.objects.using(REPLICA).bulk_create([User(**{
+            field.attname: getattr(self.user, field.attname) for field in User._meta.concrete_fields
+        })])
+        User.objects.filter(id=self.user.id).update(username="primary-newer")
+
+    def read_username(self):
+        return UserService().get_all_users().values_list("username", flat=True).get(id=self.user.id)
+
+    def get_username_after(self, request, write=False):
+        """run a request through the middleware, returns the username read by the view and the response"""
+        seen = {}
+
+        def view(request):
+            if write:
+                User.objects.filter(id=self.user.id).update(last_login=None)
+            seen["username"] = self.read_username()
+            return HttpResponse()
+
+        response = ReplicaStickinessMiddleware(view)(request)
+        return seen["username"], response
+
+    def test_domain_reads_go_to_replica(self):
+        self.assertEqual(self.read_username(), "primary")
+        self.assertEqual(UserService().get_user_by_username("primary").id, self.user.id)
+        self.assertEqual(PatientService().get_patient_list().db, REPLICA)
+
+    def test_other_reads_stay_on_primary(self):
+        self.assertEqual(User.objects.get(id=self.user.id).username, "primary-newer")
+        # checked right after they are written
+        for model in (RevokedToken, UserOTP, RefreshTokenFamily, Session):
+            self.assertEqual(model.objects.all().db, "default")
+
+    def test_writes_through_replica_querysets_go_to_primary(self):
+        UserService().get_all_users().filter(id=self.user.id).update(username="written")
+        self.assertEqual(User.objects.get(id=self.user.id).username, "written")
+        self.assertEqual(User.objects.using(REPLICA).get(id=self.user.id).username, "primary")
+
+    def test_search_index_is_built_from_primary(self):
+        backend = InvertedIndexSearchBackend(USER_SEARCH_FIELDS)
+        with patch.object(UserService, "get_search_backend", return_value=backend):
+            call_command("build_user_search_index", stdout=StringIO())
+        self.assertEqual(backend.rank(["newer"]), [self.user.id])
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_reads_go_to_primary_without_replicas(self):
+        self.assertEqual(self.read_username(), "primary-newer")
+
+    def test_reads_after_write_stick_to_primary_for_the_request(self):
+        username, response = self.get_username_after(self.factory.get("/"), write=True)
+        self.assertEqual(username, "primary-newer")
+        self.assertIn(ReplicaStickinessMiddleware.cookie_name, response.cookies)
+
+    def test_read_only_request_is_not_pinned(self):
+        username, response = self.get_username_after(self.factory.get("/"))
+        self.assertEqual(username, "primary")
+        self.assertNotIn(ReplicaStickinessMiddleware.cookie_name, response.cookies)
+
+    def test_pinned_cookie_reads_from_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[ReplicaStickinessMiddleware.cookie_name] = "1"
+        username, _ = self.get_username_after(request)
+        self.assertEqual(username, "primary-newer")
+
+    def test_token_client_is_pinned_through_cache(self):
+        token = AccessToken()
+        token["user_id"] = str(uuid.uuid4())
+        headers = {"HTTP_AUTHORIZATION": f"{api_settings.AUTH_HEADER_TYPES[0]} {token}"}
+        self.get_username_after(self.factory.post("/", **headers), write=True)
+        username, _ = self.get_username_after(self.factory.get("/", **headers))
+        self.assertEqual(username, "primary-newer")
+        username, _ = self.get_username_after(self.factory.get("/"))
+        self.assertEqual(username, "primary")
+
+    def test_use_primary_block(self):
+        with use_primary():
+            self.assertEqual(self.read_username(), "primary-newer")
+        self.assertEqual(self.read_username(), "primary")
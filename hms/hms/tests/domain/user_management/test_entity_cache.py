@@ -0,0 +1,127 @@
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TransactionTestCase
+
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import User
+from hms.domain.user_management.services import UserService
+from lib.django.custom_entity_cache import EntityCache
+from lib.django.custom_models import RoleType
+
+
+def build_user(name):
+    user = User(id=uuid.uuid4(), username=name, email=f"{name}@hospital.org", role=RoleType.PATIENT)
+    # as loaded from the primary
+    user._state.db = "default"
+    return user
+
+
+class TestEntityCache(SimpleTestCase):
+    def setUp(self):
+        self.users = {name: build_user(name) for name in ("alice", "bob", "carol")}
+        self.loads = []
+
+    def loader(self, name):
+        def load():
+            self.loads.append(name)
+            return self.users[name]
+        return load
+
+    def test_hit_returns_fresh_copy(self):
+        entity_cache = EntityCache(User, max_size=2)
+        alice = self.users["alice"]
+        entity_cache.get(alice.id, self.loader("alice"))
+        cached = entity_cache.get(str(alice.id), self.loader("alice"))
+        self.assertEqual(self.loads, ["alice"])
+        self.assertIsNot(cached, alice)
+        self.assertEqual((cached.id, cached.email), (alice.id, alice.email))
+        self.assertEqual(entity_cache.stats["hits"], 1)
+
+    def test_lookup_by_email_and_eviction(self):
+        entity_cache = EntityCache(User, max_size=2)
+        for name in ("alice", "bob", "carol"):
+            entity_cache.get_by("email", f"{name}@hospital.org", self.loader(name))
+        entity_cache.get_by("email", "carol@hospital.org", self.loader("carol"))
+        entity_cache.get_by("email", "alice@hospital.org", self.loader("alice"))
+        self.assertEqual(self.loads, ["alice", "bob", "carol", "alice"])
+        self.assertEqual(entity_cache.stats["evictions"], 2)
+
+    def test_invalidation_reaches_shared_tier(self):
+        entity_cache = EntityCache(User, shared_alias="default")
+        alice = self.users["alice"]
+        entity_cache.get(alice.id, self.loader("alice"))
+        entity_cache.clear()
+        entity_cache.get(alice.id, self.loader("alice"))
+        self.assertEqual(entity_cache.stats["shared_hits"], 1)
+        entity_cache.invalidate(alice.id)
+        entity_cache.get(alice.id, self.loader("alice"))
+        self.assertEqual(self.loads, ["alice", "alice"])
+
+
+    def test_replica_reads_are_not_cached(self):
+        entity_cache = EntityCache(User, shared_alias="default")
+        alice = self.users["alice"]
+        alice._state.db = "replica1"
+        entity_cache.get(alice.id, self.loader("alice"))
+        entity_cache.get(alice.id, self.loader("alice"))
+        self.assertEqual(self.loads, ["alice", "alice"])
+        self.assertEqual(entity_cache.stats["size"], 0)
+
+
+class TestUserServiceCache(TransactionTestCase):
+    def setUp(self):
+        UserService.get_entity_cache().clear()
+        self.user = User.objects.create(username="dora", email="dora@hospital.org", role=RoleType.PATIENT)
+        self.user_service = UserService()
+
+    def test_repeated_lookups_skip_the_database(self):
+        self.user_service.get_user_by_email(self.user.email)
+        with self.assertNumQueries(0):
+            self.user_service.get_user_by_email(self.user.email)
+            self.user_service.get_active_user_by_id(self.user.id)
+
+    def test_save_invalidates(self):
+        user = self.user_service.get_user_by_id(self.user.id)
+        user.set_password("practice123")
+        user.save()
+        with self.assertNumQueries(1):
+            cached = self.user_service.get_user_by_id(self.user.id)
+        self.assertTrue(cached.check_password("practice123"))
+
+    def test_bulk_deactivate_invalidates(self):
+        self.user_service.get_active_user_by_id(self.user.id)
+        self.user_service.bulk_update_users(User.objects.filter(id=self.user.id), is_active=False)
+        with self.assertRaises(User.DoesNotExist):
+            self.user_service.get_active_user_by_id(self.user.id)
+
+    def test_deactivating_stale_instance_keeps_newer_changes(self):
+        stale = self.user_service.get_user_by_id(self.user.id)
+        User.objects.filter(id=self.user.id).update(password="newer-hash", version=5)
+        self.user_service.deactivate_user(stale)
+        row = User.objects.get(id=self.user.id)
+        self.assertEqual((row.is_active, row.password, row.version), (False, "newer-hash", 6))
+        self.assertEqual(stale.version, 6)
+        with self.assertRaises(User.DoesNotExist):
+            self.user_service.get_active_user_by_id(self.user.id)
+
+    def test_update_without_version_ignores_stale_instance(self):
+        stale = self.user_service.get_user_by_id(self.user.id)
+        User.objects.filter(id=self.user.id).update(version=5)
+        updated = UserAppService().update_user(stale, {"email": "dora.new@hospital.org"})
+        self.assertEqual(updated.version, 6)
+        self.assertEqual(User.objects.get(id=self.user.id).email, "dora.new@hospital.org")
+
+    def test_credential_checks_skip_the_cache(self):
+        user_app_service = UserAppService()
+        self.user.set_password("practice123")
+        self.user.save()
+        reset_token = user_app_service.make_reset_token(self.user)
+        self.user_service.get_user_by_email(self.user.email)
+        # written by another process, whose invalidation this one doesn't see
+        User.objects.filter(id=self.user.id).update(password=make_password("newer123"))
+        self.assertIsNone(user_app_service.authenticate_user(self.user.email, "practice123"))
+        self.assertFalse(user_app_service.check_reset_token(reset_token, self.user.id))
+        self.assertIsNotNone(user_app_service.authenticate_user(self.user.email, "newer123"))
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertIsNone(user_app_service.authenticate_user(self.user.email, "newer123"))
@@ -0,0 +1,68 @@
+import datetime
+
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from hms.application.patient_management.services import PatientAppService
+from hms.domain.patient_management.models import Patient
+from hms.domain.user_management.models import User
+from hms.domain.user_management.services import UserService
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_identity_map import IdentityMapMiddleware, identity_map_scope
+from lib.django.custom_models import RoleType
+
+
+class TestIdentityMap(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_patient1, cls.test_patient2 = create_test_user(2, RoleType.PATIENT)
+        cls.patient = Patient.objects.create(
+            user_id=cls.test_patient1.id,
+            patient_name="alice",
+            dob=datetime.date(1990, 1, 1),
+            contact_no="9876543210",
+            address="address",
+        )
+        cls.user_service = UserService()
+        cls.patient_app_service = PatientAppService()
+
+    def test_user_is_loaded_once_per_unit_of_work(self):
+        with identity_map_scope() as identity_map, self.assertNumQueries(1):
+            user = self.user_service.get_user_by_username(self.test_patient1.username)
+            self.assertIs(self.user_service.get_user_by_id(str(user.id)), user)
+            self.assertIs(self.user_service.get_active_user_by_id(user.id), user)
+        self.assertEqual(identity_map.stats["queries_saved"], 2)
+
+    def test_no_reuse_outside_unit_of_work(self):
+        with self.assertNumQueries(2):
+            self.user_service.get_user_by_id(self.test_patient1.id)
+            self.user_service.get_user_by_id(self.test_patient1.id)
+
+    def test_bulk_update_is_not_served_stale(self):
+        with identity_map_scope():
+            self.user_service.get_user_by_id(self.test_patient2.id)
+            self.user_service.bulk_update_users(User.objects.filter(id=self.test_patient2.id), is_active=False)
+            with self.assertRaises(User.DoesNotExist):
+                self.user_service.get_active_user_by_id(self.test_patient2.id)
+
+    def test_patient_by_username_in_one_query(self):
+        with identity_map_scope() as identity_map, self.assertNumQueries(1):
+            patient = self.patient_app_service.get_patient_by_username(self.test_patient1.username)
+            self.assertIs(self.patient_app_service.get_patient_by_id(self.patient.id), patient)
+        self.assertEqual(patient.id, self.patient.id)
+        self.assertEqual(identity_map.stats, {"hits": 1, "misses": 0, "joined": 1, "queries_saved": 2})
+
+    def test_patient_username_in_one_query(self):
+        with self.assertNumQueries(1):
+            username = self.patient_app_service.get_patient_username(self.patient.id)
+        self.assertEqual(username, self.test_patient1.username)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_reports_stats(self):
+        def view(request):
+            self.user_service.get_user_by_id(self.test_patient1.id)
+            self.user_service.get_user_by_id(self.test_patient1.id)
+            return HttpResponse()
+
+        response = IdentityMapMiddleware(view)(RequestFactory().get("/"))
+        self.assertIn("queries_saved=1", response.headers["X-Identity-Map"])
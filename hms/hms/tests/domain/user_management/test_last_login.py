@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from hms.domain.user_management.services import UserService
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+from lib.django.custom_write_behind import WriteBehindBuffer
+
+
+class TestWriteBehindBuffer(SimpleTestCase):
+    def setUp(self):
+        self.flushed = []
+
+    def test_latest_value_wins(self):
+        buffer = WriteBehindBuffer(self.flushed.append, interval=0)
+        buffer.add("alice", 2)
+        buffer.add("alice", 1)
+        buffer.add("bob", 1)
+        self.assertEqual(buffer.flush_now(), 2)
+        self.assertEqual(self.flushed, [{"alice": 2, "bob": 1}])
+        self.assertEqual(buffer.flush_now(), 0)
+        self.assertEqual(buffer.stats["added"], 3)
+
+    def test_failed_flush_is_retried(self):
+        def flush(values):
+            if not self.flushed:
+                self.flushed.append(None)
+                raise RuntimeError("database unavailable")
+            self.flushed.append(values)
+
+        buffer = WriteBehindBuffer(flush, interval=0)
+        buffer.add("alice", 1)
+        with self.assertLogs("lib.django.custom_write_behind", "ERROR"):
+            self.assertEqual(buffer.flush_now(), 0)
+        buffer.add("alice", 3)
+        buffer.flush_now()
+        self.assertEqual(self.flushed[-1], {"alice": 3})
+        self.assertEqual(buffer.stats["failures"], 1)
+
+    def test_thread_flushes_when_full(self):
+        buffer = WriteBehindBuffer(self.flushed.append, interval=60, max_size=2)
+        try:
+            buffer.add("alice", 1)
+            buffer.add("bob", 1)
+            for _ in range(50):
+                if self.flushed:
+                    break
+                buffer.stopped.wait(0.05)
+            self.assertEqual(self.flushed, [{"alice": 1, "bob": 1}])
+        finally:
+            buffer.stop()
+
+
+class TestSetLastLogins(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_patient1, cls.test_patient2 = create_test_user(2, RoleType.PATIENT)
+
+    def test_single_update_keeps_newer_logins(self):
+        now = timezone.now()
+        UserService().set_last_login(self.test_patient2.id, now)
+        with self.assertNumQueries(1):
+            UserService().set_last_logins({
+                self.test_patient1.id: now,
+                self.test_patient2.id: now - timedelta(minutes=1),
+            })
+        self.test_patient1.refresh_from_db()
+        self.test_patient2.refresh_from_db()
+        self.assertEqual(self.test_patient1.last_login, now)
+        self.assertEqual(self.test_patient2.last_login, now)
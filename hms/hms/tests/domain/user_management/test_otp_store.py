@@ -0,0 +1,115 @@
+import datetime
+import io
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from hms.domain.user_management.models import UserOTP, UserOTPFactory
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+from lib.django.custom_otp_store import CacheOTPStore, DatabaseOTPStore, MemoryOTPStore
+from lib.django.custom_routers import ReplicaRouter
+
+
+class OTPStoreTests:
+    store_class = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_patient1, cls.test_patient2 = create_test_user(2, RoleType.PATIENT)
+
+    def setUp(self):
+        self.store = self.store_class(UserOTP)
+
+    def issue(self, user, **values):
+        otp = UserOTPFactory.build_entity_with_id(user=user)
+        for name, value in values.items():
+            setattr(otp, name, value)
+        self.store.issue(otp)
+        return otp
+
+    def test_issue_replaces_pending_otp(self):
+        self.issue(self.test_patient1)
+        otp = self.issue(self.test_patient1)
+        stored = self.store.get(self.test_patient1.id)
+        self.assertEqual((stored.otp, stored.otp_token), (otp.otp, otp.otp_token))
+        self.assertIsNone(self.store.get(self.test_patient2.id))
+
+    def test_token_is_consumed_once(self):
+        otp = self.issue(self.test_patient1)
+        self.assertFalse(self.store.consume(self.test_patient1.id, "wrong-token"))
+        self.assertTrue(self.store.consume(self.test_patient1.id, otp.otp_token))
+        self.assertFalse(self.store.consume(self.test_patient1.id, otp.otp_token))
+        self.assertIsNone(self.store.get(self.test_patient1.id))
+
+    def test_expired_otp_is_gone(self):
+        otp = self.issue(self.test_patient1, otp_expiration=timezone.now() - datetime.timedelta(seconds=1))
+        self.assertIsNone(self.store.get(self.test_patient1.id))
+        self.assertFalse(self.store.consume(self.test_patient1.id, otp.otp_token))
+
+
+class TestDatabaseOTPStore(OTPStoreTests, TestCase):
+    store_class = DatabaseOTPStore
+
+    def test_issue_is_a_single_statement(self):
+        self.issue(self.test_patient1)
+        with self.assertNumQueries(1):
+            otp = self.issue(self.test_patient1)
+        self.assertEqual(UserOTP.objects.count(), 1)
+        # the delete signals of the identity map need the rows, then one DELETE by pk
+        with self.assertNumQueries(2):
+            self.assertTrue(self.store.consume(self.test_patient1.id, otp.otp_token))
+
+    @override_settings(REPLICA_DATABASES=["replica1"])
+    def test_consume_deletes_on_primary(self):
+        otp = self.issue(self.test_patient1)
+        # a replica that is not a test mirror, any query sent to it fails
+        with mock.patch.object(ReplicaRouter, "db_for_read", return_value="replica1"):
+            self.assertTrue(self.store.consume(self.test_patient1.id, otp.otp_token))
+        self.assertFalse(UserOTP.objects.filter(user=self.test_patient1).exists())
+
+
+class TestMemoryOTPStore(OTPStoreTests, TestCase):
+    store_class = MemoryOTPStore
+
+    def test_timer_wheel_frees_expired_entries(self):
+        with mock.patch("lib.django.custom_otp_store.time.monotonic", return_value=1000.0) as monotonic:
+            self.store = MemoryOTPStore(UserOTP, slots=8)
+            self.issue(self.test_patient1, otp_expiration=timezone.now() + datetime.timedelta(seconds=3))
+            self.issue(self.test_patient2, otp_expiration=timezone.now() + datetime.timedelta(seconds=30))
+            self.assertEqual(len(self.store), 2)
+            monotonic.return_value = 1005.0
+            self.assertEqual(len(self.store), 1)
+            # more than a turn of the wheel at once
+            monotonic.return_value = 1100.0
+            self.assertEqual(len(self.store), 0)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "otp-tests"}})
+class TestCacheOTPStore(OTPStoreTests, TestCase):
+    store_class = CacheOTPStore
+
+
+class TestPurgeExpiredOtps(TestCase):
+    def test_purges_in_chunks(self):
+        now = timezone.now()
+        UserOTP.objects.bulk_create(
+            [UserOTP(otp=1234, otp_expiration=now - datetime.timedelta(minutes=i + 1)) for i in range(5)]
+            + [UserOTP(otp=1234, otp_expiration=now + datetime.timedelta(minutes=5))]
+        )
+        stdout = io.StringIO()
+        call_command("purge_expired_otps", chunk_size=2, pause=0, stdout=stdout)
+        self.assertIn("purged 5 expired OTPs", stdout.getvalue())
+        self.assertEqual(UserOTP.objects.count(), 1)
+
+    @override_settings(REPLICA_DATABASES=["replica1"])
+    def test_purges_on_primary(self):
+        UserOTP.objects.bulk_create(
+            [UserOTP(otp=1234, otp_expiration=timezone.now() - datetime.timedelta(minutes=1)) for _ in range(3)]
+        )
+        # a replica that is not a test mirror, any query sent to it fails
+        with mock.patch.object(ReplicaRouter, "db_for_read", return_value="replica1"):
+            call_command("purge_expired_otps", chunk_size=2, pause=0, stdout=io.StringIO())
+        self.assertEqual(UserOTP.objects.count(), 0)
@@ -0,0 +1,48 @@
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from hms.domain.user_management.models import RevokedToken
+from lib.django.custom_revocation import BloomFilter, RevocationList
+
+
+class TestBloomFilter(SimpleTestCase):
+    def test_members_and_error_rate(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        members = [uuid.uuid4().hex for _ in range(1000)]
+        for member in members:
+            bloom.add(member)
+        self.assertTrue(all(member in bloom for member in members))
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestRevocationList(TestCase):
+    def setUp(self):
+        cache.delete(RevocationList.generation_key)
+        self.revocation_list = RevocationList(RevokedToken, capacity=100, sync_interval=60)
+        self.expires_at = timezone.now() + timedelta(minutes=5)
+
+    def test_unrevoked_token_checked_without_query(self):
+        self.revocation_list.revoke("revoked", self.expires_at)
+        self.revocation_list.sync()
+        with self.assertNumQueries(0):
+            self.assertFalse(self.revocation_list.is_revoked("active"))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.revocation_list.is_revoked("revoked"))
+
+    def test_revocations_of_other_processes_are_loaded(self):
+        other_process = RevocationList(RevokedToken, capacity=100, sync_interval=0)
+        self.assertFalse(other_process.is_revoked("revoked"))
+        self.revocation_list.revoke("revoked", self.expires_at)
+        self.assertTrue(other_process.is_revoked("revoked"))
+
+    def test_expired_tokens_are_ignored_and_purged(self):
+        self.revocation_list.revoke("expired", timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti="stale", expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(self.revocation_list.is_revoked("stale"))
+        self.assertEqual(self.revocation_list.purge(), 1)
+        self.assertFalse(RevokedToken.objects.exists())
@@ -0,0 +1,94 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from rest_framework.test import APITestCase
+
+from hms.domain.user_management.models import User
+from hms.domain.user_management.services import UserService, USER_SEARCH_FIELDS
+from lib.django.custom_models import RoleType
+from lib.django.custom_search import InvertedIndexSearchBackend, TrigramSearchBackend
+
+
+class TestInvertedIndexSearchBackend(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            username: User.objects.create_user(
+                username=username, email=f"{username}@hospital.org", password="practice123", role=RoleType.PATIENT
+            )
+            for username in ["anna", "annabel", "joanna", "bob"]
+        }
+
+    def setUp(self):
+        self.backend = InvertedIndexSearchBackend(USER_SEARCH_FIELDS)
+        self.backend.build(User.objects.all())
+
+    def search(self, *terms):
+        return [user.username for user in self.backend.search(User.objects.all(), list(terms))]
+
+    def test_ranks_exact_then_prefix_then_substring(self):
+        self.assertEqual(self.search("anna"), ["anna", "annabel", "joanna"])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search("anna", "bel"), ["annabel"])
+
+    def test_short_terms_scan_documents(self):
+        self.assertEqual(self.search("bo"), ["bob"])
+
+    def test_large_result_sets_are_not_truncated(self):
+        self.backend.max_ranked = 2
+        self.assertEqual(sorted(self.search("anna")), ["anna", "annabel", "joanna"])
+
+    def test_no_match_returns_empty_queryset(self):
+        self.assertEqual(self.search("zzz"), [])
+
+    def test_updated_on_save(self):
+        user = self.users["bob"]
+        user.username = "robert"
+        self.backend.update(user)
+        self.assertEqual(self.search("robert"), [])  # not saved, database disagrees
+        user.save()
+        self.assertEqual(self.search("robert"), ["robert"])
+
+    def test_user_service_backend_follows_saves(self):
+        user_service = UserService()
+        user_service.search_users(User.objects.all(), ["anna"])
+        User.objects.create_user(username="hannah", email="hannah@hospital.org", password="practice123")
+        self.assertEqual(
+            [user.username for user in user_service.search_users(User.objects.all(), ["hannah"])],
+            ["hannah"],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "pg_trgm indexes need PostgreSQL")
+class TestTrigramSearchBackend(TransactionTestCase):
+    # CREATE INDEX CONCURRENTLY can't run inside the transaction of a TestCase
+
+    def setUp(self):
+        for username in ["anna", "annabel", "joanna", "bob"]:
+            User.objects.create_user(
+                username=username, email=f"{username}@hospital.org", password="practice123", role=RoleType.PATIENT
+            )
+        self.backend = TrigramSearchBackend(USER_SEARCH_FIELDS)
+        self.stats = self.backend.build(User.objects.all())
+
+    def test_match_filter_uses_trigram_index(self):
+        table = User._meta.db_table
+        column = User._meta.get_field("username").column
+        index = self.backend.get_index_name(table, column)
+        self.assertIn(index, self.stats["indexes"])
+        with connection.cursor() as cursor:
+            # a few rows are cheaper to scan, make the planner show its index choice
+            cursor.execute("SET enable_seqscan = off")
+            try:
+                plan = User.objects.filter(username__icontains="anna").explain()
+            finally:
+                cursor.execute("RESET enable_seqscan")
+        self.assertIn(index, plan)
+
+    def test_ranks_by_similarity(self):
+        usernames = [user.username for user in self.backend.search(User.objects.all(), ["anna"])]
+        self.assertEqual(usernames[0], "anna")
+        self.assertEqual(sorted(usernames), ["anna", "annabel", "joanna"])
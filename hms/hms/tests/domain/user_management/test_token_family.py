@@ -0,0 +1,71 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from hms.domain.user_management.models import RefreshTokenFamily
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+from lib.django.custom_routers import ReplicaRouter
+from lib.django.custom_token_family import TokenFamilyStore
+
+
+class TestTokenFamilyStore(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_patient1,) = create_test_user(1, RoleType.PATIENT)
+
+    def create_families(self, count, expires_at):
+        RefreshTokenFamily.objects.bulk_create(
+            RefreshTokenFamily(
+                id=f"{expires_at.timestamp()}-{i}", user=self.test_patient1, current_jti="jti", expires_at=expires_at
+            )
+            for i in range(count)
+        )
+
+    def test_purge_expired_in_chunks(self):
+        now = timezone.now()
+        self.create_families(5, now - timedelta(seconds=1))
+        self.create_families(2, now + timedelta(days=1))
+        store = TokenFamilyStore(RefreshTokenFamily, sweep_interval=0)
+        self.assertEqual(store.purge_expired(chunk_size=2), 5)
+        self.assertEqual(RefreshTokenFamily.objects.count(), 2)
+
+    @override_settings(REPLICA_DATABASES=["replica1"])
+    def test_purge_expired_on_primary(self):
+        self.create_families(3, timezone.now() - timedelta(seconds=1))
+        store = TokenFamilyStore(RefreshTokenFamily, sweep_interval=0)
+        # a replica that is not a test mirror, any query sent to it fails
+        with mock.patch.object(ReplicaRouter, "db_for_read", return_value="replica1"):
+            self.assertEqual(store.purge_expired(chunk_size=2), 3)
+        self.assertEqual(RefreshTokenFamily.objects.count(), 0)
+
+    def test_revoke_users(self):
+        self.create_families(3, timezone.now() + timedelta(days=1))
+        store = TokenFamilyStore(RefreshTokenFamily, sweep_interval=0)
+        # a login never refreshed has no row yet
+        login = RefreshToken.for_user(self.test_patient1)
+        store.start_family(login)
+        with self.assertNumQueries(2):
+            self.assertEqual(store.revoke_users([self.test_patient1.id]), 3)
+        self.assertFalse(RefreshTokenFamily.objects.filter(revoked_at__isnull=True).exists())
+        with self.assertRaises(TokenError):
+            store.rotate(login, RefreshToken.for_user(self.test_patient1))
+
+        # logins after the revocation are not affected
+        login = RefreshToken.for_user(self.test_patient1)
+        store.start_family(login)
+        store.rotate(login, RefreshToken.for_user(self.test_patient1))
+
+    def test_end_family_without_row(self):
+        store = TokenFamilyStore(RefreshTokenFamily, sweep_interval=0)
+        login = RefreshToken.for_user(self.test_patient1)
+        store.start_family(login)
+        with self.assertNumQueries(1):
+            store.end_family(login.access_token)
+        with self.assertRaises(TokenError):
+            store.rotate(login, RefreshToken.for_user(self.test_patient1))
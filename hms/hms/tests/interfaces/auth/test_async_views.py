@@ -0,0 +1,83 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from lib.django.custom_hashing import HashingExecutor, HashingPoolFull, configure_hashing_executor
+from lib.django.custom_models import RoleType
+from hms.tests.test_utils import create_test_user
+
+
+class TestHashingExecutor(TestCase):
+    def test_rejects_when_queue_is_full(self):
+        executor = HashingExecutor(workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            running = executor.submit(release.wait)
+            queued = executor.submit(release.wait)
+            with self.assertRaises(HashingPoolFull):
+                executor.submit(release.wait)
+            self.assertEqual(executor.rejected, 1)
+            release.set()
+            running.result()
+            queued.result()
+            # slots are released once the jobs finish
+            self.assertTrue(executor.submit(lambda: True).result())
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+    def test_hash_many_waits_for_slots(self):
+        executor = HashingExecutor(workers=2, max_queue=0)
+        try:
+            hashed = executor.hash_many([f"password{index}" for index in range(5)])
+        finally:
+            executor.shutdown()
+        self.assertEqual(executor.rejected, 0)
+        self.assertTrue(all(check_password(f"password{index}", value) for index, value in enumerate(hashed)))
+
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+class TestAsyncAuthViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_patient1,) = create_test_user(1, RoleType.PATIENT)
+
+    def get_url(self, name, **kwargs):
+        return reverse(name, urlconf=settings.ASGI_URLCONF, kwargs=kwargs)
+
+    async def test_login(self):
+        response = await self.async_client.post(
+            self.get_url("auth-login"),
+            {"email": self.test_patient1.email, "password": "practice123"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access token", response.json()["data"])
+
+    async def test_login_wrong_password(self):
+        response = await self.async_client.post(
+            self.get_url("auth-login"),
+            {"email": self.test_patient1.email, "password": "wrong-password"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["message"], "Invalid email or password!")
+
+    async def test_login_rejected_when_hashing_is_saturated(self):
+        executor = configure_hashing_executor(workers=1, max_queue=0)
+        release = threading.Event()
+        try:
+            executor.submit(release.wait)
+            response = await self.async_client.post(
+                self.get_url("auth-login"),
+                {"email": self.test_patient1.email, "password": "practice123"},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+        finally:
+            release.set()
+            configure_hashing_executor(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE)
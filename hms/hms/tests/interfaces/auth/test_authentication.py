@@ -0,0 +1,115 @@
+from django.core import checks
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APITestCase
+
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.models import BaseUserParams, BaseUserPermissions
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_authentication import ClaimsUser
+from lib.django.custom_models import RoleType
+from lib.django.custom_revocation import get_revocation_list
+
+
+class TestClaimsAuthentication(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_staff1, = create_test_user(1, RoleType.STAFF)
+        cls.test_patient1, = create_test_user(1, RoleType.PATIENT)
+        cls.user_app_service = UserAppService()
+
+    def setUp(self):
+        # load the revocation filter now, requests then check it without a query
+        revocation_list = get_revocation_list()
+        revocation_list.checked_at = 0.0
+        revocation_list.sync()
+
+    def authorize(self, user):
+        token = self.user_app_service.get_user_token(user)["access token"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"JWT {token}")
+
+    def test_request_user_built_from_claims(self):
+        self.authorize(self.test_patient1)
+        response = self.client.get(reverse("user-detail", kwargs={"pk": self.test_patient1.id}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+        self.assertEqual(response.wsgi_request.user.role, RoleType.PATIENT)
+
+    def test_retrieve_runs_single_query(self):
+        self.authorize(self.test_staff1)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("user-detail", kwargs={"pk": self.test_patient1.id}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_role_change_invalidates_token(self):
+        self.authorize(self.test_staff1)
+        self.test_staff1.update_entity(
+            base_params=BaseUserParams(username="", email=""),
+            role=RoleType.PATIENT,
+            base_permissions=BaseUserPermissions(),
+            is_superuser=False,
+        )
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_restamps_claims(self):
+        tokens = self.user_app_service.get_user_token(self.test_staff1)
+        self.test_staff1.deactivate()
+        response = self.client.post(reverse("refresh_token"), {"refresh": tokens["refresh token"]})
+        self.assertNotEqual(response.status_code, 201)
+
+    def test_logout_revokes_access_token(self):
+        self.authorize(self.test_staff1)
+        response = self.client.get(reverse("auth-logout"))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, 401)
+        # a new login isn't affected
+        self.authorize(self.test_staff1)
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, 200)
+
+    def refresh(self, refresh_token):
+        return self.client.post(reverse("refresh_token"), {"refresh": refresh_token})
+
+    def test_logout_revokes_refresh_tokens(self):
+        # a login refreshed before the logout, and one never refreshed
+        refreshed = self.refresh(self.user_app_service.get_user_token(self.test_staff1)["refresh token"]).data["data"]
+        tokens = self.user_app_service.get_user_token(self.test_staff1)
+        for access, refresh in ((refreshed["access"], refreshed["refresh"]), (tokens["access token"], tokens["refresh token"])):
+            self.client.credentials(HTTP_AUTHORIZATION=f"JWT {access}")
+            self.assertEqual(self.client.get(reverse("auth-logout")).status_code, 200)
+            self.client.credentials()
+            self.assertEqual(self.refresh(refresh).status_code, 403)
+
+    def test_refresh_reuse_revokes_family(self):
+        first = self.user_app_service.get_user_token(self.test_staff1)["refresh token"]
+        second = self.refresh(first).data["data"]["refresh"]
+        # the user row and one compare and swap of the family
+        with self.assertNumQueries(2):
+            third = self.refresh(second).data["data"]["refresh"]
+        # a copy of an already rotated token shows up
+        self.assertEqual(self.refresh(first).status_code, 403)
+        self.assertEqual(self.refresh(third).status_code, 403)
+        # other logins keep working
+        other = self.user_app_service.get_user_token(self.test_staff1)["refresh token"]
+        self.assertEqual(self.refresh(other).status_code, 201)
+
+
+class TestTokenInvalidationCacheCheck(SimpleTestCase):
+    def get_ids(self, deploy=False):
+        return [message.id for message in checks.run_checks(tags=[checks.Tags.caches], include_deployment_checks=deploy)]
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_fails_deploy_check(self):
+        self.assertEqual(self.get_ids(), ["hms.W001"])
+        self.assertIn("hms.E001", self.get_ids(deploy=True))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_dummy_cache_is_an_error(self):
+        self.assertEqual(self.get_ids(), ["hms.E001"])
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}})
+    def test_shared_cache_passes(self):
+        self.assertEqual(self.get_ids(deploy=True), [])
@@ -1,3 +1,6 @@
+from django.test import override_settings
+from django.urls import reverse
+
 from rest_framework.test import APITestCase, APIRequestFactory
 
 from hms.domain.user_management.models import User
@@ -5,6 +8,8 @@ from lib.django.custom_models import RoleType
 from django.conf import settings
 from hms.tests.test_utils import create_test_user, get_req_data_by_role
 from hms.interfaces.auth.views import AuthenticateUserView
+from hms.domain.user_management.services import UserService
+from hms.application.user_management.services import UserAppService
 
 class TestAuthentication(APITestCase):
     @classmethod
@@ -25,5 +30,70 @@ class TestAuthentication(APITestCase):
     def test_login(self):
         req_data = self.test_patient1.__dict__
         response = self.client.get(f"{settings.API_SWAGGER_URL}auth/login/", req_data)
-        
 
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL=0)
+class TestLogin(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_patient1,) = create_test_user(1, RoleType.PATIENT)
+
+    def setUp(self):
+        UserService.get_entity_cache().clear()
+
+    def login(self, email, password="practice123"):
+        return self.client.post(reverse("auth-login"), {"email": email, "password": password})
+
+    def test_login_single_query(self):
+        # one lookup by email, the last login is written after the commit
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            response = self.login(self.test_patient1.email)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access token", response.data["data"])
+        with self.assertNumQueries(1):
+            for callback in callbacks:
+                callback()
+        self.test_patient1.refresh_from_db()
+        self.assertIsNotNone(self.test_patient1.last_login)
+
+    def test_login_wrong_password(self):
+        with self.captureOnCommitCallbacks() as callbacks, self.assertNumQueries(1):
+            response = self.login(self.test_patient1.email, "wrong-password")
+        self.assertEqual(response.data["message"], "Invalid email or password!")
+        self.assertEqual(callbacks, [])
+
+    def test_login_unknown_email(self):
+        with self.assertNumQueries(1):
+            response = self.login("nobody@example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"], {"non_field_errors": ["User Doesn't Exist"]})
+
+
+class TestPasswordReset(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_patient1,) = create_test_user(1, RoleType.PATIENT)
+
+    def test_forgot_verify_and_reset(self):
+        refresh_token = UserAppService().get_user_token(self.test_patient1)["refresh token"]
+        response = self.client.post(reverse("pwd-forgot-password"), {"email": self.test_patient1.email})
+        otp = response.data["data"]["otp"]
+        verify_url = response.data["data"]["verify"]
+        response = self.client.post(verify_url, {"otp": otp})
+        reset_url = response.data["data"]["reset"]
+        # the otp is used up by the verification
+        response = self.client.post(verify_url, {"otp": otp})
+        self.assertEqual(response.status_code, 400)
+        # the user row, read again from the primary to check the signed token, the
+        # password update and the end of the sessions
+        with self.assertNumQueries(5):
+            response = self.client.post(reset_url, {"new_password": "a-new-password-42"})
+        self.assertEqual(response.data["message"], "New password successfully set!")
+        # logins made with the old password are over
+        response = self.client.post(reverse("refresh_token"), {"refresh": refresh_token})
+        self.assertEqual(response.status_code, 403)
+        # the token works once
+        response = self.client.post(reset_url, {"new_password": "a-new-password-42"})
+        self.assertEqual(response.status_code, 400)
+        self.test_patient1.refresh_from_db()
+        self.assertTrue(self.test_patient1.check_password("a-new-password-42"))
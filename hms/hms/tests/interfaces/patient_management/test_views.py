@@ -0,0 +1,72 @@
+import csv
+import datetime
+
+from django.urls import reverse
+
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+
+from hms.domain.patient_management.models import Patient
+from hms.interfaces.patient_management.views import PatientViewSet
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+
+
+class TestPatientView(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_staff1, = create_test_user(1, RoleType.STAFF)
+        cls.test_patient1, = create_test_user(1, RoleType.PATIENT)
+        cls.patients = [
+            Patient.objects.create(
+                user_id=cls.test_patient1.id,
+                patient_name=name,
+                dob=datetime.date(1990, 1, 1),
+                contact_no=f"98765432{index:02d}",
+                address="address",
+            )
+            for index, name in enumerate(["carol", "alice", "bob", "alice", "dave", "erin"])
+        ]
+        cls.patient_view_set = PatientViewSet
+        cls.factory = APIRequestFactory()
+
+    def test_list_not_permitted_when_accessed_by_patient(self):
+        request = self.factory.get(reverse("patient-list"))
+        force_authenticate(request, self.test_patient1)
+        response = self.patient_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 403)
+
+    def test_keyset_list_ordered_by_name(self):
+        expected = sorted(self.patients, key=lambda patient: (patient.patient_name, patient.id))
+        request = self.factory.get(reverse("patient-list") + "?cursor=&page_size=4")
+        force_authenticate(request, self.test_staff1)
+        response = self.patient_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        page = response.data["data"]
+        self.assertEqual([patient["id"] for patient in page["results"]], [str(patient.id) for patient in expected[:4]])
+        self.assertIsNotNone(page["next"])
+
+    def test_retrieve_patient_by_staff(self):
+        patient = self.patients[0]
+        request = self.factory.get(reverse("patient-detail", kwargs={"pk": patient.id}))
+        force_authenticate(request, self.test_staff1)
+        response = self.patient_view_set.as_view({"get": "retrieve"})(request, pk=str(patient.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["patient_name"], patient.patient_name)
+
+    def test_list_not_modified_with_matching_etag(self):
+        request = self.factory.get(reverse("patient-list"))
+        force_authenticate(request, self.test_staff1)
+        etag = self.patient_view_set.as_view({"get": "list"})(request).headers["ETag"]
+
+        request = self.factory.get(reverse("patient-list"), HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.test_staff1)
+        response = self.patient_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 304)
+
+    def test_export_patients_as_csv(self):
+        request = self.factory.get(reverse("patient-export"), {"output": "csv", "search": "alice"})
+        force_authenticate(request, self.test_staff1)
+        response = self.patient_view_set.as_view({"get": "export"})(request)
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row["patient_name"] for row in rows], ["alice", "alice"])
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+
+from hms.application.user_management.services import UserAppService
+from hms.domain.user_management.services import UserService
+from lib.django.custom_models import RoleType
+from hms.tests.test_utils import create_test_user
+
+
+class TestAsyncUserViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_staff1,) = create_test_user(1, RoleType.STAFF)
+        cls.test_patient1, cls.test_patient2 = create_test_user(2, RoleType.PATIENT)
+
+    def get_url(self, name, **kwargs):
+        return reverse(name, urlconf=settings.ASGI_URLCONF, kwargs=kwargs)
+
+    async def get_headers(self, user):
+        token = await sync_to_async(UserAppService().get_user_token)(user)
+        return {"Authorization": f"{settings.SIMPLE_JWT['AUTH_HEADER_TYPES'][0]} {token['access token']}"}
+
+    async def test_list_matches_sync_view(self):
+        headers = await self.get_headers(self.test_staff1)
+        response = await self.async_client.get(self.get_url("user-list"), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        sync_response = await sync_to_async(self.client.get)(reverse("user-list"), headers=headers)
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(response.headers["ETag"], sync_response.headers["ETag"])
+
+    async def test_search_builds_index_off_the_event_loop(self):
+        headers = await self.get_headers(self.test_staff1)
+        backend = UserService.get_search_backend()
+        # an index not built yet is built from the ORM by the first search
+        with mock.patch.object(backend, "built", False):
+            response = await self.async_client.get(
+                self.get_url("user-list"), {"search": self.test_patient1.email}, headers=headers
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user["email"] for user in response.json()["data"]], [self.test_patient1.email])
+
+    async def test_list_invalid_page(self):
+        headers = await self.get_headers(self.test_staff1)
+        response = await self.async_client.get(self.get_url("user-list"), {"page": 99}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"detail": "Invalid page."})
+
+    async def test_list_requires_authentication(self):
+        response = await self.async_client.get(self.get_url("user-list"))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response.headers)
+
+    async def test_list_not_permitted_for_patient(self):
+        headers = await self.get_headers(self.test_patient1)
+        response = await self.async_client.get(self.get_url("user-list"), headers=headers)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_patient_retrieves_only_own_data(self):
+        headers = await self.get_headers(self.test_patient1)
+        response = await self.async_client.get(self.get_url("user-detail", pk=self.test_patient1.id), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["email"], self.test_patient1.email)
+        response = await self.async_client.get(self.get_url("user-detail", pk=self.test_patient2.id), headers=headers)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_retrieve_not_modified(self):
+        headers = await self.get_headers(self.test_staff1)
+        url = self.get_url("user-detail", pk=self.test_patient1.id)
+        response = await self.async_client.get(url, headers=headers)
+        response = await self.async_client.get(url, headers={**headers, "If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_partial_update(self):
+        headers = await self.get_headers(self.test_staff1)
+        response = await self.async_client.patch(
+            self.get_url("user-detail", pk=self.test_patient1.id),
+            {"username": "renamed-patient"},
+            content_type="application/json",
+            headers=headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        await self.test_patient1.arefresh_from_db()
+        self.assertEqual(self.test_patient1.username, "renamed-patient")
+
+    async def test_destroy_deactivates_user(self):
+        headers = await self.get_headers(self.test_staff1)
+        response = await self.async_client.delete(self.get_url("user-detail", pk=self.test_patient2.id), headers=headers)
+        self.assertEqual(response.status_code, 200)
+        await self.test_patient2.arefresh_from_db()
+        self.assertFalse(self.test_patient2.is_active)
+
+    async def test_actions_keep_sync_views(self):
+        headers = await self.get_headers(self.test_staff1)
+        response = await self.async_client.get(self.get_url("user-export"), headers=headers)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,118 @@
+import gzip
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from hms.application.user_management.services import UserAppService
+from lib.django.custom_compression import CompressionMiddleware, GzipCodec, negotiate_codec
+from lib.django.custom_export import QuerysetExport
+from lib.django.custom_models import RoleType
+from hms.tests.test_utils import create_test_user
+
+
+class TestNegotiateCodec(SimpleTestCase):
+    codecs = {"gzip": GzipCodec, "br": object, "zstd": object}
+
+    def test_server_preference_wins(self):
+        self.assertIs(negotiate_codec("gzip, br", ["zstd", "br", "gzip"], self.codecs), object)
+        self.assertIs(negotiate_codec("gzip;q=1.0, br;q=0.5", ["gzip", "br"], self.codecs), GzipCodec)
+
+    def test_refused_and_missing_codings(self):
+        self.assertIsNone(negotiate_codec("gzip;q=0, identity", ["gzip"], self.codecs))
+        self.assertIsNone(negotiate_codec("", ["gzip"], self.codecs))
+        self.assertIsNone(negotiate_codec("br", ["br"], {"gzip": GzipCodec}))
+        self.assertIs(negotiate_codec("*", ["zstd", "gzip"], {"gzip": GzipCodec}), GzipCodec)
+
+
+class TestAsyncStreamCompression(SimpleTestCase):
+    @override_settings(COMPRESSION_ENCODINGS=["gzip"])
+    async def test_stream_is_compressed_chunk_by_chunk(self):
+        rows = [b'{"row": %d}\n' % index for index in range(100)]
+
+        async def stream():
+            for row in rows:
+                yield row
+
+        async def get_response(request):
+            return StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+
+        request = RequestFactory().get("/export/", headers={"Accept-Encoding": "gzip"})
+        response = await CompressionMiddleware(get_response)(request)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), len(rows) + 1)
+        self.assertEqual(gzip.decompress(b"".join(chunks)), b"".join(rows))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200, COMPRESSION_ENCODINGS=["gzip"])
+class TestCompressionMiddleware(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_staff1,) = create_test_user(1, RoleType.STAFF)
+        create_test_user(10, RoleType.PATIENT)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.test_staff1)
+
+    def test_list_is_compressed(self):
+        plain = self.client.get(reverse("user-list"))
+        response = self.client.get(reverse("user-list"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertTrue(response.headers["ETag"].startswith('W/"'))
+
+    def test_small_responses_are_not_compressed(self):
+        with override_settings(COMPRESSION_MIN_SIZE=1_000_000):
+            response = self.client.get(reverse("user-list"), headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_stream_is_compressed_chunk_by_chunk(self):
+        plain = b"".join(self.client.get(reverse("user-export")).streaming_content)
+        response = self.client.get(reverse("user-export"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+    @mock.patch.object(QuerysetExport, "chunk_size", 2)
+    async def test_stream_is_compressed_chunk_by_chunk_over_asgi(self):
+        plain = await sync_to_async(lambda: b"".join(self.client.get(reverse("user-export")).streaming_content))()
+        token = await sync_to_async(UserAppService().get_user_token)(self.test_staff1)
+        response = await self.async_client.get(
+            reverse("user-export"),
+            headers={
+                "Accept-Encoding": "gzip",
+                "Authorization": f"{settings.SIMPLE_JWT['AUTH_HEADER_TYPES'][0]} {token['access token']}",
+            },
+        )
+        # a sync stream would be read into memory whole by the ASGI handler
+        self.assertTrue(response.is_async)
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(gzip.decompress(b"".join(chunks)), plain)
+
+    def test_auth_responses_are_not_compressed(self):
+        response = self.client.post(
+            reverse("auth-login"), {"email": self.test_staff1.email, "password": "x" * 300},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_schema_is_compressed_once(self):
+        first = self.client.get(reverse("schema"), headers={"Accept-Encoding": "gzip"})
+        second = self.client.get(reverse("schema"), headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(first.headers["Content-Encoding"], "gzip")
+        self.assertEqual(first.content, second.content)
+        middleware = self.client.handler._middleware_chain
+        while not hasattr(middleware, "cache"):
+            middleware = middleware.get_response
+        self.assertGreaterEqual(middleware.cache.stats["hits"], 1)
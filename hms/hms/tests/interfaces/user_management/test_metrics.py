@@ -0,0 +1,67 @@
+import re
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from lib.django.custom_metrics import Histogram, registry
+from lib.django.custom_models import RoleType
+from hms.tests.test_utils import create_test_user
+
+
+class TestHistogram(SimpleTestCase):
+    def test_samples_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        self.assertEqual(
+            list(histogram.get_samples()),
+            [(1, 2), (5, 3), ("+Inf", 4), ("sum", 11.0), ("count", 4)],
+        )
+
+
+class TestMetrics(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_staff1,) = create_test_user(1, RoleType.STAFF)
+        create_test_user(3, RoleType.PATIENT)
+
+    def setUp(self):
+        registry.reset()
+        self.client = APIClient()
+
+    def get_sample(self, text, name, **labels):
+        label_pattern = ".*".join(f'{key}="{re.escape(str(value))}"' for key, value in labels.items())
+        match = re.search(rf"^{name}{{.*{label_pattern}.*}} (\S+)$", text, re.MULTILINE)
+        return float(match.group(1)) if match else None
+
+    def test_requests_are_recorded_by_view(self):
+        self.client.force_authenticate(self.test_staff1)
+        self.client.get(reverse("user-list"))
+        self.client.get(reverse("user-list"))
+        self.client.get("/not-a-route/")
+        with override_settings(METRICS_TOKEN="scrape-token"):
+            text = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer scrape-token"}).content.decode()
+
+        self.assertEqual(self.get_sample(text, "hms_http_requests_total", view="user-list", method="GET", status=200), 2)
+        self.assertEqual(self.get_sample(text, "hms_http_requests_total", view="unmatched", status=404), 1)
+        self.assertEqual(self.get_sample(text, "hms_http_request_duration_seconds_count", view="user-list"), 2)
+        self.assertGreater(self.get_sample(text, "hms_db_queries_per_request_sum", view="user-list"), 0)
+        self.assertGreater(self.get_sample(text, "hms_db_duration_seconds_sum", view="user-list"), 0)
+        self.assertGreater(self.get_sample(text, "hms_serialization_duration_seconds_sum", view="user-list"), 0)
+        self.assertGreater(self.get_sample(text, "hms_http_response_size_bytes_sum", view="user-list"), 0)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_refused_without_configured_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), headers={"Authorization": "Bearer "}).status_code, 403)
+
+    @override_settings(METRICS_TOKEN="scrape-token")
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), headers={"Authorization": "Bearer jeton-\xe9"}).status_code, 403)
+        response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer scrape-token"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
@@ -0,0 +1,68 @@
+import base64
+import json
+
+from django.urls import reverse
+
+from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+
+from hms.domain.user_management.models import User
+from hms.interfaces.user_management.views import UserViewSet
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+
+
+class TestUserKeysetPagination(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_staff1, = create_test_user(1, RoleType.STAFF)
+        create_test_user(9, RoleType.PATIENT)
+        cls.user_view_set = UserViewSet
+        cls.factory = APIRequestFactory()
+
+    def get_page(self, query):
+        request = self.factory.get(reverse("user-list") + query)
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data["data"]
+
+    def test_walk_forward_and_back_over_all_users(self):
+        expected = [str(pk) for pk in User.objects.order_by("date_joined", "id").values_list("id", flat=True)]
+        # ten users over three pages whatever the configured PAGE_SIZE
+        seen, page = [], self.get_page("?cursor=&page_size=4")
+        pages = [page]
+        while True:
+            seen.extend(user["id"] for user in page["results"])
+            if not page["next"]:
+                break
+            page = self.get_page(f"?cursor={page['next']}&page_size=4")
+            pages.append(page)
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]["previous"])
+
+        previous = self.get_page(f"?cursor={pages[-1]['previous']}&page_size=4")
+        self.assertEqual(previous["results"], pages[-2]["results"])
+
+    def test_estimated_total(self):
+        page = self.get_page("?cursor=&estimate=true")
+        self.assertEqual(page["estimated_total"], User.objects.count())
+
+    def test_search_with_cursor(self):
+        page = self.get_page(f"?cursor=&search={self.test_staff1.email}")
+        self.assertEqual([user["id"] for user in page["results"]], [str(self.test_staff1.id)])
+        self.assertIsNone(page["next"])
+
+    def test_invalid_cursor(self):
+        request = self.factory.get(reverse("user-list") + "?cursor=invalid")
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 404)
+
+    def test_well_formed_cursor_with_invalid_values(self):
+        for position in (["garbage", "zzz"], [None, None], [{}, []]):
+            cursor = base64.urlsafe_b64encode(json.dumps([0, position]).encode()).decode()
+            request = self.factory.get(reverse("user-list") + f"?cursor={cursor}")
+            force_authenticate(request, self.test_staff1)
+            response = self.user_view_set.as_view({"get": "list"})(request)
+            self.assertEqual(response.status_code, 404)
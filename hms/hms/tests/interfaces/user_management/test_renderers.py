@@ -0,0 +1,44 @@
+import json
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from lib.django import custom_renderers
+from lib.django.custom_renderers import EnvelopeJSONRenderer
+from lib.django.custom_response import CustomResponse
+
+
+class TestEnvelopeJSONRenderer(SimpleTestCase):
+    def setUp(self):
+        self.rows = [
+            {"id": uuid.uuid4(), "username": f"user-{index}", "date_joined": timezone.now()}
+            for index in range(5)
+        ]
+        self.rows[0]["username"] = "line\u2028separated\u2029"
+        self.data = CustomResponse(message="list data", data=self.rows).success_message().data
+
+    def test_output_matches_json_renderer(self):
+        self.assertEqual(EnvelopeJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_output_without_orjson(self):
+        with mock.patch.object(custom_renderers, "orjson", None):
+            self.assertEqual(EnvelopeJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+
+    def test_long_lists_are_written_in_chunks(self):
+        renderer = EnvelopeJSONRenderer()
+        renderer.chunk_size = 2
+        chunks = list(renderer.iter_render(self.data))
+        # envelope head, three chunks of rows and the tail
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(b"".join(chunks), JSONRenderer().render(self.data))
+        self.assertEqual(json.loads(b"".join(chunks))["data"][4]["username"], "user-4")
+
+    async def test_long_lists_are_streamed_asynchronously(self):
+        renderer = EnvelopeJSONRenderer()
+        renderer.chunk_size = 2
+        chunks = [chunk async for chunk in renderer.aiter_render(self.data)]
+        self.assertEqual(chunks, list(renderer.iter_render(self.data)))
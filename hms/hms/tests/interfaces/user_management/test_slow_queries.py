@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from lib.django.custom_models import RoleType
+from lib.django.custom_slow_queries import ExplainBudget, normalize_sql
+from hms.tests.test_utils import create_test_user
+
+
+class TestNormalizeSql(SimpleTestCase):
+    def test_literals_and_lists_are_collapsed(self):
+        self.assertEqual(
+            normalize_sql("SELECT  \"u\".\"id\" FROM \"u\"\n WHERE \"u\".\"email\" = 'a@b.c' AND \"u\".\"n\" IN (%s, %s, %s) LIMIT 21"),
+            'SELECT "u"."id" FROM "u" WHERE "u"."email" = ? AND "u"."n" IN (...) LIMIT ?',
+        )
+        self.assertEqual(
+            normalize_sql('INSERT INTO "t" ("a1", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "t" ("a1", "b") VALUES (...)',
+        )
+
+    def test_budget_refuses_when_empty(self):
+        budget = ExplainBudget(2)
+        self.assertEqual([budget.take() for _ in range(3)], [True, True, False])
+
+
+@override_settings(SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1)
+class TestSlowQueryLog(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        (cls.test_staff1,) = create_test_user(1, RoleType.STAFF)
+        create_test_user(3, RoleType.PATIENT)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.test_staff1)
+        patcher = mock.patch("lib.django.custom_slow_queries._explain_budget", ExplainBudget(1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_slow_queries(self, url):
+        # every query of the request is slow, none of the fixtures
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=1e-6), self.assertLogs("hms.slow_queries", "WARNING") as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [record.slow_query for record in logs.records]
+
+    def test_slow_queries_are_explained_and_attributed(self):
+        slow_queries = self.get_slow_queries(reverse("user-list"))
+        user_query = next(query for query in slow_queries if "user_management_user" in query["sql"])
+        self.assertEqual(user_query["view"], "user-list")
+        self.assertEqual(user_query["method"], "GET")
+        self.assertTrue(user_query["caller"].startswith("hms."))
+        self.assertTrue(user_query["plan"])
+        self.assertNotIn("%s", json.dumps(user_query["plan"]))
+
+    def test_sampling_and_threshold(self):
+        with override_settings(SLOW_QUERY_EXPLAIN_SAMPLE_RATE=0):
+            slow_queries = self.get_slow_queries(reverse("user-list"))
+        self.assertTrue(all(query["plan"] is None for query in slow_queries))
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertNoLogs("hms.slow_queries"):
+            self.client.get(reverse("user-list"))
+
+
+class TestSlowQueryReport(SimpleTestCase):
+    def test_worst_shapes_first(self):
+        records = [
+            {"duration_ms": 300, "view": "user-list", "caller": "a", "sql": "SELECT * FROM u WHERE id = 1", "plan": ["SCAN u"]},
+            {"duration_ms": 500, "view": "user-list", "caller": "a", "sql": "SELECT * FROM u WHERE id = 2", "plan": None},
+            {"duration_ms": 700, "view": "user-detail", "caller": "b", "sql": "SELECT * FROM p WHERE id IN (1, 2)", "plan": None},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as log:
+            log.write("\n".join(json.dumps(record) for record in records) + "\nnot json\n")
+        self.addCleanup(os.unlink, log.name)
+
+        out = StringIO()
+        call_command("slow_query_report", log.name, stdout=out)
+        report = out.getvalue()
+        self.assertIn("3 slow queries, 2 shapes", report)
+        self.assertLess(report.index("SELECT * FROM u WHERE id = ?"), report.index("SELECT * FROM p WHERE id IN (...)"))
+        self.assertIn("count 2  total 800.0 ms", report)
+        self.assertIn("SCAN u", report)
+
+        out = StringIO()
+        call_command("slow_query_report", log.name, sort="max", view="user-detail", stdout=out)
+        self.assertNotIn("FROM u", out.getvalue())
@@ -0,0 +1,38 @@
+from django.test import override_settings
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from hms.domain.user_management.models import User
+from hms.interfaces.user_management.serializers import UserListViewSerializer, UserListValuesSerializer
+from hms.tests.test_utils import create_test_user
+from lib.django.custom_models import RoleType
+
+
+class TestUserListValuesSerializer(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_test_user(2, RoleType.SUPERUSER)
+        create_test_user(2, RoleType.STAFF)
+        create_test_user(3, RoleType.PATIENT)
+        cls.values_serializer = UserListValuesSerializer()
+
+    def assert_same_bytes(self):
+        queryset = User.objects.order_by("date_joined", "id")
+        expected = JSONRenderer().render(UserListViewSerializer(queryset, many=True).data)
+        rows = self.values_serializer.get_queryset(queryset)
+        self.assertEqual(JSONRenderer().render(self.values_serializer.to_representation(rows)), expected)
+
+    def test_rows_match_model_serializer(self):
+        self.assert_same_bytes()
+
+    @override_settings(TIME_ZONE="Asia/Kolkata")
+    def test_rows_match_model_serializer_in_local_timezone(self):
+        self.assert_same_bytes()
+
+    def test_instance_matches_model_serializer(self):
+        user = User.objects.first()
+        self.assertEqual(
+            JSONRenderer().render(self.values_serializer.to_representation_one(user)),
+            JSONRenderer().render(UserListViewSerializer(user).data),
+        )
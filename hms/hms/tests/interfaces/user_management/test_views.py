@@ -1,4 +1,9 @@
+import json
+from unittest import mock
+
 from rest_framework.test import APITestCase, APIRequestFactory, force_authenticate
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from faker import Faker
@@ -7,6 +12,7 @@ from hms.domain.user_management.models import User
 from lib.django.custom_models import RoleType
 from django.conf import settings
 from hms.tests.test_utils import create_test_user, get_req_data_by_role
+from hms.interfaces.user_management.serializers import UserListValuesSerializer
 from hms.interfaces.user_management.views import UserViewSet
 
 
@@ -276,6 +282,26 @@ class TestUserView(APITestCase):
         self.assertTrue(update_data["email"] == updated_user.email)
         self.assertTrue(update_data["role"] == updated_user.role)
 
+    def test_partial_update_user_bumps_version(self):
+        req_id = self.test_patient2.id
+        update_data = {"email": fake.email(), "version": 1}
+        request = self.factory.patch(f"{settings.API_SWAGGER_URL}users/{req_id}/", update_data)
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"patch": "partial_update"})(request, str(req_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["version"], 2)
+        self.assertEqual(User.objects.get(id=req_id).version, 2)
+
+    def test_conflict_partial_update_user_with_stale_version(self):
+        req_id = self.test_patient2.id
+        User.objects.filter(id=req_id).update(version=3)
+        update_data = {"email": fake.email(), "version": 2}
+        request = self.factory.patch(f"{settings.API_SWAGGER_URL}users/{req_id}/", update_data)
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"patch": "partial_update"})(request, str(req_id))
+        self.assertEqual(response.status_code, 409)
+        self.assertNotEqual(User.objects.get(id=req_id).email, update_data["email"])
+
     def test_validation_error_partial_update_user_invalid_email_by_staff(self):
         req_id = self.test_patient1.id
         update_data = {"email": 'invalid'}
@@ -363,3 +389,123 @@ class TestUserView(APITestCase):
         ## don't understand why status is not received in custom response
         # self.assertEqual(response.status_code, 404)
         self.assertEqual(response.status_code, 400)
+
+    def test_import_users_from_csv_body_by_staff(self):
+        body = "username,email,password,role\nimported,imported@hospital.org,practice123,doctor\nbroken,invalid,practice123,doctor\n"
+        request = self.factory.post(reverse("user-import"), body, content_type="text/csv")
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"post": "import_users"})(request)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["data"]["created"], 1)
+        self.assertEqual(response.data["data"]["errors"][0]["row"], 2)
+        self.assertTrue(User.objects.filter(email="imported@hospital.org").exists())
+
+    def test_do_not_import_users_by_doctor(self):
+        request = self.factory.post(reverse("user-import"), "", content_type="text/csv")
+        force_authenticate(request, self.test_doctor1)
+        response = self.user_view_set.as_view({"post": "import_users"})(request)
+        self.assertEqual(response.status_code, 403)
+
+    def test_bulk_deactivate_users_by_ids_by_staff(self):
+        req_ids = [str(self.test_patient3.id), str(self.test_patient4.id)]
+        request = self.factory.post(reverse("user-bulk-deactivate"), {"ids": req_ids}, format="json")
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"post": "bulk_deactivate"})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["affected"], 2)
+        self.assertFalse(User.objects.filter(id__in=req_ids, is_active=True).exists())
+
+    def test_bulk_change_role_by_filter_by_superuser(self):
+        req_data = {"filter": {"role": RoleType.DOCTOR}, "role": RoleType.STAFF}
+        request = self.factory.post(reverse("user-bulk-role"), req_data, format="json")
+        force_authenticate(request, self.test_superuser1)
+        response = self.user_view_set.as_view({"post": "bulk_role"})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["affected"], 4)
+        updated_user = User.objects.get(id=self.test_doctor1.id)
+        self.assertEqual(updated_user.role, RoleType.STAFF)
+        self.assertTrue(updated_user.is_staff)
+
+    def test_validation_error_bulk_action_without_selection(self):
+        request = self.factory.post(reverse("user-bulk-reactivate"), {}, format="json")
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"post": "bulk_reactivate"})(request)
+        self.assertEqual(response.status_code, 400)
+
+    def test_do_not_bulk_deactivate_users_by_doctor(self):
+        request = self.factory.post(reverse("user-bulk-deactivate"), {"ids": [str(self.test_patient1.id)]}, format="json")
+        force_authenticate(request, self.test_doctor1)
+        response = self.user_view_set.as_view({"post": "bulk_deactivate"})(request)
+        self.assertEqual(response.status_code, 403)
+
+    def test_retrieve_not_modified_with_matching_etag(self):
+        req_id = self.test_doctor1.id
+        request = self.factory.get(reverse("user-detail", kwargs={'pk': req_id}))
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "retrieve"})(request, pk=str(req_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Last-Modified", response.headers)
+
+        request = self.factory.get(reverse("user-detail", kwargs={'pk': req_id}), HTTP_IF_NONE_MATCH=response.headers["ETag"])
+        force_authenticate(request, self.test_staff1)
+        with self.assertNumQueries(1):
+            response = self.user_view_set.as_view({"get": "retrieve"})(request, pk=str(req_id))
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_etag_changes_when_a_user_is_updated(self):
+        request = self.factory.get(reverse("user-list"))
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "list"})(request)
+        etag = response.headers["ETag"]
+        response_ids = [user["id"] for user in response.data["data"]]
+
+        request = self.factory.get(reverse("user-list"), HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.test_staff1)
+        with self.assertNumQueries(1):
+            response = self.user_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 304)
+
+        listed = User.objects.get(id=response_ids[0])
+        listed.username = "renamed-user"
+        listed.save()
+        request = self.factory.get(reverse("user-list"), HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_unchanged_keyset_page_is_answered_from_the_aggregate(self):
+        request = self.factory.get(reverse("user-list"), {"cursor": ""})
+        force_authenticate(request, self.test_staff1)
+        etag = self.user_view_set.as_view({"get": "list"})(request).headers["ETag"]
+
+        request = self.factory.get(reverse("user-list"), {"cursor": ""}, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.test_staff1)
+        with mock.patch.object(UserListValuesSerializer, "to_representation") as to_representation:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.user_view_set.as_view({"get": "list"})(request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertIn("MAX(", queries[0]["sql"])
+        to_representation.assert_not_called()
+
+        User.objects.get(id=self.test_doctor2.id).delete()
+        request = self.factory.get(reverse("user-list"), {"cursor": ""}, HTTP_IF_NONE_MATCH=etag)
+        force_authenticate(request, self.test_staff1)
+        self.assertEqual(self.user_view_set.as_view({"get": "list"})(request).status_code, 200)
+
+    def test_export_active_doctors_as_ndjson_by_staff(self):
+        request = self.factory.get(reverse("user-export"), {"role": RoleType.DOCTOR, "status": "active"})
+        force_authenticate(request, self.test_staff1)
+        response = self.user_view_set.as_view({"get": "export"})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        expected = User.objects.filter(role=RoleType.DOCTOR, is_active=True)
+        self.assertEqual({row["id"] for row in rows}, {str(user.id) for user in expected})
+
+    def test_do_not_export_users_by_doctor(self):
+        request = self.factory.get(reverse("user-export"))
+        force_authenticate(request, self.test_doctor1)
+        response = self.user_view_set.as_view({"get": "export"})(request)
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,160 @@
+import functools
+import json
+from types import SimpleNamespace
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    MethodNotAllowed,
+    NotAuthenticated,
+    PermissionDenied,
+)
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from lib.django.custom_authentication import ClaimsJWTAuthentication
+from lib.django.custom_hashing import HashingPoolFull
+from lib.django.custom_renderers import EnvelopeJSONRenderer
+from lib.django.custom_response import CustomResponse
+
+
+class ASGIUrlconfMiddleware:
+    """
+    resolve requests served through `asgi.py` with `settings.ASGI_URLCONF`
+
+    The ASGI urlconf puts async views in front of the sync ones, WSGI keeps
+    `ROOT_URLCONF` unchanged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest) and settings.ASGI_URLCONF:
+            request.urlconf = settings.ASGI_URLCONF
+        return self.get_response(request)
+
+
+def render(response) -> HttpResponse:
+    """
+    JSON response from the DRF `Response` built by `CustomResponse`
+
+    Encoded by the API renderer, long envelope lists are streamed chunk by chunk.
+    """
+    renderer = EnvelopeJSONRenderer()
+    if renderer.is_chunked(response.data):
+        return StreamingHttpResponse(
+            renderer.aiter_render(response.data), status=response.status_code, content_type=renderer.media_type
+        )
+    return HttpResponse(renderer.render(response.data), status=response.status_code, content_type=renderer.media_type)
+
+
+def render_exception(exc: APIException, headers=None) -> HttpResponse:
+    """the response DRF sends for `exc`"""
+    response = exception_handler(exc, {})
+    rendered = render(response)
+    # the unrendered DRF response carries a placeholder content type
+    response.headers.pop("Content-Type", None)
+    for name, value in {**response.headers, **(headers or {})}.items():
+        rendered.headers[name] = value
+    return rendered
+
+
+async def authenticate(request) -> None:
+    """
+    set `request.user` and `request.auth` from the bearer token, like DRF
+
+    Raises:
+        AuthenticationFailed: a token was sent and it is invalid or revoked
+    """
+    authenticated = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+    request.user, request.auth = authenticated if authenticated else (AnonymousUser(), None)
+
+
+def check_permissions(request, permission_classes, **kwargs) -> HttpResponse | None:
+    """
+    DRF permission checks for function views, the refusal response or `None`
+
+    `kwargs` are the URL kwargs, exposed to the permissions as `view.kwargs`.
+    """
+    view = SimpleNamespace(kwargs=kwargs)
+    for permission_class in permission_classes:
+        permission = permission_class()
+        if permission.has_permission(request, view):
+            continue
+        if not request.user.is_authenticated:
+            return render_exception(NotAuthenticated(), get_authenticate_header())
+        return render_exception(PermissionDenied(getattr(permission, "message", None)))
+    return None
+
+
+def get_authenticate_header() -> dict:
+    return {"WWW-Authenticate": f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'}
+
+
+def parse_body(request) -> dict:
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    if request.method == "POST":
+        return request.POST.dict()
+    return QueryDict(request.body).dict()
+
+
+def async_api_view(*methods, permission_classes=()):
+    """
+    async function view taking the DRF request interface
+
+    Requests with another method than `methods` get 405. The bearer token is
+    authenticated and `permission_classes` checked before the view runs, with
+    the same 401 and 403 responses as DRF. The parsed payload is set as
+    `request.data` and the query string as `request.query_params`. DRF
+    exceptions are rendered like DRF does, and when password hashing is
+    saturated the request is refused with 503 and `Retry-After`.
+    """
+
+    def decorator(view):
+        @csrf_exempt
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return render_exception(MethodNotAllowed(request.method))
+            request.query_params = request.GET
+            try:
+                request.data = parse_body(request) if request.method not in ("GET", "HEAD", "DELETE") else {}
+            except ValueError:
+                return render(CustomResponse(message="JSON parse error").error_message())
+            try:
+                await authenticate(request)
+            except AuthenticationFailed as e:
+                return render_exception(e, get_authenticate_header())
+            refused = check_permissions(request, permission_classes, **kwargs)
+            if refused:
+                return refused
+            try:
+                return await view(request, *args, **kwargs)
+            except APIException as e:
+                return render_exception(e)
+            except HashingPoolFull as e:
+                response = render(
+                    CustomResponse(message=str(e), status=status.HTTP_503_SERVICE_UNAVAILABLE).error_message()
+                )
+                response.headers["Retry-After"] = "1"
+                return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,188 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from lib.django.custom_identity_map import load_entity, remember_entity
+from lib.django.custom_revocation import get_revocation_list
+
+
+# claims copied from the user into every token minted for them
+USER_CLAIMS = ("username", "email", "role", "is_staff", "is_active", "is_superuser")
+# float timestamp of when the claims above were read from the database
+CLAIMS_ISSUED_AT = "claims_iat"
+
+
+def set_user_claims(token, user):
+    """
+    stamp authorization claims of `user` into `token`
+
+    Args:
+        token: simplejwt token to update, access tokens derived from it inherit the claims
+        user: `User` object the claims are read from
+    """
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    token[CLAIMS_ISSUED_AT] = time.time()
+    return token
+
+
+class TokenInvalidation:
+    """
+    records users whose outstanding token claims are stale
+
+    Only the invalidation time is kept, under the cache key of the user, so the
+    check on each request is a single cache lookup. Entries live as long as an
+    access token does, older tokens have expired by then anyway. The default
+    cache has to be shared by every process, see
+    `check_token_invalidation_cache`.
+    """
+
+    key_prefix = "token-invalidated"
+
+    @classmethod
+    def get_cache_key(cls, user_id) -> str:
+        return f"{cls.key_prefix}:{user_id}"
+
+    @staticmethod
+    def get_timeout() -> int:
+        return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+    @classmethod
+    def invalidate(cls, user_id) -> None:
+        """invalidate tokens minted for `user_id` until now"""
+        cache.set(cls.get_cache_key(user_id), time.time(), timeout=cls.get_timeout())
+
+    @classmethod
+    def invalidate_many(cls, user_ids) -> None:
+        """invalidate tokens minted until now for every id in `user_ids`"""
+        now = time.time()
+        cache.set_many(
+            {cls.get_cache_key(user_id): now for user_id in user_ids},
+            timeout=cls.get_timeout(),
+        )
+
+    @classmethod
+    def is_invalidated(cls, user_id, claims_iat) -> bool:
+        """check if claims stamped at `claims_iat` were invalidated afterwards"""
+        invalidated_at = cache.get(cls.get_cache_key(user_id))
+        if invalidated_at is None:
+            return False
+        return claims_iat is None or claims_iat <= invalidated_at
+
+
+class ClaimsUser(TokenUser):
+    """
+    light user built from token claims, the `User` row is loaded only when an
+    attribute missing from the claims is accessed
+    """
+
+    @cached_property
+    def id(self) -> uuid.UUID:
+        return uuid.UUID(str(self.token[api_settings.USER_ID_CLAIM]))
+
+    @cached_property
+    def role(self) -> str:
+        return self.token.get("role")
+
+    @cached_property
+    def is_active(self) -> bool:
+        return self.token.get("is_active", False)
+
+    @cached_property
+    def instance(self):
+        """full `User` object for the claims, shared with the rest of the request"""
+        model = get_user_model()
+        return load_entity(model, lambda: model._default_manager.get(pk=self.id), pk=self.id)
+
+    def __str__(self):
+        return self.username
+
+    def __getattr__(self, attr):
+        # private and token lookups never reach the database
+        if attr.startswith("_") or attr == "token":
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        return getattr(self.instance, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds the request user from token claims instead of
+    querying the `User` table. Tokens minted without claims fall back to the
+    database lookup. Tokens revoked on logout are refused.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and get_revocation_list().is_revoked(jti):
+            raise AuthenticationFailed(_("Token has been revoked, log in again."), code="token_revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        if "role" not in validated_token:
+            return remember_entity(super().get_user(validated_token))
+
+        if not validated_token.get("is_active", False):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user = api_settings.TOKEN_USER_CLASS(validated_token)
+        if TokenInvalidation.is_invalidated(user.id, validated_token.get(CLAIMS_ISSUED_AT)):
+            raise AuthenticationFailed(
+                _("Token claims are outdated, log in again."), code="token_invalidated"
+            )
+        return user
+
+
+# caches an invalidation written by one process is never seen by the others
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_token_invalidation_cache_issue(level, check_id):
+    """
+    claims tokens of demoted or deactivated users are refused through the
+    default cache, with a per process cache other workers keep accepting them
+    """
+    if not any(issubclass(auth_class, ClaimsJWTAuthentication) for auth_class in drf_settings.DEFAULT_AUTHENTICATION_CLASSES):
+        return []
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    if backend == PROCESS_LOCAL_CACHES[1]:
+        # nothing is ever stored, not even for a single process
+        level, check_id = checks.Error, "hms.E001"
+    return [
+        level(
+            f"ClaimsJWTAuthentication keeps token invalidation in the default cache, {backend} is not shared between processes.",
+            hint="Set CACHE_BACKEND to a shared cache such as Redis or Memcached.",
+            id=check_id,
+        )
+    ]
+
+
+@checks.register(checks.Tags.caches, checks.Tags.security)
+def check_token_invalidation_cache(app_configs, **kwargs):
+    """a development server runs a single process, the local memory cache is only a warning"""
+    return get_token_invalidation_cache_issue(checks.Warning, "hms.W001")
+
+
+@checks.register(checks.Tags.caches, checks.Tags.security, deploy=True)
+def check_deploy_token_invalidation_cache(app_configs, **kwargs):
+    """deployments run several workers, `check --deploy` requires a shared cache"""
+    return get_token_invalidation_cache_issue(checks.Error, "hms.E001")
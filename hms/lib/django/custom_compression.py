@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class GzipCodec:
+    name = "gzip"
+    default_level = 6
+
+    @staticmethod
+    def compress(data: bytes, level: int) -> bytes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    @staticmethod
+    def compress_chunks(chunks, level: int):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            # sync flush, every chunk reaches the client as soon as it is produced
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliCodec:
+    name = "br"
+    default_level = 4
+
+    @staticmethod
+    def compress(data: bytes, level: int) -> bytes:
+        return brotli.compress(data, quality=level)
+
+    @staticmethod
+    def compress_chunks(chunks, level: int):
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdCodec:
+    name = "zstd"
+    default_level = 3
+
+    @staticmethod
+    def compress(data: bytes, level: int) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    @staticmethod
+    def compress_chunks(chunks, level: int):
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+def get_codecs() -> dict:
+    """codecs whose library is installed, by content coding"""
+    codecs = {GzipCodec.name: GzipCodec}
+    if brotli is not None:
+        codecs[BrotliCodec.name] = BrotliCodec
+    if zstandard is not None:
+        codecs[ZstdCodec.name] = ZstdCodec
+    return codecs
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """`Accept-Encoding` as quality by lowercase coding"""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def negotiate_codec(header: str, preference, codecs=None):
+    """first codec of `preference` the client accepts, `None` for identity"""
+    accepted = parse_accept_encoding(header)
+    codecs = get_codecs() if codecs is None else codecs
+    for name in preference:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > 0 and name in codecs:
+            return codecs[name]
+    return None
+
+
+class CompressedCache:
+    """
+    compressed forms of static payloads, `max_size` entries in LRU order
+
+    Entries are keyed by the digest of the uncompressed body, a payload that
+    changes is compressed again instead of served stale.
+    """
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get_or_compress(self, codec, level, content: bytes) -> bytes:
+        key = (codec.name, level, hashlib.blake2b(content, digest_size=16).digest())
+        with self.lock:
+            compressed = self.entries.get(key)
+            if compressed is not None:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return compressed
+            self.counters["misses"] += 1
+        compressed = codec.compress(content, level)
+        with self.lock:
+            self.entries[key] = compressed
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return compressed
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "size": len(self.entries)}
+
+
+class CompressionMiddleware:
+    """
+    compress responses with the best of `settings.COMPRESSION_ENCODINGS` the
+    client accepts, zstd and brotli when their library is installed, gzip always
+
+    Only responses of a compressible content type are touched. Bodies under
+    `settings.COMPRESSION_MIN_SIZE` bytes are sent as they are, and so is a
+    body that doesn't get smaller. Streaming responses are compressed chunk by
+    chunk and flushed after each one, so exports keep streaming. Responses of
+    the URL names in `settings.COMPRESSION_CACHED_URL_NAMES`, static payloads
+    like the schema, are compressed once and served from memory. Paths under
+    `settings.COMPRESSION_EXCLUDED_PATHS` carry secrets and are never
+    compressed: compressing a secret next to attacker controlled input leaks
+    it through the response size (BREACH).
+    """
+
+    compressible_types = (
+        "application/json",
+        "application/x-ndjson",
+        "application/vnd.oai.openapi",
+        "application/javascript",
+        "application/xml",
+        "text/",
+    )
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.codecs = get_codecs()
+        self.cache = CompressedCache(settings.COMPRESSION_CACHE_SIZE)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def is_compressible(self, request, response) -> bool:
+        if response.has_header("Content-Encoding") or response.status_code in (204, 304):
+            return False
+        if request.path.startswith(tuple(settings.COMPRESSION_EXCLUDED_PATHS)):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+        return content_type.startswith(self.compressible_types)
+
+    def compress(self, request, response):
+        if not self.is_compressible(request, response):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        codec = negotiate_codec(
+            request.META.get("HTTP_ACCEPT_ENCODING", ""), settings.COMPRESSION_ENCODINGS, self.codecs
+        )
+        if codec is None:
+            return response
+        level = settings.COMPRESSION_LEVELS.get(codec.name, codec.default_level)
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response, codec, level)
+            del response.headers["Content-Length"]
+        else:
+            match = request.resolver_match
+            if match is not None and match.url_name in settings.COMPRESSION_CACHED_URL_NAMES:
+                compressed = self.cache.get_or_compress(codec, level, response.content)
+            else:
+                compressed = codec.compress(response.content, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # the body changed, a strong ETag no longer matches it byte for byte
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = codec.name
+        return response
+
+    @staticmethod
+    def compress_stream(response, codec, level):
+        if not response.is_async:
+            return codec.compress_chunks(response.streaming_content, level)
+        original = response.streaming_content
+
+        async def compress_chunks():
+            # one compressor over the whole stream, fed as chunks arrive
+            pending = []
+            chunks = codec.compress_chunks(iter(pending.pop, None), level)
+            async for chunk in original:
+                pending.append(chunk)
+                yield next(chunks)
+            pending.append(None)
+            for chunk in chunks:
+                yield chunk
+
+        return compress_chunks()
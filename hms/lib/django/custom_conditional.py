@@ -0,0 +1,71 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def get_etag(*parts) -> str:
+    """
+    weak entity tag for the state described by `parts`
+
+    The tag is derived from what the representation is built from rather than
+    from the rendered body, so it can be checked before serializing anything.
+    """
+    digest = hashlib.md5("|".join(map(str, parts)).encode(), usedforsecurity=False)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def get_instance_validators(instance, modified_field="modified_at") -> tuple:
+    """`(etag, last_modified)` of a single model instance or named row"""
+    last_modified = getattr(instance, modified_field)
+    return get_etag(instance.pk, last_modified), last_modified
+
+
+def get_queryset_validators(request, queryset, modified_field="modified_at") -> tuple:
+    """
+    `(etag, last_modified)` of a list response over `queryset`, read with one
+    aggregate query
+
+    The newest modification time catches inserts and updates, the row count
+    catches deletes, and the query string tells pages, cursors, filters and
+    searches apart. Checked before paginating, an unchanged list costs this
+    query alone.
+    """
+    state = queryset.order_by().aggregate(
+        last_modified=Max(modified_field), total=Count("pk")
+    )
+    etag = get_etag(request.get_full_path(), state["total"], state["last_modified"])
+    return etag, state["last_modified"]
+
+
+async def aget_queryset_validators(request, queryset, modified_field="modified_at") -> tuple:
+    """`get_queryset_validators` for async views"""
+    state = await queryset.order_by().aaggregate(
+        last_modified=Max(modified_field), total=Count("pk")
+    )
+    etag = get_etag(request.get_full_path(), state["total"], state["last_modified"])
+    return etag, state["last_modified"]
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """
+    304 response when the `If-None-Match` / `If-Modified-Since` headers of
+    `request` still match, `None` when the representation has to be sent
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validator_headers(response, etag, last_modified)
+    return response
+
+
+def set_validator_headers(response, etag, last_modified):
+    """attach `ETag` and `Last-Modified` headers to `response`"""
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
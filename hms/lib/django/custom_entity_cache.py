@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class EntityCache:
+    """
+    read-through cache of `model` rows keyed by primary key
+
+    A bounded in-process LRU tier answers first, entries expire after
+    `local_timeout` seconds since other processes can't invalidate them. An
+    optional shared tier (`shared_alias` of `settings.CACHES`) is checked next
+    and invalidated on every write. Rows are kept as plain column values and a
+    fresh instance is built on each hit, so callers never share or mutate a
+    cached object. Inside a transaction the cache is bypassed: rows read there
+    may not be committed yet. Only rows read from `using` are cached, a row
+    from a lagging replica would outlive the invalidation of a newer write.
+    `aget` and `aget_by` serve async callers.
+    """
+
+    def __init__(self, model, max_size=1024, local_timeout=10, shared_alias="", shared_timeout=300, using=DEFAULT_DB_ALIAS):
+        self.model = model
+        self.max_size = max_size
+        self.local_timeout = local_timeout
+        self.shared_alias = shared_alias
+        self.shared_timeout = shared_timeout
+        self.using = using
+        self.field_names = [field.attname for field in model._meta.concrete_fields]
+        self.key_prefix = f"entity:{model._meta.label_lower}"
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.aliases = {}
+        self.counters = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def is_bypassed(self) -> bool:
+        return self.max_size <= 0 or connections[self.using].in_atomic_block
+
+    def get_shared_key(self, pk) -> str:
+        return f"{self.key_prefix}:{pk}"
+
+    def get(self, pk, loader):
+        """instance with primary key `pk`, read with `loader()` on a miss"""
+        if self.is_bypassed():
+            return loader()
+        pk = self.model._meta.pk.to_python(pk)
+        values = self.get_values(pk)
+        if values is not None:
+            return self.build(values)
+        return self.fill(loader())
+
+    def get_by(self, field: str, value, loader):
+        """instance whose unique `field` equals `value`, read with `loader()` on a miss"""
+        if self.is_bypassed():
+            return loader()
+        with self.lock:
+            pk = self.aliases.get((field, value))
+        values = self.get_values(pk) if pk is not None else None
+        if values is not None and values[self.field_names.index(field)] == value:
+            return self.build(values)
+        return self.fill(loader(), field)
+
+    async def aget(self, pk, loader):
+        """`get` with an async `loader`, the shared tier is read without blocking"""
+        if self.is_bypassed():
+            return await loader()
+        pk = self.model._meta.pk.to_python(pk)
+        values = await self.aget_values(pk)
+        if values is not None:
+            return self.build(values)
+        return await self.afill(await loader())
+
+    async def aget_by(self, field: str, value, loader):
+        """`get_by` with an async `loader`"""
+        if self.is_bypassed():
+            return await loader()
+        with self.lock:
+            pk = self.aliases.get((field, value))
+        values = await self.aget_values(pk) if pk is not None else None
+        if values is not None and values[self.field_names.index(field)] == value:
+            return self.build(values)
+        return await self.afill(await loader(), field)
+
+    def get_values(self, pk):
+        values = self.get_local_values(pk)
+        if values is not None:
+            return values
+        shared = self.shared
+        return self.put_shared_values(pk, shared.get(self.get_shared_key(pk)) if shared else None)
+
+    async def aget_values(self, pk):
+        values = self.get_local_values(pk)
+        if values is not None:
+            return values
+        shared = self.shared
+        return self.put_shared_values(pk, await shared.aget(self.get_shared_key(pk)) if shared else None)
+
+    def get_local_values(self, pk):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(pk)
+                self.counters["hits"] += 1
+                return entry[1]
+        return None
+
+    def put_shared_values(self, pk, values):
+        with self.lock:
+            if values is None:
+                self.counters["misses"] += 1
+                return None
+            self.counters["shared_hits"] += 1
+        self.put(pk, values)
+        return values
+
+    def fill(self, instance, *fields):
+        if instance._state.db != self.using:
+            return instance
+        values = tuple(getattr(instance, name) for name in self.field_names)
+        self.put(instance.pk, values, *fields)
+        if self.shared:
+            self.shared.set(self.get_shared_key(instance.pk), values, timeout=self.shared_timeout)
+        return instance
+
+    async def afill(self, instance, *fields):
+        if instance._state.db != self.using:
+            return instance
+        values = tuple(getattr(instance, name) for name in self.field_names)
+        self.put(instance.pk, values, *fields)
+        if self.shared:
+            await self.shared.aset(self.get_shared_key(instance.pk), values, timeout=self.shared_timeout)
+        return instance
+
+    def put(self, pk, values, *fields):
+        with self.lock:
+            self.entries[pk] = (time.monotonic() + self.local_timeout, values)
+            self.entries.move_to_end(pk)
+            for field in fields:
+                self.aliases[(field, values[self.field_names.index(field)])] = pk
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+            if len(self.aliases) > self.max_size * 2:
+                # aliases of evicted rows, lookups through them miss anyway
+                self.aliases = {key: pk for key, pk in self.aliases.items() if pk in self.entries}
+
+    def build(self, values):
+        return self.model.from_db(self.using, self.field_names, values)
+
+    def invalidate(self, pk) -> None:
+        self.invalidate_many([pk])
+
+    def invalidate_many(self, pks) -> None:
+        """drop rows from both tiers, call it whenever they are written"""
+        pks = [self.model._meta.pk.to_python(pk) for pk in pks]
+        with self.lock:
+            for pk in pks:
+                if self.entries.pop(pk, None) is not None:
+                    self.counters["invalidations"] += 1
+        if self.shared:
+            self.shared.delete_many([self.get_shared_key(pk) for pk in pks])
+
+    def clear(self) -> None:
+        """drop the in-process tier"""
+        with self.lock:
+            self.entries.clear()
+            self.aliases.clear()
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "size": len(self.entries)}
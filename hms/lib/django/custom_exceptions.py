@@ -26,6 +26,13 @@ class OTPExpireException(Exception):
     pass
 
 
+class ConcurrentUpdateException(Exception):
+    """
+    Exception that should be raised if a row was changed by someone else since it was read
+    """
+    pass
+
+
 # @dataclass(frozen=True)
 # class AppointmentException(Exception):
 #     item: str
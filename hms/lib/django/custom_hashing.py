@@ -0,0 +1,142 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+
+class PasswordHashingPool:
+    """
+    hashes passwords with the configured hasher across worker processes
+
+    Used as a context manager, the processes live as long as the `with` block.
+    With a single worker, hashing runs inline. Meant for management commands:
+    web workers hash on the bounded `HashingExecutor`, forking a threaded
+    server is unsafe and concurrent requests would multiply the processes.
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # workers started with spawn need the app registry, fork inherits it
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor:
+            self.executor.shutdown()
+            self.executor = None
+
+    def hash_many(self, raw_passwords: list) -> list:
+        """hashed passwords in the order of `raw_passwords`"""
+        if not self.executor or len(raw_passwords) < self.workers:
+            return [make_password(raw_password) for raw_password in raw_passwords]
+        chunksize = max(1, len(raw_passwords) // (self.workers * 4))
+        return list(self.executor.map(make_password, raw_passwords, chunksize=chunksize))
+
+
+class HashingPoolFull(Exception):
+    """
+    Exception that should be raised if the hashing queue is full, the caller should retry later
+    """
+
+    pass
+
+
+class HashingExecutor:
+    """
+    bounded thread pool for password hashing and verification
+
+    PBKDF2, bcrypt and argon2 release the GIL, so `workers` threads keep as many
+    cores busy without the cost of sending work to other processes. At most
+    `workers + max_queue` jobs are accepted at once, further ones are refused
+    with `HashingPoolFull` straight away, so a login storm is shed with fast
+    errors instead of piling requests up behind the hasher.
+    """
+
+    def __init__(self, workers: int | None = None, max_queue: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = self.workers * 4 if max_queue is None else max_queue
+        self.slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hashing")
+        self.rejected = 0
+
+    def submit(self, fn, *args, blocking=False) -> Future:
+        """run `fn(*args)` on the pool, `blocking` waits for a slot instead of raising `HashingPoolFull`"""
+        if not self.slots.acquire(blocking=blocking):
+            self.rejected += 1
+            raise HashingPoolFull("Too many password operations in progress, retry shortly")
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def make_password(self, raw_password) -> str:
+        return self.submit(make_password, raw_password).result()
+
+    def verify_password(self, raw_password, encoded) -> tuple:
+        """`(is_correct, must_update)`, see `django.contrib.auth.hashers.verify_password`"""
+        return self.submit(verify_password, raw_password, encoded).result()
+
+    def hash_many(self, raw_passwords) -> list:
+        """
+        hashed passwords in the order of `raw_passwords`
+
+        Bulk callers wait for a slot rather than being refused and keep at
+        most `workers` jobs in flight, the rest of the queue stays free for
+        interactive logins.
+        """
+        pending = deque()
+        hashed = []
+        for raw_password in raw_passwords:
+            if len(pending) >= self.workers:
+                hashed.append(pending.popleft().result())
+            pending.append(self.submit(make_password, raw_password, blocking=True))
+        hashed.extend(future.result() for future in pending)
+        return hashed
+
+    async def amake_password(self, raw_password) -> str:
+        return await asyncio.wrap_future(self.submit(make_password, raw_password))
+
+    async def averify_password(self, raw_password, encoded) -> tuple:
+        return await asyncio.wrap_future(self.submit(verify_password, raw_password, encoded))
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+_hashing_executor = None
+_hashing_executor_lock = threading.Lock()
+
+
+def get_hashing_executor() -> HashingExecutor:
+    """process wide `HashingExecutor` sized by `PASSWORD_HASHING_WORKERS` and `PASSWORD_HASHING_QUEUE`"""
+    global _hashing_executor
+    if _hashing_executor is None:
+        with _hashing_executor_lock:
+            if _hashing_executor is None:
+                _hashing_executor = HashingExecutor(
+                    workers=settings.PASSWORD_HASHING_WORKERS,
+                    max_queue=settings.PASSWORD_HASHING_QUEUE,
+                )
+    return _hashing_executor
+
+
+def configure_hashing_executor(workers: int | None = None, max_queue: int | None = None) -> HashingExecutor:
+    """replace the process wide `HashingExecutor`, used by benchmarks and tests"""
+    global _hashing_executor
+    with _hashing_executor_lock:
+        previous, _hashing_executor = _hashing_executor, HashingExecutor(workers, max_queue)
+    if previous is not None:
+        previous.shutdown()
+    return _hashing_executor
@@ -0,0 +1,218 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityMap:
+    """
+    entities loaded during one unit of work, one instance per row
+
+    Instances are keyed by model and primary key, lookups by another unique
+    field (username, email, ...) are remembered as an alias of the primary key.
+    `hits` counts lookups answered from the map, `joined` queries avoided by
+    fetching related rows in a single statement.
+    """
+
+    def __init__(self):
+        self.entities = {}
+        self.aliases = {}
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0
+
+    @staticmethod
+    def get_key(model, pk) -> Optional[tuple]:
+        try:
+            return model._meta.label_lower, model._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+
+    def get(self, model, field: str, value):
+        """instance of `model` whose `field` equals `value`, `None` when not loaded yet"""
+        if field in ("pk", model._meta.pk.name):
+            return self.entities.get(self.get_key(model, value))
+        instance = self.entities.get(self.aliases.get((model._meta.label_lower, field, value)))
+        if instance is not None and getattr(instance, field) != value:
+            # changed since it was loaded by that value
+            return None
+        return instance
+
+    def add(self, instance, *fields):
+        """keep `instance`, reachable by primary key and by each of `fields`"""
+        model = type(instance)
+        key = self.get_key(model, instance.pk)
+        self.entities[key] = instance
+        for field in fields:
+            if field not in ("pk", model._meta.pk.name):
+                self.aliases[(model._meta.label_lower, field, getattr(instance, field))] = key
+        return instance
+
+    def load(self, model, loader, **lookup):
+        """
+        instance matching the single field `lookup`, read through `loader` on a miss
+
+        Args:
+            model: model class of the entity
+            loader: callable running the query, exceptions (e.g. `DoesNotExist`) propagate
+            lookup: `field=value` identifying the entity
+        """
+        ((field, value),) = lookup.items()
+        instance = self.get(model, field, value)
+        if instance is not None:
+            self.hits += 1
+            return instance
+        self.misses += 1
+        return self.add(loader(), field)
+
+    async def aload(self, model, loader, **lookup):
+        """`load` with an async `loader`"""
+        ((field, value),) = lookup.items()
+        instance = self.get(model, field, value)
+        if instance is not None:
+            self.hits += 1
+            return instance
+        self.misses += 1
+        return self.add(await loader(), field)
+
+    def refresh(self, instance):
+        """replace the kept copy of a row that was saved through another instance"""
+        key = self.get_key(type(instance), instance.pk)
+        if key in self.entities:
+            self.entities[key] = instance
+
+    def discard(self, model, pks=None):
+        """forget rows of `model`, all of them when `pks` is `None`"""
+        if pks is not None:
+            for pk in pks:
+                self.entities.pop(self.get_key(model, pk), None)
+            return
+        label = model._meta.label_lower
+        for key in [key for key in self.entities if key[0] == label]:
+            del self.entities[key]
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "queries_saved": self.hits + self.joined,
+        }
+
+
+_identity_map: ContextVar = ContextVar("identity_map", default=None)
+
+
+def get_identity_map() -> Optional[IdentityMap]:
+    """identity map of the current unit of work, `None` outside of one"""
+    return _identity_map.get()
+
+
+@contextmanager
+def identity_map_scope():
+    """run the block as one unit of work with a fresh identity map"""
+    identity_map = IdentityMap()
+    token = _identity_map.set(identity_map)
+    try:
+        yield identity_map
+    finally:
+        _identity_map.reset(token)
+
+
+def load_entity(model, loader, **lookup):
+    """`IdentityMap.load` in a unit of work, plain `loader()` outside of one"""
+    identity_map = get_identity_map()
+    if identity_map is None:
+        return loader()
+    return identity_map.load(model, loader, **lookup)
+
+
+async def aload_entity(model, loader, **lookup):
+    """`load_entity` with an async `loader`"""
+    identity_map = get_identity_map()
+    if identity_map is None:
+        return await loader()
+    return await identity_map.aload(model, loader, **lookup)
+
+
+def remember_entity(instance, *fields):
+    """add an instance loaded elsewhere to the current identity map"""
+    identity_map = get_identity_map()
+    if identity_map is not None and instance is not None:
+        identity_map.add(instance, *fields)
+    return instance
+
+
+def forget_entities(model, pks=None):
+    """drop rows changed behind the ORM's back, e.g. by `QuerySet.update()`"""
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.discard(model, pks)
+
+
+def record_joined_queries(count: int = 1):
+    """count queries avoided by loading related rows in one statement"""
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.joined += count
+
+
+@receiver(post_save, dispatch_uid="identity_map_refresh")
+def refresh_saved_entity(sender, instance, **kwargs):
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.refresh(instance)
+
+
+@receiver(post_delete, dispatch_uid="identity_map_discard")
+def discard_deleted_entity(sender, instance, **kwargs):
+    identity_map = get_identity_map()
+    if identity_map is not None:
+        identity_map.discard(sender, [instance.pk])
+
+
+class IdentityMapMiddleware:
+    """
+    one identity map per request, entities fetched once are reused until the
+    response is sent
+
+    The statistics are logged at debug level and, with `DEBUG` on, returned in
+    the `X-Identity-Map` header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with identity_map_scope() as identity_map:
+            response = self.get_response(request)
+        return self.report(request, response, identity_map)
+
+    async def __acall__(self, request):
+        with identity_map_scope() as identity_map:
+            response = await self.get_response(request)
+        return self.report(request, response, identity_map)
+
+    def report(self, request, response, identity_map):
+        stats = identity_map.stats
+        logger.debug("identity map for %s %s: %s", request.method, request.path, stats)
+        if settings.DEBUG:
+            response.headers["X-Identity-Map"] = ", ".join(f"{name}={value}" for name, value in stats.items())
+        return response
@@ -0,0 +1,280 @@
+import functools
+import hmac
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+from lib.django.custom_slow_queries import log_slow_query
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_request_metrics = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """database and serialization time of the current request"""
+
+    __slots__ = ("request", "queries", "db_time", "serialization_time", "serializing")
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.serializing = False
+
+
+class Histogram:
+    """observation counts per upper bound of `buckets`, the last slot is +Inf"""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def get_samples(self):
+        """cumulative `(le, count)` pairs, then the sum and the total count"""
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            yield bound, total
+        yield "sum", self.sum
+        yield "count", total
+
+
+class ViewMetrics:
+    __slots__ = ("requests", "latency", "queries", "db_time", "serialization_time", "response_size")
+
+    def __init__(self):
+        # request count by (method, status)
+        self.requests = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.serialization_time = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+
+class MetricsRegistry:
+    """
+    per view request metrics of this process, written as Prometheus text
+
+    Each worker process keeps its own registry, Prometheus scrapes every
+    worker and sums them. `record` runs on every request: buckets are found
+    before taking the lock and the histograms are updated inline.
+    """
+
+    prefix = "hms"
+    histograms = (
+        ("latency", "http_request_duration_seconds", "Request latency, middleware included."),
+        ("queries", "db_queries_per_request", "Database queries run by one request."),
+        ("db_time", "db_duration_seconds", "Time one request spent in database queries."),
+        ("serialization_time", "serialization_duration_seconds", "Time one request spent serializing and rendering."),
+        ("response_size", "http_response_size_bytes", "Response body size, streamed bodies excluded."),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, method, status, latency, request_metrics, size) -> None:
+        queries, db_time, serialization_time = (
+            request_metrics.queries, request_metrics.db_time, request_metrics.serialization_time
+        )
+        latency_bucket = bisect_left(LATENCY_BUCKETS, latency)
+        queries_bucket = bisect_left(QUERY_BUCKETS, queries)
+        db_time_bucket = bisect_left(LATENCY_BUCKETS, db_time)
+        serialization_bucket = bisect_left(LATENCY_BUCKETS, serialization_time)
+        key = (method, status)
+        with self.lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics()
+            requests = metrics.requests
+            requests[key] = requests.get(key, 0) + 1
+            histogram = metrics.latency
+            histogram.counts[latency_bucket] += 1
+            histogram.sum += latency
+            histogram = metrics.queries
+            histogram.counts[queries_bucket] += 1
+            histogram.sum += queries
+            histogram = metrics.db_time
+            histogram.counts[db_time_bucket] += 1
+            histogram.sum += db_time
+            histogram = metrics.serialization_time
+            histogram.counts[serialization_bucket] += 1
+            histogram.sum += serialization_time
+            if size is not None:
+                metrics.response_size.observe(size)
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            views = sorted(self.views.items())
+            name = f"{self.prefix}_http_requests_total"
+            lines += [f"# HELP {name} Requests by view, method and status.", f"# TYPE {name} counter"]
+            for view, metrics in views:
+                for (method, status), count in sorted(metrics.requests.items()):
+                    lines.append(f'{name}{{view="{view}",method="{method}",status="{status}"}} {count}')
+            for attribute, suffix, help_text in self.histograms:
+                name = f"{self.prefix}_{suffix}"
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for view, metrics in views:
+                    for sample, value in getattr(metrics, attribute).get_samples():
+                        if sample in ("sum", "count"):
+                            lines.append(f'{name}_{sample}{{view="{view}"}} {value}')
+                        else:
+                            lines.append(f'{name}_bucket{{view="{view}",le="{sample}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    `execute_wrapper` counting the queries and database time of the request
+    and logging the queries slower than `settings.SLOW_QUERY_THRESHOLD_MS`
+    """
+    metrics = _request_metrics.get()
+    started = perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        duration = perf_counter() - started
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += duration
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold and duration * 1000 >= threshold:
+        log_slow_query(
+            context["connection"], sql, params, many, duration, metrics.request if metrics is not None else None
+        )
+    return result
+
+
+def install_query_recorder(connection) -> None:
+    # wrappers stay on the connection object across reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+connection_created.connect(_on_connection_created, dispatch_uid="hms-metrics-query-recorder")
+
+
+def record_serialization(func):
+    """count the time spent in `func` as serialization of the request, nested calls once"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        metrics = _request_metrics.get()
+        if metrics is None or metrics.serializing:
+            return func(*args, **kwargs)
+        metrics.serializing = True
+        started = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.serialization_time += perf_counter() - started
+            metrics.serializing = False
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    record latency, database queries and time, serialization time and
+    response size of every request under the URL name of its view
+
+    Queries are counted by an `execute_wrapper` installed on every database
+    connection, serialization by the functions decorated with
+    `record_serialization`. Requests that resolve to no view are recorded
+    as `unmatched`. Keep it first in `MIDDLEWARE` so the latency covers the
+    whole stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics(request)
+        token = _request_metrics.set(metrics)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        self.record(request, response, perf_counter() - started, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(request)
+        token = _request_metrics.set(metrics)
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        self.record(request, response, perf_counter() - started, metrics)
+        return response
+
+    @staticmethod
+    def record(request, response, latency, metrics) -> None:
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match is not None else "unmatched"
+        size = None
+        if not response.streaming:
+            # set by CommonMiddleware, spares joining the body again
+            length = response.get("Content-Length")
+            size = int(length) if length else len(response.content)
+        registry.record(view, request.method, response.status_code, latency, metrics, size)
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of `registry`
+
+    Scrapers have to send `settings.METRICS_TOKEN` as a bearer token, without
+    a token configured the metrics are not served: route names, latencies and
+    query counts are not for the public.
+    """
+    token = settings.METRICS_TOKEN
+    # compare_digest refuses str holding non ASCII characters
+    authorization = request.headers.get("Authorization", "").encode()
+    if not token or not hmac.compare_digest(authorization, f"Bearer {token}".encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,186 @@
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import router
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+class BaseOTPStore:
+    """
+    pending one time passwords, at most one per user
+
+    Entries are instances of `model` with `user_id`, `otp`, `otp_expiration`
+    and `otp_token`. `issue` replaces the pending OTP of the user, `get`
+    returns it until it expires and `consume` removes it when the reset token
+    matches, each in one atomic operation. An expired OTP is never returned
+    and its token can't be consumed.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def issue(self, otp) -> None:
+        raise NotImplementedError
+
+    def get(self, user_id):
+        """unexpired OTP of the user, `None` when there is none"""
+        raise NotImplementedError
+
+    def consume(self, user_id, otp_token) -> bool:
+        """remove the OTP of the user if `otp_token` is its token, a token works once"""
+        raise NotImplementedError
+
+    def get_values(self, otp) -> tuple:
+        return otp.id, otp.otp, otp.otp_expiration, otp.otp_token
+
+    def build(self, user_id, values):
+        otp_id, otp, otp_expiration, otp_token = values
+        return self.model(id=otp_id, user_id=user_id, otp=otp, otp_expiration=otp_expiration, otp_token=otp_token)
+
+    @staticmethod
+    def get_ttl(otp) -> float:
+        return (otp.otp_expiration - timezone.now()).total_seconds()
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """
+    OTPs as rows of `model`, durable and shared by every process
+
+    Issuing upserts the row of the user and consuming is a conditional delete
+    on the primary, a token works for the request whose DELETE removed the row.
+    Expired rows stay until they are replaced, consumed or purged by the
+    `purge_expired_otps` command.
+    """
+
+    def issue(self, otp) -> None:
+        self.model.objects.bulk_create(
+            [otp],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["otp", "otp_expiration", "otp_token"],
+        )
+
+    def get(self, user_id):
+        return self.model.objects.filter(user_id=user_id, otp_expiration__gt=timezone.now()).first()
+
+    def consume(self, user_id, otp_token) -> bool:
+        # on the primary even when reads go to a replica, a consumed OTP must be gone for every reader
+        deleted, _ = self.model.objects.db_manager(router.db_for_write(self.model)).filter(
+            user_id=user_id, otp_token=otp_token, otp_expiration__gt=timezone.now()
+        ).delete()
+        return bool(deleted)
+
+
+class MemoryOTPStore(BaseOTPStore):
+    """
+    OTPs in process memory, for a single process deployment
+
+    Expiry is driven by a hashed timer wheel of one second `slots`: every
+    operation first turns the wheel to the current second and drops the
+    entries of the slots it passes, so expired OTPs are freed in amortised
+    constant time without a background thread or a scan of the whole store.
+    """
+
+    def __init__(self, model, slots=64):
+        super().__init__(model)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.wheel = [set() for _ in range(slots)]
+        self.tick = int(time.monotonic())
+
+    def advance(self) -> None:
+        now = int(time.monotonic())
+        if now == self.tick:
+            return
+        passed = range(self.tick + 1, now + 1)
+        if len(passed) >= len(self.wheel):
+            passed = range(now - len(self.wheel) + 1, now + 1)
+        for tick in passed:
+            slot = self.wheel[tick % len(self.wheel)]
+            for user_id in [user_id for user_id in slot if self.entries[user_id][0] <= now]:
+                slot.discard(user_id)
+                del self.entries[user_id]
+        self.tick = now
+
+    def issue(self, otp) -> None:
+        expires_at = int(time.monotonic() + self.get_ttl(otp)) + 1
+        with self.lock:
+            self.advance()
+            self.remove(otp.user_id)
+            self.entries[otp.user_id] = (expires_at, self.get_values(otp))
+            self.wheel[expires_at % len(self.wheel)].add(otp.user_id)
+
+    def get(self, user_id):
+        with self.lock:
+            self.advance()
+            entry = self.entries.get(user_id)
+        if entry is None or entry[1][2] <= timezone.now():
+            return None
+        return self.build(user_id, entry[1])
+
+    def consume(self, user_id, otp_token) -> bool:
+        with self.lock:
+            self.advance()
+            entry = self.entries.get(user_id)
+            if entry is None or entry[1][3] != otp_token or entry[1][2] <= timezone.now():
+                return False
+            self.remove(user_id)
+            return True
+
+    def remove(self, user_id) -> None:
+        entry = self.entries.pop(user_id, None)
+        if entry is not None:
+            self.wheel[entry[0] % len(self.wheel)].discard(user_id)
+
+    def __len__(self):
+        with self.lock:
+            self.advance()
+            return len(self.entries)
+
+
+class CacheOTPStore(BaseOTPStore):
+    """
+    OTPs in the `alias` cache of `settings.CACHES`, shared by every process
+
+    Entries expire with the OTP through the cache timeout. A token is
+    consumed by an atomic `add()` of a marker key, so it succeeds once even
+    when two requests race.
+    """
+
+    key_prefix = "otp"
+
+    def __init__(self, model, alias="default"):
+        super().__init__(model)
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_key(self, user_id) -> str:
+        return f"{self.key_prefix}:{user_id}"
+
+    def issue(self, otp) -> None:
+        self.cache.set(self.get_key(otp.user_id), self.get_values(otp), timeout=max(1, int(self.get_ttl(otp)) + 1))
+
+    def get(self, user_id):
+        values = self.cache.get(self.get_key(user_id))
+        if values is None or values[2] <= timezone.now():
+            return None
+        return self.build(user_id, values)
+
+    def consume(self, user_id, otp_token) -> bool:
+        otp = self.get(user_id)
+        if otp is None or otp.otp_token != otp_token:
+            return False
+        if not self.cache.add(f"{self.key_prefix}-used:{otp_token}", True, timeout=max(1, int(self.get_ttl(otp)) + 1)):
+            return False
+        self.cache.delete(self.get_key(user_id))
+        return True
+
+
+def load_otp_store(path, model) -> BaseOTPStore:
+    """instantiate the OTP store at dotted `path`"""
+    return import_string(path)(model)
@@ -0,0 +1,184 @@
+import base64
+import datetime
+import json
+import re
+import uuid
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(BasePagination):
+    """
+    opaque cursor pagination keyed on a unique `ordering`
+
+    Pages are located with a range condition on the ordering columns instead of
+    `COUNT(*)` and `OFFSET`, so deep pages cost the same as the first one.
+    A total is only returned when asked for with `?estimate=true`.
+    """
+
+    ordering = ("id",)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    estimate_query_param = "estimate"
+    invalid_cursor_message = "Invalid cursor"
+
+    @classmethod
+    def is_requested(cls, request) -> bool:
+        """keyset mode is used once the client sends a (possibly empty) cursor"""
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.get_ordering(reverse)
+        page_queryset = queryset.order_by(*ordering)
+        if position:
+            page_queryset = page_queryset.filter(self.get_position_filter(ordering, position))
+
+        # one extra row tells whether another page follows
+        rows = list(page_queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        # walking backwards, the extra row lies before the page and the cursor after it
+        more_after = bool(position) if reverse else has_more
+        more_before = has_more if reverse else bool(position)
+        if rows and more_after:
+            self.next_cursor = self.encode_cursor(self.get_position(rows[-1]), False)
+        if rows and more_before:
+            self.previous_cursor = self.encode_cursor(self.get_position(rows[0]), True)
+
+        self.estimated_total = None
+        if request.query_params.get(self.estimate_query_param) in ("true", "1"):
+            self.estimated_total = self.get_estimated_total(queryset)
+        return rows
+
+    def get_paginated_data(self, data) -> dict:
+        """page envelope for the serialized `data`"""
+        paginated = {
+            "results": data,
+            "next": self.next_cursor,
+            "previous": self.previous_cursor,
+        }
+        if self.estimated_total is not None:
+            paginated["estimated_total"] = self.estimated_total
+        return paginated
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(page_size, self.max_page_size) if page_size > 0 else self.page_size
+
+    def get_ordering(self, reverse: bool) -> list:
+        if not reverse:
+            return list(self.ordering)
+        return [
+            field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering
+        ]
+
+    def get_position(self, row) -> list:
+        """ordering values of a model instance, named row or dict"""
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(row, dict):
+            return [row[field] for field in fields]
+        return [getattr(row, field) for field in fields]
+
+    @staticmethod
+    def get_position_filter(ordering, position) -> Q:
+        """rows strictly after `position` in `ordering`, compared lexicographically"""
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {prev.lstrip("-"): value for prev, value in zip(ordering[:index], position)}
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": position[index]}))
+        return reduce(lambda left, right: left | right, conditions)
+
+    def encode_cursor(self, position, reverse: bool) -> str:
+        payload = json.dumps([int(reverse), [self.encode_value(value) for value in position]])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request, model):
+        """position and direction of the cursor sent, values converted by the ordering fields of `model`"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            reverse, position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            # a well formed cursor may still carry values the columns can't hold
+            position = [
+                self.get_ordering_field(model, field).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (ValidationError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    @staticmethod
+    def get_ordering_field(model, field):
+        name = field.lstrip("-")
+        return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+    @staticmethod
+    def encode_value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+
+    @staticmethod
+    def get_estimated_total(queryset) -> int:
+        """planner row estimate on PostgreSQL, exact count elsewhere"""
+        queryset = queryset.order_by()
+        if connections[queryset.db].vendor == "postgresql":
+            match = re.search(r"rows=(\d+)", queryset.explain())
+            if match:
+                return int(match.group(1))
+        return queryset.count()
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """`PageNumberPagination` for async views, the count and the page rows are awaited"""
+
+    async def apaginate_queryset(self, queryset, request) -> list | None:
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # preset so validating the page number doesn't count synchronously
+        paginator.count = await queryset.acount()
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.request = request
+        return [row async for row in self.page.object_list]
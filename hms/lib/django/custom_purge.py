@@ -0,0 +1,29 @@
+import time
+
+from django.db import router
+
+
+def purge_in_chunks(queryset, chunk_size=1000, pause=0.0) -> int:
+    """
+    delete the rows of `queryset` `chunk_size` primary keys per statement
+
+    Each chunk is a separate short statement, so rows are locked a chunk at a
+    time instead of all at once, `pause` seconds between chunks leave room to
+    other writers. Rows are selected and deleted on the write database, a
+    replica would lag behind or refuse the DELETE. Returns the number of rows
+    of `queryset.model` deleted.
+    """
+    model = queryset.model
+    alias = router.db_for_write(model)
+    queryset = queryset.using(alias)
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        _, deleted_by_model = model._base_manager.db_manager(alias).filter(pk__in=ids).delete()
+        deleted += deleted_by_model.get(model._meta.label, 0)
+        if len(ids) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,81 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from lib.django.custom_metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ENVELOPE_KEYS = ("message", "data", "status")
+
+
+class EnvelopeJSONRenderer(JSONRenderer):
+    """
+    JSON renderer for the `{message, data, status}` envelope of `CustomResponse`
+
+    With `orjson` installed, UUIDs, datetimes, dict and list subclasses are
+    encoded natively in one pass to bytes. Types it doesn't know fall back to
+    DRF's `JSONEncoder`, and so does the whole encoding without `orjson`.
+    U+2028 and U+2029 are escaped afterwards like `JSONRenderer` does, the
+    output is the one of DRF's `JSONRenderer`.
+    An envelope whose `data` is a list longer than `chunk_size` is written
+    `chunk_size` items at a time. `render()` joins those chunks, DRF sends a
+    single body; only the async views stream them, through `aiter_render()`.
+    """
+
+    chunk_size = 1000
+
+    def __init__(self):
+        self.fallback = JSONEncoder(ensure_ascii=self.ensure_ascii, allow_nan=not self.strict, separators=(",", ":"))
+
+    @record_serialization
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent:
+            # human readable output, rare enough for the generic path
+            return super().render(data, accepted_media_type, renderer_context)
+        return b"".join(self.iter_render(data))
+
+    def iter_render(self, data):
+        """encoded `data` as byte chunks, the envelope list one chunk at a time"""
+        if not self.is_chunked(data):
+            yield self.dumps(data)
+            return
+        items = data["data"]
+        yield b'{"message":' + self.dumps(data["message"]) + b',"data":['
+        for start in range(0, len(items), self.chunk_size):
+            chunk = self.dumps(items[start:start + self.chunk_size])[1:-1]
+            yield chunk if start == 0 else b"," + chunk
+        yield b'],"status":' + self.dumps(data["status"]) + b"}"
+
+    async def aiter_render(self, data):
+        """
+        `iter_render()` as an async iterator, what `StreamingHttpResponse`
+        streams under ASGI: a sync iterator is first read into a list there
+        """
+        for chunk in self.iter_render(data):
+            yield chunk
+
+    def is_chunked(self, data) -> bool:
+        return (
+            isinstance(data, dict)
+            and tuple(data) == ENVELOPE_KEYS
+            and isinstance(data["data"], list)
+            and len(data["data"]) > self.chunk_size
+        )
+
+    def dumps(self, value) -> bytes:
+        if orjson is not None:
+            encoded = orjson.dumps(
+                value,
+                default=self.fallback.default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        else:
+            encoded = self.fallback.encode(value).encode()
+        # valid JSON but not valid JavaScript, escaped by JSONRenderer too
+        return encoded.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,22 @@
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+
+
+class ResetTokenGenerator(PasswordResetTokenGenerator):
+    """
+    signed password reset tokens, checked without any stored state
+
+    The token is an HMAC of the user id, the current password hash and the
+    time it was made, so it only works for that user, expires after
+    `settings.PASSWORD_RESET_TIMEOUT` and stops working once the password
+    changes, which makes it single use. Unlike Django's generator,
+    `last_login` and the email are left out: they may change while a reset
+    is in progress without being a reason to refuse it.
+    """
+
+    key_salt = "lib.django.custom_reset_tokens.ResetTokenGenerator"
+
+    def _make_hash_value(self, user, timestamp):
+        return f"{user.pk}{user.password}{timestamp}"
+
+
+reset_token_generator = ResetTokenGenerator()
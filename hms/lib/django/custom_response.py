@@ -17,7 +17,6 @@ class CustomResponse:
     ):
         self.message = str(message)
         self.data = data
-        print(status)
         self.status = status
 
     @property
@@ -0,0 +1,180 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+class BloomFilter:
+    """
+    set membership in a fixed bit array, false positives at `error_rate`, never a false negative
+
+    Membership costs a fixed number of bit lookups whatever the number of
+    members. Items can't be removed, rebuild the filter to drop them.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def get_positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self.get_positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(item))
+
+
+class RevocationList:
+    """
+    token ids (`jti`) revoked before they expire
+
+    Rows of `model` (`jti`, `expires_at`, `revoked_at`) are the source of
+    truth and mirrored in an in-process `BloomFilter`, so a token that was not
+    revoked, nearly every one, is cleared without any query. Only filter hits
+    are confirmed against the table. Revocations bump a generation counter in
+    the cache; other processes check it at most every `sync_interval` seconds
+    and load the rows revoked since their last sync. Expired rows are ignored,
+    dropped from the filter when it is rebuilt once per access token lifetime
+    and deleted by `purge()`, which revocations run as often.
+    """
+
+    generation_key = "token-revocation-generation"
+    # rows revoked this long before the last sync are loaded again, covers clock skew
+    sync_overlap = timedelta(minutes=1)
+
+    def __init__(self, model, capacity=100_000, error_rate=0.001, sync_interval=1.0):
+        self.model = model
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.filter = None
+        self.generation = None
+        self.synced_at = None
+        self.checked_at = 0.0
+        self.rebuilt_at = 0.0
+        self.purged_at = 0.0
+        self.counters = {"checks": 0, "filter_hits": 0, "revoked": 0}
+
+    def revoke(self, jti: str, expires_at) -> None:
+        """revoke the token `jti` until `expires_at`, the time it expires anyway"""
+        if expires_at <= timezone.now():
+            return
+        if time.monotonic() - self.purged_at > api_settings.ACCESS_TOKEN_LIFETIME.total_seconds():
+            self.purge()
+        self.model.objects.bulk_create(
+            [self.model(jti=jti, expires_at=expires_at)], ignore_conflicts=True
+        )
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.add(self.generation_key, 1, timeout=None)
+
+    def is_revoked(self, jti: str) -> bool:
+        """constant time for tokens that were not revoked, a query on filter hits"""
+        self.sync()
+        with self.lock:
+            self.counters["checks"] += 1
+            if jti not in self.filter:
+                return False
+            self.counters["filter_hits"] += 1
+        revoked = self.model.objects.filter(jti=jti, expires_at__gt=timezone.now()).exists()
+        if revoked:
+            with self.lock:
+                self.counters["revoked"] += 1
+        return revoked
+
+    def sync(self) -> None:
+        now = time.monotonic()
+        if self.filter is not None and now - self.checked_at < self.sync_interval:
+            return
+        self.checked_at = now
+        generation = cache.get(self.generation_key)
+        if self.filter is not None and generation == self.generation:
+            return
+        lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        if self.filter is None or now - self.rebuilt_at > lifetime:
+            self.rebuild(generation)
+        else:
+            self.load_since(generation)
+
+    def rebuild(self, generation) -> None:
+        """fresh filter of the unexpired rows, sized for twice as many as there are"""
+        synced_at = timezone.now()
+        jtis = list(self.model.objects.filter(expires_at__gt=synced_at).values_list("jti", flat=True))
+        bloom = BloomFilter(max(self.capacity, len(jtis) * 2), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self.lock:
+            self.filter, self.generation, self.synced_at = bloom, generation, synced_at
+            self.rebuilt_at = time.monotonic()
+
+    def load_since(self, generation) -> None:
+        """add the rows revoked since the last sync"""
+        synced_at = timezone.now()
+        jtis = self.model.objects.filter(
+            revoked_at__gte=self.synced_at - self.sync_overlap, expires_at__gt=synced_at
+        ).values_list("jti", flat=True)
+        with self.lock:
+            for jti in jtis:
+                self.filter.add(jti)
+            self.generation, self.synced_at = generation, synced_at
+            if self.filter.count > self.filter.capacity:
+                # past capacity the error rate climbs, resize on the next sync
+                self.rebuilt_at = 0.0
+
+    def purge(self) -> int:
+        """delete expired rows, returns how many"""
+        deleted, _ = self.model.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.purged_at = time.monotonic()
+        return deleted
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "size": self.filter.count if self.filter else 0}
+
+
+_revocation_list = None
+_revocation_list_lock = threading.Lock()
+
+
+def get_revocation_list() -> RevocationList:
+    """process wide `RevocationList` of `settings.REVOKED_TOKEN_MODEL`"""
+    global _revocation_list
+    if _revocation_list is None:
+        with _revocation_list_lock:
+            if _revocation_list is None:
+                _revocation_list = RevocationList(
+                    apps.get_model(settings.REVOKED_TOKEN_MODEL),
+                    capacity=settings.TOKEN_REVOCATION_CAPACITY,
+                    error_rate=settings.TOKEN_REVOCATION_ERROR_RATE,
+                    sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+                )
+    return _revocation_list
+
+
+def revoke_token(token) -> None:
+    """revoke a validated simplejwt token until it expires"""
+    get_revocation_list().revoke(token[api_settings.JTI_CLAIM], datetime_from_epoch(token["exp"]))
@@ -0,0 +1,167 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class RoutingState:
+    """per request routing flags, shared by the middleware and the router"""
+
+    def __init__(self, pinned: bool = False):
+        # reads go to the primary
+        self.pinned = pinned
+        # a write was routed during the request
+        self.written = False
+
+
+_routing_state: ContextVar = ContextVar("db_routing_state", default=None)
+
+# queryset hint allowing reads from a replica, see `get_replica_manager`
+READ_REPLICA_HINT = "read_replica"
+
+
+def get_replica_manager(manager):
+    """
+    `manager` whose querysets may read from a replica, for the read paths of
+    the domain services
+
+    Every other read stays on the primary: tokens, OTPs and sessions are
+    checked right after they are written and a lagging replica would miss
+    the change. Writes made through these querysets go to the primary too.
+    """
+    return manager.db_manager(hints={READ_REPLICA_HINT: True})
+
+
+@contextmanager
+def use_primary():
+    """send every read in the block to the primary database"""
+    token = _routing_state.set(RoutingState(pinned=True))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+class ReplicaRouter:
+    """
+    reads of `get_replica_manager` querysets go to a random alias of
+    `settings.REPLICA_DATABASES`, every other query to the primary
+
+    Reads stay on the primary while the request is pinned to it (see
+    `ReplicaStickinessMiddleware`), after a write in the same request and
+    inside a transaction of the primary. Without replicas every query goes to
+    the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or not hints.get(READ_REPLICA_HINT):
+            return None
+        state = _routing_state.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            # read your own writes, for the rest of the request and a while after
+            state.pinned = True
+            state.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """
+    keep a client on the primary database for `settings.REPLICA_STICKY_SECONDS`
+    after it wrote, so it reads its own writes despite replication lag
+
+    The pin is stored in a cookie and, for token clients that don't keep
+    cookies, in the cache under the user id of the bearer token.
+    """
+
+    cookie_name = "db_primary"
+    key_prefix = "db-primary"
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        client_key = self.get_client_key(request)
+        state = RoutingState(pinned=self.is_pinned(request, client_key))
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.written:
+            self.pin(response, client_key)
+        return response
+
+    async def __acall__(self, request):
+        # the session user and the cache are read off the event loop
+        client_key = await sync_to_async(self.get_client_key)(request)
+        pinned = await sync_to_async(self.is_pinned)(request, client_key)
+        state = RoutingState(pinned=pinned)
+        token = _routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.written:
+            await sync_to_async(self.pin)(response, client_key)
+        return response
+
+    @classmethod
+    def get_client_key(cls, request):
+        """cache key of the authenticated client, `None` for anonymous requests"""
+        header = request.headers.get("Authorization", "").split()
+        if len(header) == 2 and header[0] in api_settings.AUTH_HEADER_TYPES:
+            try:
+                user_id = AccessToken(header[1])[api_settings.USER_ID_CLAIM]
+            except (TokenError, KeyError):
+                return None
+            return f"{cls.key_prefix}:{user_id}"
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"{cls.key_prefix}:{user.pk}"
+        return None
+
+    def is_pinned(self, request, client_key) -> bool:
+        if not settings.REPLICA_DATABASES:
+            return False
+        if self.cookie_name in request.COOKIES:
+            return True
+        return client_key is not None and cache.get(client_key) is not None
+
+    def pin(self, response, client_key):
+        window = settings.REPLICA_STICKY_SECONDS
+        if not settings.REPLICA_DATABASES or window <= 0:
+            return
+        response.set_cookie(self.cookie_name, "1", max_age=window, httponly=True, samesite="Lax")
+        if client_key is not None:
+            cache.set(client_key, True, timeout=window)
@@ -0,0 +1,221 @@
+import threading
+from collections import defaultdict
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+
+class BaseSearchBackend:
+    """
+    ranked search over text `fields` of a model
+
+    `search` narrows a queryset to the rows matching every term and orders them
+    by relevance, `build`, `update` and `remove` maintain the index behind it.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+    def build(self, queryset) -> dict:
+        """(re)build the index for `queryset`, returns statistics about it"""
+        return {}
+
+    def update(self, instance) -> None:
+        pass
+
+    def remove(self, pk) -> None:
+        pass
+
+    def get_match_filter(self, terms) -> Q:
+        """every term has to be found in at least one of the fields"""
+        return reduce(
+            lambda left, right: left & right,
+            (
+                reduce(
+                    lambda left, right: left | right,
+                    (Q(**{f"{field}__icontains": term}) for field in self.fields),
+                )
+                for term in terms
+            ),
+        )
+
+
+class TrigramSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL backend, `icontains` filters are served by `pg_trgm` GIN indexes
+    and results are ranked by trigram similarity
+
+    Django renders `icontains` as `UPPER("column"::text) LIKE UPPER(...)`, the
+    indexes are built on that very expression, an index on the bare column is
+    never used by it.
+    """
+
+    def search(self, queryset, terms):
+        if not terms:
+            return queryset
+        text = " ".join(terms)
+        similarities = [
+            Func(F(field), Value(text), function="similarity", output_field=FloatField())
+            for field in self.fields
+        ]
+        rank = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+        return (
+            queryset.filter(self.get_match_filter(terms))
+            .annotate(search_rank=rank)
+            .order_by("-search_rank")
+        )
+
+    @staticmethod
+    def get_index_name(table: str, column: str) -> str:
+        return f"{table}_{column}_upper_trgm"
+
+    def build(self, queryset) -> dict:
+        model = queryset.model
+        table = model._meta.db_table
+        indexes = []
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for field in self.fields:
+                column = model._meta.get_field(field).column
+                index = self.get_index_name(table, column)
+                # CONCURRENTLY keeps the table writable, it needs autocommit
+                cursor.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index}" '
+                    f'ON "{table}" USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+                )
+                # left by earlier builds on the bare column, it only slowed writes
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{table}_{column}_trgm"')
+                indexes.append(index)
+        return {"indexes": indexes}
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    in-process trigram inverted index, a stand-in for SQLite and tests
+
+    The index is built from the database on first use and updated on every
+    save in this process. Candidates are re-checked by primary key against the
+    database so stale entries never leak into results.
+    """
+
+    gram_size = 3
+    # ranked primary keys are sent back to the database as `IN` and `CASE`
+    # parameters, larger result sets are matched by the database unranked
+    max_ranked = 500
+
+    def __init__(self, fields):
+        super().__init__(fields)
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.postings = defaultdict(set)
+        self.built = False
+
+    @classmethod
+    def get_grams(cls, text: str) -> set:
+        return {text[i : i + cls.gram_size] for i in range(len(text) - cls.gram_size + 1)}
+
+    def get_document(self, instance) -> tuple:
+        return tuple((getattr(instance, field) or "").lower() for field in self.fields)
+
+    def _add(self, pk, document) -> None:
+        self.documents[pk] = document
+        for value in document:
+            for gram in self.get_grams(value):
+                self.postings[gram].add(pk)
+
+    def _discard(self, pk) -> None:
+        document = self.documents.pop(pk, None)
+        for value in document or ():
+            for gram in self.get_grams(value):
+                self.postings[gram].discard(pk)
+
+    def build(self, queryset) -> dict:
+        with self.lock:
+            self.documents = {}
+            self.postings = defaultdict(set)
+            for pk, *values in queryset.values_list("pk", *self.fields).iterator():
+                self._add(pk, tuple((value or "").lower() for value in values))
+            self.built = True
+            return {"documents": len(self.documents), "grams": len(self.postings)}
+
+    def update(self, instance) -> None:
+        if not self.built:
+            return
+        with self.lock:
+            self._discard(instance.pk)
+            self._add(instance.pk, self.get_document(instance))
+
+    def remove(self, pk) -> None:
+        with self.lock:
+            self._discard(pk)
+
+    def get_candidates(self, term: str):
+        grams = self.get_grams(term)
+        if not grams:
+            # shorter than a gram, nothing to intersect
+            return self.documents.keys()
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
+
+    @staticmethod
+    def get_score(term: str, value: str) -> int:
+        if value == term:
+            return 3
+        if value.startswith(term):
+            return 2
+        return 1 if term in value else 0
+
+    def rank(self, terms) -> list:
+        """primary keys matching every term, best match first"""
+        terms = [term.lower() for term in terms]
+        with self.lock:
+            candidates = reduce(
+                lambda left, right: left & right,
+                (set(self.get_candidates(term)) for term in terms),
+            )
+            scored = []
+            for pk in candidates:
+                document = self.documents[pk]
+                scores = [max(self.get_score(term, value) for value in document) for term in terms]
+                if all(scores):
+                    scored.append((-sum(scores), min(map(len, document)), str(pk), pk))
+        return [pk for *_, pk in sorted(scored)]
+
+    def search(self, queryset, terms):
+        if not terms:
+            return queryset
+        if not self.built:
+            self.build(queryset.model._default_manager.all())
+        ranked = self.rank(terms)
+        if not ranked:
+            return queryset.none()
+        if len(ranked) > self.max_ranked:
+            # every match is still returned, only the relevance order is lost
+            return queryset.filter(self.get_match_filter(terms))
+        ordering = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked)],
+            output_field=IntegerField(),
+        )
+        return (
+            queryset.filter(self.get_match_filter(terms), pk__in=ranked)
+            .annotate(search_rank=ordering)
+            .order_by("search_rank")
+        )
+
+
+def load_search_backend(path, fields, using="default") -> BaseSearchBackend:
+    """
+    instantiate the backend at dotted `path`, or pick one for the vendor of the
+    `using` database when `path` is empty
+    """
+    if path:
+        return import_string(path)(fields)
+    if connections[using].vendor == "postgresql":
+        return TrigramSearchBackend(fields)
+    return InvertedIndexSearchBackend(fields)
@@ -0,0 +1,129 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from rest_framework import fields as drf_fields
+from rest_framework.settings import api_settings
+
+from lib.django.custom_metrics import record_serialization
+
+
+class ValuesSerializer:
+    """
+    read-only fast path for `serializer_class`, a `ModelSerializer`
+
+    Rows are fetched with `values_list()` over the declared fields only and
+    turned into dicts with one converter per column, chosen once from the DRF
+    field. No model instance is built and no DRF field is dispatched per row,
+    the output is identical to `serializer_class(rows, many=True).data`.
+    """
+
+    serializer_class = None
+
+    def __init__(self):
+        declared = self.serializer_class().fields
+        self.field_names = []
+        self.sources = []
+        self.converters = []
+        for name, field in declared.items():
+            if field.write_only:
+                continue
+            if "." in field.source or field.source == "*":
+                raise ValueError(f"{name} is not a model column, ValuesSerializer can't read it")
+            self.field_names.append(name)
+            self.sources.append(field.source)
+            self.converters.append(self.get_converter(field))
+
+    @staticmethod
+    def get_converter(field):
+        """function turning a non-null column value into its representation, `None` if unchanged"""
+        if isinstance(field, drf_fields.UUIDField) and field.uuid_format == "hex_verbose":
+            return str
+        if isinstance(field, drf_fields.ChoiceField):
+            choices = field.choice_strings_to_values
+            return lambda value: choices.get(str(value), value)
+        if type(field) in (drf_fields.CharField, drf_fields.EmailField):
+            return None
+        if type(field) is drf_fields.BooleanField:
+            return bool
+        if type(field) is drf_fields.IntegerField:
+            return int
+        if type(field) is drf_fields.DateTimeField and not hasattr(field, "timezone"):
+            if getattr(field, "format", api_settings.DATETIME_FORMAT) == drf_fields.ISO_8601:
+                # bound to the active timezone by `bind_converters`
+                return get_datetime_to_iso
+        if type(field) is drf_fields.DateField:
+            if getattr(field, "format", api_settings.DATE_FORMAT) == drf_fields.ISO_8601:
+                return _date_to_iso
+        return field.to_representation
+
+    def get_queryset(self, queryset):
+        """`queryset` reduced to named rows of the declared columns"""
+        return queryset.values_list(*self.sources, named=True)
+
+    @record_serialization
+    def to_representation(self, rows) -> list:
+        """serialize rows of `get_queryset` or model instances"""
+        names = self.field_names
+        sources = self.sources
+        # columns passed through unchanged are skipped entirely
+        columns = [
+            (index, convert)
+            for index, convert in enumerate(self.bind_converters())
+            if convert is not None
+        ]
+        data = []
+        for row in rows:
+            if isinstance(row, tuple):
+                values = list(row)
+            else:
+                values = [getattr(row, source) for source in sources]
+            for index, convert in columns:
+                value = values[index]
+                if value is not None:
+                    values[index] = convert(value)
+            data.append(dict(zip(names, values)))
+        return data
+
+    def to_representation_one(self, row) -> dict:
+        return self.to_representation([row])[0]
+
+    def bind_converters(self) -> list:
+        """converters for the current request, the active timezone is read once"""
+        if get_datetime_to_iso not in self.converters:
+            return self.converters
+        datetime_to_iso = get_datetime_to_iso(
+            timezone.get_current_timezone() if settings.USE_TZ else None
+        )
+        return [
+            datetime_to_iso if convert is get_datetime_to_iso else convert
+            for convert in self.converters
+        ]
+
+
+def get_datetime_to_iso(current_timezone):
+    """mirrors `rest_framework.fields.DateTimeField.to_representation` for `current_timezone`"""
+
+    def datetime_to_iso(value):
+        if isinstance(value, str):
+            return value
+        if current_timezone is not None:
+            if timezone.is_aware(value):
+                value = value.astimezone(current_timezone)
+            else:
+                value = timezone.make_aware(value, current_timezone)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, datetime.timezone.utc)
+        value = value.isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return datetime_to_iso
+
+
+def _date_to_iso(value):
+    if isinstance(value, str):
+        return value
+    return value.isoformat()
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger("hms.slow_queries")
+
+_explaining = ContextVar("explaining_slow_query", default=False)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES = re.compile(r"\bVALUES\s*\(.*\)", re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """shape of a query: literals and parameters as `?`, lists and rows of values collapsed"""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES.sub("VALUES (...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def get_fingerprint(shape: str) -> str:
+    return hashlib.blake2b(shape.encode(), digest_size=8).hexdigest()
+
+
+class ExplainBudget:
+    """token bucket allowing `per_minute` EXPLAINs per process"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * self.per_minute / 60)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+_explain_budget = None
+_explain_budget_lock = threading.Lock()
+
+
+def get_explain_budget() -> ExplainBudget:
+    """process wide `ExplainBudget` of `settings.SLOW_QUERY_EXPLAINS_PER_MINUTE`"""
+    global _explain_budget
+    if _explain_budget is None:
+        with _explain_budget_lock:
+            if _explain_budget is None:
+                _explain_budget = ExplainBudget(settings.SLOW_QUERY_EXPLAINS_PER_MINUTE)
+    return _explain_budget
+
+
+def find_caller():
+    """
+    innermost frame of the first `settings.SLOW_QUERY_CALLER_MODULES` prefix
+    found on the stack, `module.qualname:line`
+
+    Querysets are lazy: a query built by a service and iterated by a view is
+    attributed to the view.
+    """
+    prefixes = settings.SLOW_QUERY_CALLER_MODULES
+    found = {}
+    frame = sys._getframe(1)
+    while frame is not None and len(found) < len(prefixes):
+        module = frame.f_globals.get("__name__", "")
+        for prefix in prefixes:
+            if prefix not in found and module.startswith(prefix):
+                found[prefix] = f"{module}.{frame.f_code.co_qualname}:{frame.f_lineno}"
+        frame = frame.f_back
+    return next((found[prefix] for prefix in prefixes if prefix in found), None)
+
+
+def is_explainable(connection, sql: str, many: bool) -> bool:
+    """plain reads outside a broken transaction, EXPLAIN never runs a write"""
+    return (
+        not many
+        and not connection.needs_rollback
+        and connection.features.supports_explaining_query_execution
+        and sql.lstrip()[:6].upper().startswith(("SELECT", "WITH"))
+    )
+
+
+def explain(connection, sql: str, params):
+    """plan lines of `sql`, `None` if the database refused"""
+    token = _explaining.set(True)
+    savepoint = connection.savepoint() if connection.in_atomic_block else None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            rows = cursor.fetchall()
+        if savepoint:
+            connection.savepoint_commit(savepoint)
+    except DatabaseError:
+        if savepoint:
+            connection.savepoint_rollback(savepoint)
+        logger.debug("EXPLAIN failed for %s", sql, exc_info=True)
+        return None
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == "sqlite":
+        # id, parent, unused, detail
+        return [str(row[-1]) for row in rows]
+    return [" ".join(str(column) for column in row) for row in rows]
+
+
+def log_slow_query(connection, sql: str, params, many: bool, duration: float, request=None) -> None:
+    """
+    write a structured record of a query slower than `settings.SLOW_QUERY_THRESHOLD_MS`
+
+    A share of `settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE` of the slow reads is
+    explained, at most `settings.SLOW_QUERY_EXPLAINS_PER_MINUTE` per process,
+    so a burst of slow queries doesn't double the load. Parameters are never
+    logged, they may hold personal data.
+    """
+    if _explaining.get():
+        return
+    match = getattr(request, "resolver_match", None) if request is not None else None
+    shape = normalize_sql(sql)
+    record = {
+        "time": timezone.now().isoformat(),
+        "duration_ms": round(duration * 1000, 3),
+        "database": connection.alias,
+        "view": (match.url_name or match.view_name) if match is not None else None,
+        "method": request.method if request is not None else None,
+        "caller": find_caller(),
+        "fingerprint": get_fingerprint(shape),
+        "sql": sql,
+        "plan": None,
+    }
+    if (
+        is_explainable(connection, sql, many)
+        and random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        and get_explain_budget().take()
+    ):
+        record["plan"] = explain(connection, sql, params)
+    logger.warning("slow query %.1f ms in %s", record["duration_ms"], record["view"] or record["caller"], extra={"slow_query": record})
+
+
+class SlowQueryFormatter(logging.Formatter):
+    """one JSON object per line, the `slow_query` record of `log_slow_query`"""
+
+    def format(self, record) -> str:
+        slow_query = getattr(record, "slow_query", None)
+        if slow_query is None:
+            return json.dumps({"time": timezone.now().isoformat(), "message": record.getMessage()})
+        return json.dumps(slow_query, default=str)
+
+
+def read_slow_queries(paths):
+    """records of the JSON lines files at `paths`, unreadable lines skipped"""
+    for path in paths:
+        with open(path, encoding="utf-8") as lines:
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and "sql" in record:
+                    yield record
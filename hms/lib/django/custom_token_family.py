@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from lib.django.custom_purge import purge_in_chunks
+
+logger = logging.getLogger(__name__)
+
+# claim naming the family of a refresh token, the jti of the first token of the family
+FAMILY_CLAIM = "family"
+# float timestamp of the login that started the family, `iat` is rounded down and refreshed
+FAMILY_STARTED_AT = "family_iat"
+
+
+class TokenFamilyReused(TokenError):
+    pass
+
+
+class TokenFamilyStore:
+    """
+    rotation state of refresh tokens, one row of `model` per login
+
+    A login starts a family named after the jti of its refresh token, no row
+    is written until the first refresh. Each refresh compares and swaps the
+    `current_jti` of the family in a single UPDATE by primary key. Presenting
+    any other token of the family means it was copied: the family is revoked
+    in one statement and every one of its tokens is refused from then on.
+    Ending a login, or every login of a user, writes revoked rows: a family
+    with no row yet gets one, and a row named after the user records when
+    all of its logins were ended, refusing the first refresh of any login
+    token minted before.
+    Rows expire with the newest refresh token of the family and are deleted
+    in chunks by `purge_expired()`, which `start_sweeper()` runs periodically.
+    """
+
+    def __init__(self, model, sweep_interval=600, sweep_chunk_size=1000):
+        self.model = model
+        self.sweep_interval = sweep_interval
+        self.sweep_chunk_size = sweep_chunk_size
+        self.sweeper = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def start_family(refresh) -> None:
+        """name the family of a refresh token minted at login"""
+        refresh[FAMILY_CLAIM] = refresh[api_settings.JTI_CLAIM]
+        refresh[FAMILY_STARTED_AT] = time.time()
+
+    @staticmethod
+    def get_user_key(user_id) -> str:
+        """id of the row recording when every login of a user was ended"""
+        return f"user:{user_id}"
+
+    def rotate(self, refresh, rotated) -> None:
+        """
+        make `rotated` the current token of the family of `refresh`
+
+        Raises:
+            TokenFamilyReused: `refresh` was already rotated, the family is revoked
+        """
+        self.start_sweeper()
+        jti = refresh[api_settings.JTI_CLAIM]
+        family = refresh.get(FAMILY_CLAIM, jti)
+        rotated[FAMILY_CLAIM] = family
+        new_jti = rotated[api_settings.JTI_CLAIM]
+        expires_at = datetime_from_epoch(rotated["exp"])
+        updated = self.model.objects.filter(id=family, current_jti=jti, revoked_at__isnull=True).update(
+            current_jti=new_jti, generation=F("generation") + 1, expires_at=expires_at
+        )
+        if updated:
+            return
+        if jti == family:
+            # first refresh of the login token
+            if self.is_user_revoked(refresh):
+                raise TokenError("Refresh token was revoked, log in again.")
+            try:
+                with transaction.atomic():
+                    self.model.objects.create(
+                        id=family,
+                        user_id=refresh[api_settings.USER_ID_CLAIM],
+                        current_jti=new_jti,
+                        generation=1,
+                        expires_at=expires_at,
+                    )
+                return
+            except IntegrityError:
+                pass
+        self.revoke(family)
+        raise TokenFamilyReused("Refresh token was already used, log in again.")
+
+    def revoke(self, family) -> int:
+        """refuse every token of `family`, returns 1 if the family exists"""
+        revoked = self.model.objects.filter(id=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+        if revoked:
+            logger.warning("refresh token family %s reused, revoked", family)
+        return revoked
+
+    def end_family(self, token) -> None:
+        """refuse every refresh token of the login `token` belongs to, refreshed or not"""
+        family = token.get(FAMILY_CLAIM)
+        if family is None:
+            # minted before families were tracked
+            return
+        self.write_revoked({family: token[api_settings.USER_ID_CLAIM]})
+
+    def revoke_users(self, user_ids) -> int:
+        """refuse the refresh tokens of every login of the users, returns the revoked family count"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return 0
+        revoked = self.model.objects.filter(user_id__in=user_ids, revoked_at__isnull=True).update(
+            revoked_at=timezone.now()
+        )
+        self.write_revoked({self.get_user_key(user_id): user_id for user_id in user_ids})
+        return revoked
+
+    def write_revoked(self, user_ids_by_id) -> None:
+        """insert the rows revoked as of now, or revoke the existing ones, in one statement"""
+        now = timezone.now()
+        # outlives every refresh token minted until now
+        expires_at = now + api_settings.REFRESH_TOKEN_LIFETIME
+        self.model.objects.bulk_create(
+            [
+                self.model(id=row_id, user_id=user_id, current_jti=row_id, expires_at=expires_at, revoked_at=now)
+                for row_id, user_id in user_ids_by_id.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=["revoked_at", "expires_at"],
+        )
+
+    def is_user_revoked(self, refresh) -> bool:
+        """check if every login of the user was ended after the login of `refresh`"""
+        started_at = datetime.fromtimestamp(refresh.get(FAMILY_STARTED_AT, refresh["iat"]), tz=dt_timezone.utc)
+        return self.model.objects.filter(
+            id=self.get_user_key(refresh[api_settings.USER_ID_CLAIM]), revoked_at__gte=started_at
+        ).exists()
+
+    def purge_expired(self, chunk_size=None) -> int:
+        """delete expired families `chunk_size` rows per statement, returns how many"""
+        return purge_in_chunks(
+            self.model.objects.filter(expires_at__lte=timezone.now()), chunk_size or self.sweep_chunk_size
+        )
+
+    def start_sweeper(self) -> None:
+        """purge expired families every `sweep_interval` seconds on a daemon thread, 0 disables it"""
+        if self.sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self.lock:
+            if self.sweeper is not None:
+                return
+            self.sweeper = threading.Thread(target=self.sweep, name="token-family-sweeper", daemon=True)
+            self.sweeper.start()
+
+    def sweep(self) -> None:
+        while not self.stopped.wait(self.sweep_interval):
+            try:
+                deleted = self.purge_expired()
+                logger.debug("token family sweep deleted %d expired families", deleted)
+            except Exception:
+                logger.exception("token family sweep failed")
+            finally:
+                connections.close_all()
+
+
+_token_family_store = None
+_token_family_store_lock = threading.Lock()
+
+
+def get_token_family_store() -> TokenFamilyStore:
+    """process wide `TokenFamilyStore` of `settings.TOKEN_FAMILY_MODEL`"""
+    global _token_family_store
+    if _token_family_store is None:
+        with _token_family_store_lock:
+            if _token_family_store is None:
+                _token_family_store = TokenFamilyStore(
+                    apps.get_model(settings.TOKEN_FAMILY_MODEL),
+                    sweep_interval=settings.TOKEN_FAMILY_SWEEP_SECONDS,
+                    sweep_chunk_size=settings.TOKEN_FAMILY_SWEEP_CHUNK_SIZE,
+                )
+    return _token_family_store
@@ -0,0 +1,100 @@
+import atexit
+import logging
+import threading
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    collect values per key in memory and write them in batches
+
+    `flush(values)` receives a dict of the latest value of every key added
+    since the previous flush, newer values replace older ones so callers may
+    add as often as they like. A daemon thread flushes every `interval`
+    seconds, sooner once `max_size` keys are waiting, and once more when the
+    process exits. A failed flush is logged and its values are kept for the
+    next one. With `interval` 0 no thread is started, `flush_now()` writes.
+    """
+
+    def __init__(self, flush, interval: float = 5, max_size: int = 1000, name: str = "write-behind"):
+        self.flush = flush
+        self.interval = interval
+        self.max_size = max_size
+        self.name = name
+        self.lock = threading.Lock()
+        self.values = {}
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.counters = {"added": 0, "flushes": 0, "written": 0, "failures": 0}
+
+    def add(self, key, value) -> None:
+        """buffer `value` for `key`, kept when newer than the one already waiting"""
+        with self.lock:
+            current = self.values.get(key)
+            if current is None or value > current:
+                self.values[key] = value
+            self.counters["added"] += 1
+            waiting = len(self.values)
+        self.start()
+        if waiting >= self.max_size:
+            self.wake.set()
+
+    def start(self) -> None:
+        if self.thread is not None or self.interval <= 0:
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.thread.start()
+        atexit.register(self.stop)
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            try:
+                self.flush_now()
+            finally:
+                # connections are per thread, don't keep this one open between flushes
+                connections.close_all()
+
+    def flush_now(self) -> int:
+        """write every waiting value, returns the number of keys written"""
+        with self.lock:
+            values, self.values = self.values, {}
+        if not values:
+            return 0
+        try:
+            self.flush(values)
+        except Exception:
+            logger.exception("%s flush of %d keys failed, retrying with the next one", self.name, len(values))
+            with self.lock:
+                self.counters["failures"] += 1
+                for key, value in values.items():
+                    current = self.values.get(key)
+                    if current is None or value > current:
+                        self.values[key] = value
+            return 0
+        with self.lock:
+            self.counters["flushes"] += 1
+            self.counters["written"] += len(values)
+        return len(values)
+
+    def stop(self) -> None:
+        """stop the flushing thread and write what is left"""
+        self.stopped.set()
+        self.wake.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.interval + 5)
+            self.thread = None
+        self.flush_now()
+
+    @property
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "waiting": len(self.values)}
@@ -1,4 +1,28 @@
+import csv
+import json
 import random 
 
 def generate_otp():
-    return random.randrange(1000, 9999)
\ No newline at end of file
+    return random.randrange(1000, 9999)
+
+
+def decode_lines(lines, encoding="utf-8-sig"):
+    """decode byte lines from an upload or request stream, `utf-8-sig` drops a BOM"""
+    for line in lines:
+        yield line.decode(encoding) if isinstance(line, bytes) else line
+
+
+def iter_csv_rows(lines):
+    """dict per CSV record, keyed by the header row"""
+    return csv.DictReader(decode_lines(lines))
+
+
+def iter_ndjson_rows(lines):
+    """object per non-blank NDJSON line, `None` for lines that aren't valid JSON"""
+    for line in decode_lines(lines):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None